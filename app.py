@@ -19,9 +19,19 @@ from db_utils import (
     save_exercise_log,
     get_rom_pain_log,
     save_rom_pain_log,
-    get_user_list,
+    search_users,
+    get_power_level,
+    recompute_power_level,
+    data_fingerprint,
     init_connection
 )
+from perf import begin_rerun, end_rerun, set_rerun_page, span, show_perf_panel
+from db_metrics import show_db_metrics_panel
+from metrics import start_exporter, rerun_started, rerun_finished
+from session_memory import account_session_memory, show_memory_panel
+from session_store import TOKEN_PARAM, create_session, load_session, touch_session, end_session
+from user_directory import PAGE_SIZE as USER_PAGE_SIZE
+from clinician import is_clinician
 
 # Set page config
 st.set_page_config(
@@ -31,8 +41,16 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Collect span timings for this rerun (no-op unless perf_enabled is set)
+begin_rerun()
+
+# Prometheus metrics: /metrics exporter (once per process, when metrics_port is set) and rerun latency
+start_exporter()
+rerun_started()
+
 # Check MongoDB connection early
-mongodb_connected = init_connection() is not None
+with span("app.connection_check"):
+    mongodb_connected = init_connection() is not None
 if not mongodb_connected:
     st.warning("⚠️ Not connected to MongoDB. Using local file storage as fallback.")
 else:
@@ -44,7 +62,8 @@ def load_css():
         st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
 
 try:
-    load_css()
+    with span("app.load_css"):
+        load_css()
 except:
     st.warning("Custom styling not loaded. Make sure app/styles.css exists.")
 
@@ -139,6 +158,85 @@ if 'exercise_log' not in st.session_state:
     st.session_state.exercise_log = pd.DataFrame()
 if 'user_data' not in st.session_state:
     st.session_state.user_data = pd.DataFrame()
+if 'session_token' not in st.session_state:
+    st.session_state.session_token = None
+
+# Session state saved by save_data() and the function that saves each
+SAVED_DATA = [
+    ('user_data', save_user_profile),
+    ('exercise_log', save_exercise_log),
+    ('rom_pain_log', save_rom_pain_log),
+]
+
+# Load a user's profile, logs and power level into this session
+def load_user_session(username, user=None):
+    st.session_state.authenticated = True
+    st.session_state.current_username = username
+    
+    # Initialize/load user data
+    st.session_state.user_data = get_user_profile(username)
+    st.session_state.exercise_log = get_exercise_log(username)
+    st.session_state.rom_pain_log = get_rom_pain_log(username)
+    # What this session holds is what is stored: save_data() has nothing to write until it changes
+    st.session_state.saved_fingerprints = {key: data_fingerprint(st.session_state[key]) for key, _ in SAVED_DATA}
+    
+    # Power level is read from the stored running counter, no history scan needed
+    st.session_state.power_level = user.get('power_level') if user else None
+    if st.session_state.power_level is None:
+        st.session_state.power_level = get_power_level(username)
+
+# Issue a signed session token after login so reloads and other replicas skip the password check.
+# Only remembered sessions put the token in the URL, where it ends up in browser history and shared links
+def start_user_session(username, user, remember=False):
+    load_user_session(username, user)
+    token = create_session(username, remember=remember)
+    st.session_state.session_token = token
+    st.session_state.stored_session = load_session(token)
+    if remember:
+        st.query_params[TOKEN_PARAM] = token
+
+# Log out: revoke the stored session and clear this browser session
+def end_user_session():
+    end_session(st.session_state.session_token)
+    st.session_state.session_token = None
+    st.session_state.stored_session = None
+    if TOKEN_PARAM in st.query_params:
+        del st.query_params[TOKEN_PARAM]
+    
+    st.session_state.authenticated = False
+    st.session_state.current_username = None
+    st.session_state.user_data = None
+    st.session_state.exercise_log = None
+    st.session_state.rom_pain_log = None
+    st.session_state.power_level = 0
+
+# Resume a session from the token in the URL after a reconnect, replica restart or load-balancer move
+def restore_session():
+    token = st.query_params.get(TOKEN_PARAM)
+    session = load_session(token)
+    if session is None:
+        if token:
+            del st.query_params[TOKEN_PARAM]
+        return
+    with span("app.restore_session"):
+        load_user_session(session['username'])
+    st.session_state.session_token = token
+    st.session_state.stored_session = session
+
+if not st.session_state.authenticated:
+    restore_session()
+elif st.session_state.session_token and st.session_state.get('stored_session'):
+    token, session = touch_session(st.session_state.session_token, st.session_state.stored_session)
+    if session is None:
+        # Expired, or revoked on any replica (logout elsewhere, end_session by an operator)
+        end_user_session()
+    else:
+        st.session_state.stored_session = session
+        if token != st.session_state.session_token:
+            # Re-signed with a later expiry
+            st.session_state.session_token = token
+            if session.get('remember'):
+                st.query_params[TOKEN_PARAM] = token
 
 # Authentication function
 def login_form():
@@ -151,19 +249,13 @@ def login_form():
         with st.form("login_form"):
             username = st.text_input("Username")
             password = st.text_input("Password", type="password")
+            remember = st.checkbox("Remember me", key="login_remember")
             submitted = st.form_submit_button("Login")
             
             if submitted:
                 success, result = authenticate_user(username, password)
                 if success:
-                    st.session_state.authenticated = True
-                    st.session_state.current_username = username
-                    
-                    # Initialize/load user data
-                    st.session_state.user_data = get_user_profile(username)
-                    st.session_state.exercise_log = get_exercise_log(username)
-                    st.session_state.rom_pain_log = get_rom_pain_log(username)
-                    
+                    start_user_session(username, result, remember)
                     st.success("Logged in successfully!")
                     st.rerun()
                 else:
@@ -191,9 +283,27 @@ def login_form():
                         st.error(message)
     
     with tab3:
-        # Get list of existing users
-        users = get_user_list()
+        # Search existing users by username or name prefix, one page at a time
+        query = st.text_input("Search profiles", key="directory_query", placeholder="Username or name")
+        if st.session_state.get('directory_last_query') != query:
+            st.session_state.directory_last_query = query
+            st.session_state.directory_page = 0
+        page = st.session_state.get('directory_page', 0)
+        users, total = search_users(query, page)
         if users:
+            pages = (total - 1) // USER_PAGE_SIZE + 1
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("◀ Previous", key="directory_previous", disabled=page == 0):
+                    st.session_state.directory_page = page - 1
+                    st.rerun()
+            with col2:
+                st.caption(f"{page * USER_PAGE_SIZE + 1}–{page * USER_PAGE_SIZE + len(users)} of {total} profiles")
+            with col3:
+                if st.button("Next ▶", key="directory_next", disabled=page + 1 >= pages):
+                    st.session_state.directory_page = page + 1
+                    st.rerun()
+
             with st.form("select_profile_form"):
                 # Create a dictionary of username:name for display
                 user_options = {}
@@ -206,43 +316,46 @@ def login_form():
                                               format_func=lambda x: user_options[x])
                 
                 password = st.text_input("Password", type="password")
+                remember = st.checkbox("Remember me", key="profile_remember")
                 submitted = st.form_submit_button("Login")
                 
                 if submitted:
                     success, result = authenticate_user(selected_username, password)
                     if success:
-                        st.session_state.authenticated = True
-                        st.session_state.current_username = selected_username
-                        
-                        # Initialize/load user data
-                        st.session_state.user_data = get_user_profile(selected_username)
-                        st.session_state.exercise_log = get_exercise_log(selected_username)
-                        st.session_state.rom_pain_log = get_rom_pain_log(selected_username)
-                        
+                        start_user_session(selected_username, result, remember)
                         st.success("Logged in successfully!")
                         st.rerun()
                     else:
                         st.error(result)
+        elif query:
+            st.info("No profiles match your search.")
         else:
             st.info("No existing profiles found. Please register a new account.")
 
 # Main app function
 def main_app():
-    # App navigation
-    selected = option_menu(
-        menu_title=None,
-        options=["Profile", "Rehab Plan", "Equipment Exercises", "Exercise Tracker", "ROM & Pain", "Progress Dashboard"],
-        icons=["person-circle", "journal-check", "tools", "activity", "thermometer-half", "graph-up"],
-        menu_icon="cast",
-        default_index=0,
-        orientation="horizontal",
-        styles={
-            "container": {"padding": "0!important", "background-color": "rgba(25, 30, 40, 0.3)", "border-radius": "10px"},
-            "icon": {"color": "rgba(255, 255, 255, 0.7)", "font-size": "16px"}, 
-            "nav-link": {"font-size": "14px", "text-align": "center", "margin":"0px", "padding": "10px", "border-radius": "5px"},
-            "nav-link-selected": {"background-color": "rgba(54, 209, 220, 0.2)", "color": "#36d1dc", "font-weight": "600"},
-        }
-    )
+    # App navigation (clinicians, listed in clinician_usernames, also get their patient list)
+    pages = ["Profile", "Rehab Plan", "Equipment Exercises", "Exercise Tracker", "ROM & Pain", "Progress Dashboard"]
+    icons = ["person-circle", "journal-check", "tools", "activity", "thermometer-half", "graph-up"]
+    clinician_mode = is_clinician(st.session_state.current_username)
+    if clinician_mode:
+        pages.append("Patients")
+        icons.append("people")
+    with span("app.option_menu"):
+        selected = option_menu(
+            menu_title=None,
+            options=pages,
+            icons=icons,
+            menu_icon="cast",
+            default_index=0,
+            orientation="horizontal",
+            styles={
+                "container": {"padding": "0!important", "background-color": "rgba(25, 30, 40, 0.3)", "border-radius": "10px"},
+                "icon": {"color": "rgba(255, 255, 255, 0.7)", "font-size": "16px"}, 
+                "nav-link": {"font-size": "14px", "text-align": "center", "margin":"0px", "padding": "10px", "border-radius": "5px"},
+                "nav-link-selected": {"background-color": "rgba(54, 209, 220, 0.2)", "color": "#36d1dc", "font-weight": "600"},
+            }
+        )
 
     # App title with modern theme
     st.markdown("""
@@ -258,7 +371,7 @@ def main_app():
     
     if st.session_state.last_page != selected:
         # Create visual feature cards for the first visit to a page
-        if selected in ["Profile", "Rehab Plan", "Equipment Exercises", "Exercise Tracker", "ROM & Pain", "Progress Dashboard"]:
+        if selected in pages:
             # Feature highlights
             features = {
                 "Profile": {
@@ -296,6 +409,12 @@ def main_app():
                     "title": "Analytics Dashboard",
                     "description": "Visualize your recovery metrics and see your progress over time.",
                     "color": "#6e94f2"
+                },
+                "Patients": {
+                    "icon": "people",
+                    "title": "Patient Overview",
+                    "description": "See every assigned patient's last activity, latest ROM, pain trend and adherence at a glance.",
+                    "color": "#7f8cf5"
                 }
             }
             
@@ -323,6 +442,7 @@ def main_app():
     
     # Update last page
     st.session_state.last_page = selected
+    set_rerun_page(selected)
 
     # Show current user in a nicer format
     st.sidebar.markdown("""
@@ -334,14 +454,20 @@ def main_app():
     """.format(st.session_state.current_username), unsafe_allow_html=True)
     
     if st.sidebar.button("Logout"):
-        # Clear session state
-        st.session_state.authenticated = False
-        st.session_state.current_username = None
-        st.session_state.user_data = None
-        st.session_state.exercise_log = None
-        st.session_state.rom_pain_log = None
+        # End the stored session so the token no longer logs anyone in
+        end_user_session()
         st.rerun()
 
+    # Rebuild the power level from the stored logs (e.g. after editing entries directly in the database)
+    if st.sidebar.button("Recalculate Power Level"):
+        st.session_state.power_level = recompute_power_level(st.session_state.current_username)
+        st.sidebar.success(f"Power level recalculated: {st.session_state.power_level:,}")
+
+    # Rerun timing breakdown and MongoDB command metrics for operators (perf_operators in secrets)
+    show_perf_panel(st.session_state.current_username)
+    show_db_metrics_panel(st.session_state.current_username)
+    show_memory_panel(st.session_state.current_username)
+
     # Power level display with modern styling
     col1, col2, col3 = st.columns([1, 3, 1])
     with col2:
@@ -373,20 +499,24 @@ def main_app():
     from dashboard import show_dashboard
     from rehab_plan import show_rehab_plan
     from equipment_exercises import show_equipment_exercises
+    from clinician import show_clinician_dashboard
 
     # Show selected page
-    if selected == "Profile":
-        show_profile()
-    elif selected == "Rehab Plan":
-        show_rehab_plan()
-    elif selected == "Equipment Exercises":
-        show_equipment_exercises()
-    elif selected == "Exercise Tracker":
-        show_exercise_tracker()
-    elif selected == "ROM & Pain":
-        show_rom_pain()
-    elif selected == "Progress Dashboard":
-        show_dashboard()
+    with span(f"page.{selected}"):
+        if selected == "Profile":
+            show_profile()
+        elif selected == "Rehab Plan":
+            show_rehab_plan()
+        elif selected == "Equipment Exercises":
+            show_equipment_exercises()
+        elif selected == "Exercise Tracker":
+            show_exercise_tracker()
+        elif selected == "ROM & Pain":
+            show_rom_pain()
+        elif selected == "Progress Dashboard":
+            show_dashboard()
+        elif selected == "Patients" and clinician_mode:
+            show_clinician_dashboard(st.session_state.current_username)
 
     # Footer with modern styling
     st.markdown("""
@@ -395,24 +525,24 @@ def main_app():
     </div>
     """, unsafe_allow_html=True)
 
-# Save data function
+# Save data function: the profile and logs this session changed since it last loaded or saved them.
+# The fingerprints live in the session, not the process, so a session never skips a write because
+# another session (on this or another replica) wrote the same user
 def save_data():
     if st.session_state.current_username:
         try:
-            # Save user data to MongoDB
-            if 'user_data' in st.session_state and st.session_state.user_data is not None:
-                save_user_profile(st.session_state.current_username, st.session_state.user_data)
-            
-            # Save exercise log to MongoDB
-            if 'exercise_log' in st.session_state and st.session_state.exercise_log is not None:
-                save_exercise_log(st.session_state.current_username, st.session_state.exercise_log)
-            
-            # Save ROM and pain log to MongoDB
-            if 'rom_pain_log' in st.session_state and st.session_state.rom_pain_log is not None:
-                save_rom_pain_log(st.session_state.current_username, st.session_state.rom_pain_log)
+            saved = st.session_state.setdefault('saved_fingerprints', {})
+            for key, save in SAVED_DATA:
+                if key not in st.session_state or st.session_state[key] is None:
+                    continue
+                fingerprint = data_fingerprint(st.session_state[key])
+                if fingerprint is not None and saved.get(key) == fingerprint:
+                    continue
+                success, _ = save(st.session_state.current_username, st.session_state[key])
+                if success:
+                    saved[key] = fingerprint
             
-            # Save power level to session state only (not in MongoDB yet)
-            st.session_state.power_level = st.session_state.get('power_level', 9000)
+            # Power level is persisted as a running counter when entries are logged or removed
         except Exception as e:
             st.error(f"Error saving data: {e}")
 
@@ -420,7 +550,8 @@ def save_data():
 if st.session_state.authenticated:
     main_app()
 else:
-    login_form()
+    with span("app.login_form"):
+        login_form()
 
 # Register the save_data function to run when app stops
 import atexit
@@ -431,4 +562,12 @@ st.cache_data.clear()
 
 # Save data periodically (on each rerun)
 if st.session_state.authenticated:
-    save_data()
+    with span("app.save_data"):
+        save_data()
+
+# Per-session memory accounting; cold analytics caches are evicted past session_memory_budget_mb
+with span("app.session_memory"):
+    account_session_memory()
+
+rerun_finished(st.session_state.get('last_page') if st.session_state.authenticated else "Login")
+end_rerun()
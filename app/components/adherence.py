@@ -0,0 +1,249 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from heatmap import to_day_numbers
+from training_load import row_key
+from exercise_catalog import get_catalog, normalize
+from rehab_protocol import get_protocol
+from perf import timed_span
+from metrics import record_cache_lookup
+from session_memory import get_derived
+from cards import emit, METRIC_CARD
+
+# Catalog matches at least this good (name or word-prefix match) map free-text log names onto prescriptions
+MIN_MATCH_SCORE = 1
+
+def exercise_codes(names, protocol, catalog):
+    """Prescribed-exercise code for each logged exercise name, -1 when it matches nothing in the protocol"""
+    prescribed = {normalize(name): code for code, name in enumerate(protocol.prescribed_names)}
+    codes = {}
+    for name in names:
+        code = prescribed.get(normalize(str(name)), -1)
+        if code < 0:
+            # Older or hand-typed names ("hamstring curl") resolve through the catalog's ranked search
+            best = catalog.search(str(name), limit=1)
+            if best and best[0]['score'] >= MIN_MATCH_SCORE:
+                code = prescribed.get(normalize(best[0]['name']), -1)
+        codes[name] = code
+    return codes
+
+def _to_day(value):
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+def _logged_items(exercise_log, state, protocol, catalog):
+    """Day offsets and prescription rows hit by log entries: one vectorized join of log rows onto the protocol"""
+    if exercise_log.empty or 'exercise' not in exercise_log.columns:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    days, valid = to_day_numbers(exercise_log['date'])
+    names = exercise_log['exercise'].astype(str).reset_index(drop=True)
+
+    # Name matching runs once per distinct exercise name and is remembered in the state
+    unseen = [name for name in names.unique() if name not in state['codes']]
+    state['codes'].update(exercise_codes(unseen, protocol, catalog))
+    codes = names.map(state['codes']).to_numpy(dtype=np.int64)
+
+    phases = protocol.phase_indexes(days - state['surgery_day'])
+    items = np.where(codes >= 0, protocol.item_lookup[phases, np.maximum(codes, 0)], -1)
+    keep = valid & (items >= 0) & (days >= state['grid_start'])
+    return days[keep] - state['grid_start'], items[keep]
+
+def _extend(state, last_offset):
+    extra = last_offset + 1 - state['done'].shape[0]
+    if extra > 0:
+        state['done'] = np.vstack([state['done'], np.zeros((extra, state['done'].shape[1]), dtype=bool)])
+
+def build_adherence(exercise_log, surgery_date, today=None, protocol=None, catalog=None):
+    """Mark every (day, prescription) the whole history satisfies on a days x prescriptions grid"""
+    protocol = protocol or get_protocol()
+    catalog = catalog or get_catalog()
+    surgery_day = _to_day(surgery_date)
+    state = {
+        'n_rows': len(exercise_log),
+        'last_key': row_key(exercise_log, len(exercise_log) - 1) if len(exercise_log) else None,
+        'surgery_day': surgery_day,
+        # The grid starts with the first (pre-op) phase
+        'grid_start': surgery_day + protocol.phases[0]['start_day'],
+        'codes': {},
+        'done': np.zeros((0, len(protocol.prescriptions)), dtype=bool),
+    }
+    offsets, items = _logged_items(exercise_log, state, protocol, catalog)
+    _extend(state, max([_to_day(today or pd.Timestamp.today()) - state['grid_start']] + list(offsets)))
+    state['done'][offsets, items] = True
+    return state
+
+def update_adherence(state, exercise_log, surgery_date, today=None, protocol=None, catalog=None):
+    """Fold rows appended since the last call into the grid, rebuilding when history or the surgery date changed"""
+    n_cached = state['n_rows'] if state else 0
+    appended_only = (
+        state is not None
+        and state['surgery_day'] == _to_day(surgery_date)
+        and len(exercise_log) >= n_cached > 0
+        and row_key(exercise_log, n_cached - 1) == state['last_key']
+    )
+    if not appended_only:
+        return build_adherence(exercise_log, surgery_date, today, protocol, catalog)
+
+    protocol = protocol or get_protocol()
+    offsets, items = _logged_items(exercise_log.iloc[n_cached:], state, protocol, catalog or get_catalog())
+    _extend(state, max([_to_day(today or pd.Timestamp.today()) - state['grid_start']] + list(offsets)))
+    state['done'][offsets, items] = True
+    state['n_rows'] = len(exercise_log)
+    state['last_key'] = row_key(exercise_log, len(exercise_log) - 1)
+    return state
+
+def adherence_metrics(state, today=None, protocol=None):
+    """Per-day adherence for the current phase, per-week adherence over the whole history and missed prescriptions
+
+    A week is 7 days from the start of its phase. Each prescription expects per_week sessions (pro-rated
+    for the running week) and counts at most that many, so extra sessions of one item do not hide another.
+    """
+    protocol = protocol or get_protocol()
+    today_offset = _to_day(today or pd.Timestamp.today()) - state['grid_start']
+    if today_offset < 0:
+        return None
+    # The grid may have been built on an earlier day (a session left open past midnight): days since are unlogged
+    _extend(state, today_offset)
+
+    prescriptions = protocol.prescriptions
+    item_phase = prescriptions['phase'].to_numpy()
+    per_week = prescriptions['per_week'].to_numpy(dtype=float)
+    done = state['done'][:today_offset + 1]
+
+    # Phase and phase-relative week of every day up to today
+    day_since = np.arange(today_offset + 1) + state['grid_start'] - state['surgery_day']
+    day_phase = protocol.phase_indexes(day_since)
+    phase_start = np.array([phase['start_day'] for phase in protocol.phases])[day_phase]
+    week = (day_since - phase_start) // 7
+    group_key = day_phase * 100000 + week
+    keys, group = np.unique(group_key, return_inverse=True)
+    group_phase = keys // 100000
+
+    # Distinct days each prescription was done, per (phase, week)
+    sessions = np.zeros((len(keys), len(prescriptions)))
+    np.add.at(sessions, group, done)
+    days_in_group = np.bincount(group)
+    expected = np.where(item_phase[None, :] == group_phase[:, None],
+                        per_week[None, :] * days_in_group[:, None] / 7, 0.0)
+    credited = np.minimum(sessions, expected)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        week_adherence = credited.sum(axis=1) / expected.sum(axis=1)
+
+    # Days run in order, so each group's first day is where its id first appears
+    first_day = np.searchsorted(group, np.arange(len(keys)))
+    weekly = pd.DataFrame({
+        'week_start': pd.to_datetime(np.datetime64(state['grid_start'], 'D') + first_day.astype('timedelta64[D]')),
+        'phase': [protocol.phases[p]['name'] for p in group_phase],
+        'color': [protocol.phases[p]['color'] for p in group_phase],
+        'adherence': week_adherence * 100,
+        'sessions': credited.sum(axis=1),
+        'expected': expected.sum(axis=1),
+    })
+
+    # Current phase: per-day share of its daily prescriptions, phase-to-date adherence and what was missed
+    current = int(day_phase[-1])
+    in_phase = day_phase == current
+    phase_items = np.flatnonzero(item_phase == current)
+    daily_items = phase_items[per_week[phase_items] >= 7]
+    daily = pd.DataFrame({
+        'date': pd.to_datetime(np.datetime64(state['grid_start'], 'D') + np.flatnonzero(in_phase).astype('timedelta64[D]')),
+        'adherence': done[in_phase][:, daily_items].mean(axis=1) * 100 if len(daily_items) else np.nan,
+    })
+
+    phase_groups = group_phase == current
+    phase_expected = expected[phase_groups][:, phase_items].sum(axis=0)
+    phase_credited = credited[phase_groups][:, phase_items].sum(axis=0)
+    this_week = sessions[-1, phase_items]
+    missed = prescriptions.iloc[phase_items][['exercise', 'sets', 'reps', 'per_week']].astype({'sets': 'Int64', 'reps': 'Int64'}).assign(
+        this_week=this_week.astype(int),
+        missed_in_phase=np.ceil(np.maximum(phase_expected - phase_credited, 0) - 1e-9).astype(int),
+    )
+    missed = missed[(missed['missed_in_phase'] > 0) | (missed['this_week'] < missed['per_week'])]
+    missed = missed.sort_values(['missed_in_phase', 'exercise'], ascending=[False, True]).reset_index(drop=True)
+
+    return {
+        'phase': protocol.phases[current],
+        'today': float(daily['adherence'].iloc[-1]) if len(daily_items) else None,
+        'this_week': float(week_adherence[-1] * 100),
+        'phase_to_date': float(phase_credited.sum() / phase_expected.sum() * 100) if phase_expected.sum() else None,
+        'daily': daily,
+        'weekly': weekly,
+        'missed': missed,
+    }
+
+def get_adherence(exercise_log, surgery_date):
+    """Adherence for the logged-in user, cached in session state and updated incrementally between reruns"""
+    cache = get_derived('adherence_cache')
+    if cache is None or cache.get('username') != st.session_state.get('current_username'):
+        cache = {'username': st.session_state.get('current_username'), 'state': None}
+
+    state_before = cache['state']
+    rows_before = state_before['n_rows'] if state_before else 0
+    cache['state'] = update_adherence(state_before, exercise_log, surgery_date)
+    record_cache_lookup('adherence', state_before, rows_before, cache['state'], cache['state']['n_rows'])
+    st.session_state.adherence_cache = cache
+    return adherence_metrics(cache['state'])
+
+def _percent(value):
+    return "–" if value is None or pd.isna(value) else f"{value:.0f}%"
+
+@timed_span("dashboard.adherence")
+def show_adherence(exercise_log, surgery_date):
+    """Render plan adherence against the rehab protocol for the dashboard"""
+    result = get_adherence(exercise_log, surgery_date)
+    if result is None:
+        st.info("Adherence tracking starts with the pre-op phase, two weeks before surgery.")
+        return
+
+    phase = result['phase']
+    col1, col2, col3 = st.columns(3)
+    cards = [
+        (col1, "TODAY", _percent(result['today']), "Daily prescriptions done" if result['today'] is not None else "No daily prescriptions this phase"),
+        (col2, "THIS WEEK", _percent(result['this_week']), "Prescribed sessions, pro-rated"),
+        (col3, "PHASE TO DATE", _percent(result['phase_to_date']), phase['label']),
+    ]
+    for col, label, value, caption in cards:
+        with col:
+            emit(METRIC_CARD.render(label=label, value=value, value_style="font-size: 1.8rem;", caption=caption))
+
+    weekly = result['weekly']
+    fig = go.Figure(go.Bar(
+        x=weekly['week_start'],
+        y=weekly['adherence'],
+        marker_color=weekly['color'],
+        customdata=np.stack([weekly['phase'], weekly['sessions'], weekly['expected']], axis=-1),
+        hovertemplate="Week of %{x|%b %d}<br>%{customdata[0]}<br>%{y:.0f}% (%{customdata[1]:.1f} of %{customdata[2]:.1f} sessions)<extra></extra>",
+        name="Weekly",
+    ))
+    daily = result['daily'].dropna()
+    if not daily.empty:
+        fig.add_trace(go.Scatter(
+            x=daily['date'],
+            y=daily['adherence'],
+            name=f"Daily ({phase['name']})",
+            mode='lines+markers',
+            line=dict(color='#ffab00', width=2),
+            hovertemplate="%{x|%b %d}: %{y:.0f}% of daily prescriptions<extra></extra>",
+        ))
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(color='rgba(255,255,255,0.7)')),
+        xaxis=dict(showgrid=False, zeroline=False, color='rgba(255,255,255,0.5)'),
+        yaxis=dict(title="Adherence (%)", range=[0, 105], showgrid=True,
+                   gridcolor='rgba(255,255,255,0.1)', zeroline=False, color='rgba(255,255,255,0.5)'),
+        font=dict(color='rgba(255,255,255,0.7)'),
+        height=280
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    missed = result['missed']
+    if missed.empty:
+        st.success(f"Every {phase['name']} prescription is on track.")
+    else:
+        st.markdown(f"**Missed or outstanding {phase['name']} prescriptions**")
+        st.dataframe(missed.rename(columns={
+            'exercise': 'Exercise', 'sets': 'Sets', 'reps': 'Reps', 'per_week': 'Per week',
+            'this_week': 'Done this week', 'missed_in_phase': 'Missed in phase',
+        }).astype({'Sets': 'Int64', 'Reps': 'Int64'}), use_container_width=True, hide_index=True)
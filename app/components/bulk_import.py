@@ -0,0 +1,288 @@
+import os
+from itertools import islice
+import numpy as np
+import pandas as pd
+import streamlit as st
+from db_utils import (
+    get_log_keys, bulk_insert_log, get_exercise_log, get_rom_pain_log, increment_power_level, get_power_level,
+    refresh_patient_summaries
+)
+from power_level import power_level_from_logs, DEFAULT_DIFFICULTY
+from exercise_catalog import get_catalog, normalize
+from perf import timed_span, get_perf_setting
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CHUNK_ROWS = 5000
+MAX_REPORTED_ERRORS = 200
+
+# Catalog matches at least this good (name or word-prefix match) fill in a missing category
+MIN_CATEGORY_SCORE = 1
+UNKNOWN_CATEGORY = "Other"
+
+# The swelling labels offered by the ROM & Pain form ("Minimal +1", ...) as normalize() leaves them,
+# accepted in place of their numbers
+SWELLING_LEVELS = {"none": 0, "minimal 1": 1, "moderate 2": 2, "severe 3": 3}
+
+COLUMN_ALIASES = {
+    'name': 'exercise', 'exercise_name': 'exercise', 'weight_kg': 'weight',
+    'extension': 'extension_angle', 'flexion': 'flexion_angle', 'pain': 'pain_level',
+}
+
+# Per log: required columns, optional columns with their defaults, the ranges the entry forms enforce,
+# and the fields that identify an entry for deduplication
+SCHEMAS = {
+    'exercise': {
+        'label': "exercises",
+        'required': ['date', 'exercise', 'sets', 'reps'],
+        'optional': {'category': "", 'weight': 0.0, 'difficulty': float(DEFAULT_DIFFICULTY), 'notes': ""},
+        'ranges': {'sets': (1, 10), 'reps': (1, 100), 'weight': (0, None), 'difficulty': (1, 10)},
+        'integers': ['sets', 'reps'],
+        'key': ['date', 'exercise', 'sets', 'reps', 'weight'],
+    },
+    'rom_pain': {
+        'label': "ROM & pain measurements",
+        'required': ['date', 'extension_angle', 'flexion_angle', 'pain_level', 'swelling'],
+        'optional': {'notes': ""},
+        'ranges': {'extension_angle': (-15, 30), 'flexion_angle': (0, 160), 'pain_level': (0, 10), 'swelling': (0, 3)},
+        'integers': ['pain_level', 'swelling'],
+        # The ROM & Pain history deletes entries by date, so a day holds one measurement
+        'key': ['date'],
+    },
+}
+
+def _xlsx_chunks(file, chunk_rows):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Reading .xlsx files needs openpyxl (pip install openpyxl)")
+    # Read-only mode streams rows from the sheet XML instead of building the whole workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = ["" if cell is None else str(cell) for cell in next(rows, ())]
+        total = max((sheet.max_row or 0) - 1, 1)
+        read = 0
+        while True:
+            block = list(islice(rows, chunk_rows))
+            if not block:
+                break
+            read += len(block)
+            yield pd.DataFrame([row[:len(header)] for row in block], columns=header), min(read / total, 1.0)
+    finally:
+        workbook.close()
+
+def read_chunks(file, filename, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Stream a CSV, XLSX or JSONL file as (DataFrame of at most chunk_rows rows, fraction read) pairs"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.xlsx':
+        yield from _xlsx_chunks(file, chunk_rows)
+        return
+
+    file.seek(0, os.SEEK_END)
+    size = max(file.tell(), 1)
+    file.seek(0)
+    if extension == '.csv':
+        # Everything as text: only the validator decides what is a number; "None" is a swelling label, not NA
+        reader = pd.read_csv(file, chunksize=chunk_rows, dtype=str, keep_default_na=False, na_values=[""],
+                             skipinitialspace=True)
+    elif extension in ('.jsonl', '.ndjson'):
+        reader = pd.read_json(file, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False)
+    else:
+        raise ValueError(f"Unsupported file type '{extension or filename}': use CSV, XLSX or JSONL")
+
+    with reader:
+        for chunk in reader:
+            yield chunk, min(file.tell() / size, 1.0)
+
+def _normalize_columns(frame):
+    columns = [normalize(str(column)).replace(" ", "_") for column in frame.columns]
+    frame = frame.set_axis([COLUMN_ALIASES.get(column, column) for column in columns], axis=1)
+    if frame.columns.duplicated().any():
+        # An alias next to its full name (JSONL records may use either): take the first non-empty value
+        frame = pd.DataFrame({
+            name: frame.loc[:, frame.columns == name].bfill(axis=1).iloc[:, 0] for name in frame.columns.unique()
+        })
+    return frame
+
+def _parse_dates(values):
+    # ISO dates parse vectorized; anything else (02/03/2024, Excel datetimes as text) falls back per value
+    dates = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    retry = dates.isna() & values.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(values[retry].astype(str), errors='coerce', format='mixed')
+    return dates.dt.normalize()
+
+def _categories(names, catalog):
+    """Category for each distinct exercise name: the catalog's, or that of its best catalog match"""
+    categories = {}
+    for name in names:
+        category = catalog.category_of(name)
+        if category is None:
+            best = catalog.search(name, limit=1)
+            category = best[0]['category'] if best and best[0]['score'] >= MIN_CATEGORY_SCORE else UNKNOWN_CATEGORY
+        categories[name] = category
+    return categories
+
+def validate_chunk(kind, chunk, first_row, catalog=None):
+    """Check a chunk against the entry forms' ranges in a few column-wide passes
+
+    Returns (entries, errors): the valid rows converted to the types the forms save, and a frame
+    of rejected rows with their file row numbers and reasons.
+    """
+    schema = SCHEMAS[kind]
+    chunk = _normalize_columns(chunk).reset_index(drop=True)
+    missing = [column for column in schema['required'] if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    reasons = pd.Series("", index=chunk.index)
+    def reject(mask, reason):
+        nonlocal reasons
+        reasons = reasons.where(~mask, reasons + reason + "; ")
+
+    entries = pd.DataFrame(index=chunk.index)
+    dates = _parse_dates(chunk['date'])
+    reject(dates.isna(), "invalid date")
+    entries['date'] = dates.dt.strftime("%Y-%m-%d") if kind == 'exercise' else dates
+
+    if kind == 'exercise':
+        names = chunk['exercise'].fillna("").astype(str).str.strip()
+        reject(names == "", "missing exercise")
+        entries['exercise'] = names
+        given = chunk['category'].fillna("").astype(str).str.strip() if 'category' in chunk.columns else pd.Series("", index=chunk.index)
+        unknown = (given == "") & (names != "")
+        entries['category'] = given.where(~unknown, names.map(_categories(names[unknown].unique(), catalog or get_catalog())))
+
+    for column, (low, high) in schema['ranges'].items():
+        raw = chunk[column] if column in chunk.columns else pd.Series(np.nan, index=chunk.index)
+        if column == 'swelling':
+            raw = raw.map(lambda value: SWELLING_LEVELS.get(normalize(value), value) if isinstance(value, str) else value)
+        values = pd.to_numeric(raw, errors='coerce')
+        if column in schema['optional']:
+            # Blank optional cells take the form's default; text that is not a number is still rejected
+            values = values.where(raw.notna(), schema['optional'][column])
+        reject(values.isna(), f"missing or non-numeric {column}")
+        out_of_range = (values < low) if high is None else ~values.between(low, high)
+        reject(values.notna() & out_of_range,
+               f"{column} must be at least {low}" if high is None else f"{column} must be between {low} and {high}")
+        if column in schema['integers']:
+            reject(values.notna() & (values % 1 != 0), f"{column} must be a whole number")
+        entries[column] = values
+
+    entries['notes'] = chunk['notes'].fillna("").astype(str) if 'notes' in chunk.columns else ""
+
+    invalid = reasons != ""
+    errors = pd.DataFrame({'row': chunk.index[invalid] + first_row, 'reason': reasons[invalid].str.rstrip("; ")})
+    entries = entries[~invalid].astype({column: 'int64' for column in schema['integers']})
+    return entries.reset_index(drop=True), errors.reset_index(drop=True)
+
+def entry_keys(kind, entries):
+    """Identity of each entry as one string, comparable between file rows and stored entries"""
+    if entries.empty:
+        return pd.Series([], dtype=str)
+    dates = pd.to_datetime(entries['date'], errors='coerce').dt.strftime("%Y-%m-%d")
+    if kind == 'rom_pain':
+        return dates.reset_index(drop=True)
+    numbers = [pd.to_numeric(entries[column], errors='coerce').astype(float).map("{:g}".format)
+               for column in ('sets', 'reps', 'weight')]
+    names = entries['exercise'].fillna("").astype(str).map(normalize)
+    return (dates + "|" + names + "|" + numbers[0] + "|" + numbers[1] + "|" + numbers[2]).reset_index(drop=True)
+
+@timed_span("import.log_file")
+def import_log(username, kind, file, filename, batch_size=None, chunk_rows=None, progress=None):
+    """Stream a CSV/XLSX/JSONL file into a user's log in bounded memory
+
+    Rows flow chunk by chunk through validation and deduplication (against stored entries and
+    earlier rows of the file) into bulk_write batches of batch_size. progress(fraction, text) is
+    called after every chunk. Returns counts, the first rejected rows and an error message, if any.
+    """
+    schema = SCHEMAS[kind]
+    batch_size = int(batch_size or get_perf_setting("import_batch_size", DEFAULT_BATCH_SIZE))
+    chunk_rows = int(chunk_rows or get_perf_setting("import_chunk_rows", DEFAULT_CHUNK_ROWS))
+    result = {'rows': 0, 'imported': 0, 'duplicates': 0, 'invalid': 0, 'power': 0, 'errors': [], 'message': None}
+
+    seen = set(entry_keys(kind, get_log_keys(username, kind, schema['key'])))
+    catalog = get_catalog() if kind == 'exercise' else None
+    close = isinstance(file, (str, os.PathLike))
+    if close:
+        file = open(file, 'rb')
+    try:
+        for chunk, fraction in read_chunks(file, filename, chunk_rows):
+            # File row numbers: 1 is the header
+            entries, errors = validate_chunk(kind, chunk, result['rows'] + 2, catalog)
+            result['rows'] += len(chunk)
+            result['invalid'] += len(errors)
+            room = MAX_REPORTED_ERRORS - len(result['errors'])
+            if room > 0:
+                result['errors'].extend(errors.head(room).to_dict(orient='records'))
+
+            keys = entry_keys(kind, entries)
+            fresh = (~keys.duplicated() & ~keys.isin(seen)).to_numpy()
+            result['duplicates'] += int((~fresh).sum())
+            entries = entries[fresh]
+            seen.update(keys[fresh])
+
+            for start in range(0, len(entries), batch_size):
+                batch = entries.iloc[start:start + batch_size]
+                success, message = bulk_insert_log(username, kind, batch.to_dict(orient='records'))
+                if not success:
+                    result['message'] = message
+                    return result
+                result['imported'] += len(batch)
+
+            # Imported entries earn power like entries logged through the forms
+            gained = power_level_from_logs(entries, None) if kind == 'exercise' else power_level_from_logs(None, entries)
+            if gained:
+                increment_power_level(username, gained)
+                result['power'] += gained
+
+            if progress:
+                progress(fraction, f"{result['rows']:,} rows read, {result['imported']:,} imported")
+    except ValueError as e:
+        result['message'] = str(e)
+    except Exception as e:
+        result['message'] = f"Could not read {filename}: {e}"
+    finally:
+        if close:
+            file.close()
+        # One summary refresh for the whole import, after the last batch
+        if result['imported']:
+            refresh_patient_summaries([username])
+    return result
+
+def show_bulk_import(kind):
+    """Import-from-file expander shown under a log's entry form"""
+    schema = SCHEMAS[kind]
+    with st.expander(f"Import {schema['label']} from a file"):
+        st.caption(
+            f"CSV, XLSX or JSONL with the columns {', '.join(schema['required'])}"
+            f" (optional: {', '.join(schema['optional'])}). Rows already in your log are skipped."
+        )
+        uploaded = st.file_uploader("File", type=['csv', 'xlsx', 'jsonl', 'ndjson'], key=f"import_{kind}_file")
+        if uploaded is None or not st.button("Import", key=f"import_{kind}_button"):
+            return
+
+        username = st.session_state.current_username
+        bar = st.progress(0.0, text="Importing…")
+        result = import_log(username, kind, uploaded, uploaded.name,
+                            progress=lambda fraction, text: bar.progress(fraction, text=text))
+
+        # save_data() writes the session's logs back on every rerun, so they must include the import
+        if result['imported']:
+            if kind == 'exercise':
+                st.session_state.exercise_log = get_exercise_log(username)
+            else:
+                st.session_state.rom_pain_log = get_rom_pain_log(username)
+            st.session_state.power_level = get_power_level(username)
+
+        summary = (f"{result['imported']:,} of {result['rows']:,} rows imported, {result['duplicates']:,} duplicates skipped,"
+                   f" {result['invalid']:,} rejected. Power level +{result['power']:,}.")
+        if result['message']:
+            st.error(f"{result['message']} ({summary})")
+        else:
+            bar.progress(1.0, text="Import complete")
+            st.success(summary)
+        if result['errors']:
+            st.dataframe(pd.DataFrame(result['errors']).rename(columns={'row': 'Row', 'reason': 'Problem'}),
+                         use_container_width=True, hide_index=True)
@@ -0,0 +1,86 @@
+import html
+from string import Template
+import streamlit as st
+
+class Raw(str):
+    """Trusted HTML (another rendered template, a style value) substituted without escaping"""
+
+def _escape(value):
+    text = html.escape(str(value))
+    return text.replace("\r\n", "<br>").replace("\r", "<br>").replace("\n", "<br>")
+
+class CardTemplate:
+    """HTML snippet compiled once at import; every substituted value is HTML-escaped unless wrapped in Raw
+
+    $name placeholders (string.Template) leave the CSS braces in the markup alone. Indentation and
+    line breaks are collapsed so a card is one line: smaller deltas, and no blank line or indented
+    line can turn part of the HTML into a Markdown paragraph or code block. Line breaks in values
+    (multi-line notes) become <br> for the same reason.
+    """
+
+    def __init__(self, source):
+        self.template = Template(" ".join(line.strip() for line in source.strip().splitlines() if line.strip()))
+
+    def render(self, **values):
+        return Raw(self.template.substitute({
+            name: value if isinstance(value, Raw) else _escape(value) for name, value in values.items()
+        }))
+
+    def render_all(self, rows):
+        """One HTML string for a whole list of cards (rows are dicts of values)"""
+        return Raw("".join(self.render(**row) for row in rows))
+
+def emit(*fragments):
+    """Send rendered cards as a single markdown delta"""
+    st.markdown("".join(fragments), unsafe_allow_html=True)
+
+SECTION_HEADER = CardTemplate("""
+<div style="margin: 30px 0 20px 0;">
+    <h3 style="color: #36d1dc; border-bottom: 1px solid rgba(255,255,255,0.1); padding-bottom: 10px;">$title</h3>
+</div>
+""")
+
+SUBSECTION_HEADER = CardTemplate("""
+<div style="margin: 20px 0 10px 0;">
+    <h4 style="color: #36d1dc; margin-bottom: 10px;">$title</h4>
+</div>
+""")
+
+METRIC_CARD = CardTemplate("""
+<div class="metric-container">
+    <div class="metric-label">$label</div>
+    <div class="metric-value" style="$value_style">$value</div>
+    <div style="font-size: 14px; color: rgba(255,255,255,0.7);">$caption</div>
+</div>
+""")
+
+EXERCISE_CARD = CardTemplate("""
+<div class="exercise-card">
+    <h4>$exercise</h4>
+    <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
+        $details
+    </div>
+    <div style="font-style: italic; color: rgba(255,255,255,0.8);">$notes</div>
+</div>
+""")
+
+CARD_DETAIL = CardTemplate("""
+<div><span style="color: rgba(255,255,255,0.6);">$label:</span> $value</div>
+""")
+
+DATE_HEADING = CardTemplate("""
+<h4 style="color: #36d1dc; margin-top: 20px;">$date</h4>
+""")
+
+PHASE_CARD = CardTemplate("""
+<div style="padding: 15px; margin-bottom: $margin; border-radius: 8px; background: $background; border-left: 4px solid $color;">
+    <div style="font-weight: 600; color: $color;">$title</div>
+    <div style="margin-top: 5px; color: rgba(255,255,255,0.7);">$description</div>
+</div>
+""")
+
+def exercise_card(row, fields):
+    """Exercise log row as a card; fields are (label, column, suffix) shown in the detail strip"""
+    details = "".join(CARD_DETAIL.render(label=label, value=f"{row[column]}{suffix}") for label, column, suffix in fields)
+    notes = row['notes'] if 'notes' in row and isinstance(row['notes'], str) and row['notes'] else "No notes"
+    return EXERCISE_CARD.render(exercise=row['exercise'], details=Raw(details), notes=notes)
@@ -0,0 +1,209 @@
+import re
+from datetime import date, datetime, timedelta
+import pandas as pd
+import streamlit as st
+from db_utils import aggregate_patient_summaries, assign_patient, unassign_patient
+from perf import timed_span, get_perf_setting
+from cards import emit, SECTION_HEADER
+
+PAGE_SIZE = 25
+ACTIVE_WINDOW_DAYS = 14
+INACTIVE_DAYS = 7
+LOW_ACTIVE_DAYS = 4
+# Mean pain over the last three entries this much above the three before
+PAIN_RISE = 1.0
+
+# Sortable columns: every one is a stored or projected field, so the sort runs in the aggregation
+SORTS = {
+    "Last seen": 'last_seen',
+    "Name": 'name',
+    "Surgery date": 'surgery_date',
+    "Latest extension": 'extension',
+    "Latest flexion": 'flexion',
+    "Recent pain": 'pain_recent',
+    "Pain trend": 'pain_trend',
+    "Active days": 'active_days',
+}
+STATUSES = ["All patients", "Pain rising", f"Inactive {INACTIVE_DAYS}+ days", "Low activity"]
+
+def is_clinician(username):
+    """Clinicians are listed in clinician_usernames (a TOML list or a comma-separated environment variable)"""
+    clinicians = get_perf_setting("clinician_usernames", [])
+    if isinstance(clinicians, str):
+        clinicians = [name.strip() for name in clinicians.split(',')]
+    return bool(username) and username in clinicians
+
+def _day(value):
+    return value.strftime("%Y-%m-%d")
+
+def _status_match(status, today):
+    if status == "Pain rising":
+        return {'pain_trend': {'$gte': PAIN_RISE}}
+    if status == STATUSES[2]:
+        cutoff = _day(today - timedelta(days=INACTIVE_DAYS))
+        return {'$or': [{'last_seen': {'$lt': cutoff}}, {'last_seen': None}]}
+    if status == "Low activity":
+        return {'active_days': {'$lt': LOW_ACTIVE_DAYS}}
+    return None
+
+def patient_list_pipeline(clinician, today, search="", status=STATUSES[0], sort="Last seen", descending=True,
+                          page=0, page_size=PAGE_SIZE):
+    """Aggregation over the patient summaries: one page of the clinician's patients and the number matching
+
+    db_utils refreshes each summary after every save, entry removal and import, so no patient's profile
+    or logs are read here, and the clinicians index selects the patients without a join.
+    """
+    active_since = _day(today - timedelta(days=ACTIVE_WINDOW_DAYS - 1))
+    pipeline = [
+        {'$match': {'clinicians': clinician}},
+        {'$project': {
+            '_id': 0,
+            'username': 1,
+            'name': 1,
+            'surgery_date': 1,
+            'last_seen': 1,
+            'extension': 1,
+            'flexion': 1,
+            'pain_latest': 1,
+            'pain_recent': 1,
+            'pain_trend': 1,
+            'active_days': {'$size': {'$filter': {
+                'input': {'$ifNull': ['$exercise_days', []]},
+                'as': 'day',
+                'cond': {'$gte': ['$$day', active_since]},
+            }}},
+        }},
+    ]
+    search = (search or "").strip()
+    if search:
+        # Prefix of the username or of any word of the name, like the login directory
+        escaped = re.escape(search)
+        pipeline.append({'$match': {'$or': [
+            {'username': {'$regex': f"^{escaped}", '$options': 'i'}},
+            {'name': {'$regex': f"(^|\\s){escaped}", '$options': 'i'}},
+        ]}})
+    match = _status_match(status, today)
+    if match:
+        pipeline.append({'$match': match})
+    pipeline += [
+        # username breaks ties, so pages never overlap or skip a patient
+        {'$sort': {SORTS[sort]: -1 if descending else 1, 'username': 1}},
+        {'$facet': {
+            'rows': [{'$skip': page * page_size}, {'$limit': page_size}],
+            'total': [{'$count': 'patients'}],
+        }},
+    ]
+    return pipeline
+
+@timed_span("clinician.patient_page")
+def get_patient_page(clinician, today=None, search="", status=STATUSES[0], sort="Last seen", descending=True,
+                     page=0, page_size=PAGE_SIZE):
+    """One page of the clinician's patients and the total matching, or (None, 0) without a database"""
+    today = today or date.today()
+    result = aggregate_patient_summaries(patient_list_pipeline(clinician, today, search, status, sort, descending, page, page_size))
+    if not result:
+        return None, 0
+    total = result[0]['total'][0]['patients'] if result[0]['total'] else 0
+    return result[0]['rows'], total
+
+def _days_since(value, today):
+    if isinstance(value, datetime):
+        value = value.date()
+    try:
+        day = value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+    return (today - day).days
+
+def _trend(value):
+    if value is None:
+        return "–"
+    if value >= PAIN_RISE:
+        return f"↑ {value:+.1f}"
+    if value <= -PAIN_RISE:
+        return f"↓ {value:+.1f}"
+    return f"→ {value:+.1f}"
+
+def patient_table(rows, today):
+    """Display frame for one page of patients"""
+    return pd.DataFrame({
+        "Patient": [row['username'] for row in rows],
+        "Name": [row.get('name') or "" for row in rows],
+        "Days since surgery": [_days_since(row.get('surgery_date'), today) for row in rows],
+        "Last seen": [row.get('last_seen') or "never" for row in rows],
+        "Days inactive": [_days_since(row.get('last_seen'), today) if row.get('last_seen') else None for row in rows],
+        "Extension (°)": [row.get('extension') for row in rows],
+        "Flexion (°)": [row.get('flexion') for row in rows],
+        "Pain": [row.get('pain_latest') for row in rows],
+        "Pain trend": [_trend(row.get('pain_trend')) for row in rows],
+        f"Active days ({ACTIVE_WINDOW_DAYS} d)": [row.get('active_days', 0) for row in rows],
+    }).astype({"Days since surgery": "Int64", "Days inactive": "Int64", "Pain": "Int64"})
+
+def _manage_patients(clinician):
+    with st.expander("Add or remove a patient"):
+        username = st.text_input("Patient username", key="clinician_patient_username").strip()
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Add patient", key="clinician_add", disabled=not username):
+                success, message = assign_patient(clinician, username)
+                (st.success if success else st.error)(message)
+        with col2:
+            if st.button("Remove patient", key="clinician_remove", disabled=not username):
+                success, message = unassign_patient(clinician, username)
+                (st.success if success else st.error)(message)
+
+def show_clinician_dashboard(clinician):
+    """Render the clinician's patient list: search, status filter, sort and pagination all run in MongoDB"""
+    emit(SECTION_HEADER.render(title="My Patients"))
+    _manage_patients(clinician)
+
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
+    with col1:
+        search = st.text_input("Search patients", key="clinician_search", placeholder="Username or name")
+    with col2:
+        status = st.selectbox("Show", STATUSES, key="clinician_status")
+    with col3:
+        sort = st.selectbox("Sort by", list(SORTS), key="clinician_sort")
+    with col4:
+        descending = st.checkbox("Descending", value=True, key="clinician_descending")
+
+    # Back to the first page whenever the list itself changes
+    view = (search, status, sort, descending)
+    if st.session_state.get('clinician_last_view') != view:
+        st.session_state.clinician_last_view = view
+        st.session_state.clinician_page = 0
+    page = st.session_state.get('clinician_page', 0)
+
+    today = date.today()
+    rows, total = get_patient_page(clinician, today, search, status, sort, descending, page)
+    if rows is None:
+        st.error("Could not load your patients.")
+        return
+    if not rows and page > 0:
+        # The list shrank under the current page (a patient removed elsewhere)
+        st.session_state.clinician_page = 0
+        st.rerun()
+    if not rows:
+        if search or status != STATUSES[0]:
+            st.info("No patients match these filters.")
+        else:
+            st.info("No patients assigned yet. Add one by username above.")
+        return
+
+    st.dataframe(patient_table(rows, today), use_container_width=True, hide_index=True)
+    pages = (total - 1) // PAGE_SIZE + 1
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("◀ Previous", key="clinician_previous", disabled=page == 0):
+            st.session_state.clinician_page = page - 1
+            st.rerun()
+    with col2:
+        st.caption(f"{page * PAGE_SIZE + 1}–{page * PAGE_SIZE + len(rows)} of {total} patients")
+    with col3:
+        if st.button("Next ▶", key="clinician_next", disabled=page + 1 >= pages):
+            st.session_state.clinician_page = page + 1
+            st.rerun()
+    st.caption(f"Active days, the adherence proxy here, count the days with any logged exercise in the last "
+               f"{ACTIVE_WINDOW_DAYS}. They are not the plan adherence on the patient's Progress Dashboard, which scores "
+               "each prescribed exercise against the protocol. Pain trend compares the mean of the last three pain "
+               "scores with the three before.")
@@ -0,0 +1,303 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from db_utils import save_cohort_bands, get_cohort_bands
+from heatmap import to_day_numbers
+from snapshot import run_snapshot, load_manifest, DEFAULT_DIRECTORY
+from perf import timed_span, get_perf_setting
+from metrics import CACHE_LOOKUPS
+
+BUCKET_DAYS = 7
+MAX_DAYS = 364
+N_BUCKETS = MAX_DAYS // BUCKET_DAYS + 1
+PERCENTILES = (10, 50, 90)
+# Fewer patients than this in a day bucket and its band is left empty
+MIN_PATIENTS = 5
+DEFAULT_TTL_SECONDS = 3600
+
+# Per metric: label, unit and the histogram grid (lowest value, highest value, bin width). The forms
+# record half degrees and whole pain levels, so percentiles read off the bins are within half a bin
+METRICS = {
+    'extension_angle': ("Extension", "°", -15.0, 30.0, 0.5),
+    'flexion_angle': ("Flexion", "°", 0.0, 160.0, 0.5),
+    'pain_level': ("Pain", "/10", 0.0, 10.0, 1.0),
+}
+
+def _bins(metric):
+    _, _, low, high, width = METRICS[metric]
+    return int(round((high - low) / width)) + 1
+
+def _read(paths, columns):
+    import pyarrow.parquet as pq
+    frames = [pq.read_table(path, columns=columns).to_pandas(date_as_object=False) for path in paths]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+def bucket_histograms(profile_paths, rom_paths):
+    """Patient counts per (day bucket, value bin) and metric for one user bucket of the snapshot
+
+    Runs in a worker process. Each patient counts once per day bucket, with the mean of their
+    measurements in it, so frequent loggers do not outweigh the others. Histograms add up across
+    buckets, which is what lets the percentiles be computed from the workers' partial results.
+    """
+    profiles = _read(profile_paths, ['username', 'surgery_date']).drop_duplicates('username')
+    rom = _read(rom_paths, ['username', 'date'] + list(METRICS))
+    surgery_days, surgery_valid = to_day_numbers(profiles['surgery_date'])
+    surgery = pd.Series(surgery_days, index=profiles['username'].to_numpy())[surgery_valid]
+
+    days, valid = to_day_numbers(rom['date'])
+    t = days - rom['username'].map(surgery).to_numpy(dtype=float)
+    keep = valid & (t >= 0) & (t <= MAX_DAYS)
+    aligned = rom.loc[keep, ['username'] + list(METRICS)].astype({metric: float for metric in METRICS})
+    aligned['bucket'] = (t[keep] // BUCKET_DAYS).astype(np.int64)
+    per_patient = aligned.groupby(['username', 'bucket'], sort=False)[list(METRICS)].mean().reset_index()
+
+    histograms = {}
+    buckets = per_patient['bucket'].to_numpy()
+    for metric, (_, _, low, _, width) in METRICS.items():
+        values = per_patient[metric].to_numpy()
+        measured = ~np.isnan(values)
+        bins = np.clip(np.rint((values[measured] - low) / width), 0, _bins(metric) - 1).astype(np.int64)
+        cells = buckets[measured] * _bins(metric) + bins
+        histograms[metric] = np.bincount(cells, minlength=N_BUCKETS * _bins(metric)).reshape(N_BUCKETS, _bins(metric))
+    return histograms, int(per_patient['username'].nunique())
+
+def percentile_bands(histogram, low, width):
+    """P10/P50/P90 (nearest rank) per day bucket from a (day bucket, value bin) count matrix"""
+    cumulative = histogram.cumsum(axis=1)
+    patients = cumulative[:, -1]
+    ranks = np.maximum(np.ceil(np.outer(patients, PERCENTILES) / 100), 1)
+    bins = (cumulative[:, None, :] < ranks[:, :, None]).sum(axis=2)
+    bands = low + bins * width
+    bands[patients < MIN_PATIENTS] = np.nan
+    return bands, patients
+
+@timed_span("cohort.build")
+def build_cohort_bands(directory=None, refresh=True, workers=None):
+    """Recompute the cohort bands from the Parquet snapshot, one user bucket per worker process, and store them
+
+    The snapshot (snapshot.py) is brought up to date first unless refresh=False; the live
+    collections are only read for what changed since its last run.
+    """
+    directory = directory or get_perf_setting("snapshot_dir", DEFAULT_DIRECTORY)
+    if refresh:
+        run_snapshot(directory)
+    manifest = load_manifest(directory)
+    if manifest is None:
+        raise ValueError(f"No snapshot in {directory}: run snapshot.py first")
+
+    def paths(kind, bucket):
+        return [os.path.join(directory, path) for path, entry in sorted(manifest['tables'][kind]['files'].items())
+                if entry['user_bucket'] == bucket]
+    tasks = [(paths('profile', bucket), paths('rom_pain', bucket)) for bucket in range(manifest['buckets'])]
+    tasks = [task for task in tasks if task[0] and task[1]]
+
+    workers = int(workers or get_perf_setting("cohort_workers", os.cpu_count() or 1))
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(bucket_histograms, *zip(*tasks)))
+    else:
+        results = [bucket_histograms(*task) for task in tasks]
+
+    document = {
+        'bucket_days': BUCKET_DAYS,
+        'max_days': MAX_DAYS,
+        'percentiles': list(PERCENTILES),
+        'min_patients': MIN_PATIENTS,
+        'patients': sum(patients for _, patients in results),
+        'computed_at': datetime.now(timezone.utc).replace(tzinfo=None),
+        'metrics': {},
+    }
+    for metric, (_, _, low, _, width) in METRICS.items():
+        histogram = sum((histograms[metric] for histograms, _ in results), np.zeros((N_BUCKETS, _bins(metric)), np.int64))
+        bands, patients = percentile_bands(histogram, low, width)
+        document['metrics'][metric] = {'bands': bands.tolist(), 'patients': patients.tolist()}
+
+    success, message = save_cohort_bands(document)
+    if not success:
+        raise ConnectionError(message)
+    invalidate()
+    return document
+
+_table = None
+_loaded_at = float('-inf')
+_lock = threading.Lock()
+
+def _ttl_seconds():
+    try:
+        return float(get_perf_setting("cohort_bands_ttl_seconds", DEFAULT_TTL_SECONDS))
+    except (TypeError, ValueError):
+        return DEFAULT_TTL_SECONDS
+
+def _as_table(document):
+    return {
+        'bucket_days': document['bucket_days'],
+        'patients': document.get('patients', 0),
+        'metrics': {
+            metric: (np.asarray(values['bands'], dtype=float), np.asarray(values['patients'], dtype=np.int64))
+            for metric, values in document['metrics'].items()
+        },
+    }
+
+def get_bands():
+    """Process-wide lookup table (arrays per metric), reloaded from the database once older than the TTL
+
+    None until the batch job has run. Other replicas pick up a new table when their TTL expires.
+    """
+    global _table, _loaded_at
+    if time.monotonic() - _loaded_at < _ttl_seconds():
+        CACHE_LOOKUPS.inc(cache="cohort_bands", result="hit")
+        return _table
+    with _lock:
+        if time.monotonic() - _loaded_at >= _ttl_seconds():
+            document = get_cohort_bands()
+            _table = _as_table(document) if document else None
+            _loaded_at = time.monotonic()
+            CACHE_LOOKUPS.inc(cache="cohort_bands", result="miss")
+        return _table
+
+def invalidate():
+    global _loaded_at
+    with _lock:
+        _loaded_at = float('-inf')
+
+def bands_at(table, metric, days):
+    """(P10, P50, P90) and patient count for each day since surgery: an index into the table, NaN outside it"""
+    bands, patients = table['metrics'][metric]
+    index = np.asarray(days, dtype=np.int64) // table['bucket_days']
+    inside = (index >= 0) & (index < len(bands))
+    result = np.full(index.shape + (len(PERCENTILES),), np.nan)
+    result[inside] = bands[index[inside]]
+    counts = np.zeros(index.shape, dtype=np.int64)
+    counts[inside] = patients[index[inside]]
+    return result, counts
+
+def band_position(value, band):
+    low, median, high = band
+    if np.isnan(median):
+        return None
+    if value < low:
+        return "below the cohort's 10th percentile"
+    if value < median:
+        return "between the cohort's 10th percentile and median"
+    if value <= high:
+        return "between the cohort's median and 90th percentile"
+    return "above the cohort's 90th percentile"
+
+def _patient_curve(rom_pain_log, surgery_date, metric):
+    days, valid = to_day_numbers(rom_pain_log['date'])
+    t = days - int(np.datetime64(pd.Timestamp(surgery_date).date(), 'D').astype(np.int64))
+    values = pd.to_numeric(rom_pain_log[metric], errors='coerce').to_numpy(dtype=float)
+    keep = valid & ~np.isnan(values) & (t >= 0)
+    return pd.Series(values[keep]).groupby(t[keep]).mean()
+
+def cohort_figure(table, curve, metric):
+    label, unit, _, _, _ = METRICS[metric]
+    bands, _ = table['metrics'][metric]
+    shown = ~np.isnan(bands[:, 1])
+    # Each band is drawn at the middle of its day bucket
+    x = (np.arange(len(bands)) * table['bucket_days'] + (table['bucket_days'] - 1) / 2)[shown]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=np.concatenate([x, x[::-1]]),
+        y=np.concatenate([bands[shown, 2], bands[shown, 0][::-1]]),
+        fill='toself',
+        fillcolor='rgba(91, 134, 229, 0.15)',
+        line=dict(width=0),
+        hoverinfo='skip',
+        name='Cohort P10–P90'
+    ))
+    fig.add_trace(go.Scatter(
+        x=x,
+        y=bands[shown, 1],
+        name='Cohort median',
+        line=dict(color='#5b86e5', width=2, dash='dash'),
+        mode='lines',
+    ))
+    fig.add_trace(go.Scatter(
+        x=curve.index,
+        y=curve.to_numpy(),
+        name='You',
+        line=dict(color='#36d1dc', width=3),
+        marker=dict(size=6),
+        mode='lines+markers',
+    ))
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color='rgba(255,255,255,0.7)')
+        ),
+        xaxis=dict(
+            title="Days since surgery",
+            showgrid=False,
+            zeroline=False,
+            color='rgba(255,255,255,0.5)'
+        ),
+        yaxis=dict(
+            title=f"{label} ({unit})",
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.1)',
+            zeroline=False,
+            color='rgba(255,255,255,0.5)'
+        ),
+        font=dict(color='rgba(255,255,255,0.7)'),
+        height=300
+    )
+    return fig
+
+@timed_span("dashboard.cohort_comparison")
+def show_cohort_comparison(rom_pain_log, surgery_date):
+    """Render the patient's ROM or pain curve over the cohort's percentile bands for the dashboard"""
+    table = get_bands()
+    if table is None:
+        st.info("Cohort reference bands have not been computed yet.")
+        return
+
+    metric = st.selectbox("Measure", list(METRICS), format_func=lambda m: METRICS[m][0], key="cohort_metric")
+    if metric not in rom_pain_log.columns:
+        st.info(f"No {METRICS[metric][0].lower()} measurements yet.")
+        return
+    curve = _patient_curve(rom_pain_log, surgery_date, metric)
+    st.plotly_chart(cohort_figure(table, curve, metric), use_container_width=True)
+
+    if len(curve):
+        day, value = int(curve.index[-1]), float(curve.iloc[-1])
+        band, patients = bands_at(table, metric, [day])
+        position = band_position(value, band[0])
+        label, unit = METRICS[metric][:2]
+        if position:
+            st.caption(f"Your latest {label.lower()} ({value:g}{unit}, day {day}) is {position} "
+                       f"({patients[0]} patients at this point of recovery).")
+        else:
+            st.caption(f"Not enough patients in the cohort at day {day} for a comparison.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute the cohort ROM and pain percentile bands")
+    parser.add_argument('--snapshot-dir', help=f"Parquet snapshot to read (default snapshot_dir, {DEFAULT_DIRECTORY})")
+    parser.add_argument('--no-refresh', action='store_true', help="use the snapshot as it is instead of updating it first")
+    parser.add_argument('--workers', type=int, help="worker processes (default cohort_workers, the CPU count)")
+    args = parser.parse_args(argv)
+
+    try:
+        document = build_cohort_bands(args.snapshot_dir, not args.no_refresh, args.workers)
+    except (ConnectionError, ValueError) as e:
+        raise SystemExit(f"Cohort bands failed: {e}")
+    print(f"{document['patients']:,} patients, {N_BUCKETS} buckets of {BUCKET_DAYS} days")
+    return document
+
+if __name__ == '__main__':
+    main()
@@ -4,24 +4,59 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 from datetime import datetime, timedelta
+from heatmap import show_calendar_heatmap
+from training_load import show_training_load
+from load_correlation import show_load_symptom_analysis
+from rom_model import show_recovery_forecast
+from rehab_protocol import get_protocol
+from adherence import show_adherence
+from target_gaps import show_target_gaps
+from cohort import show_cohort_comparison
+from cards import CardTemplate, Raw, emit, SECTION_HEADER, SUBSECTION_HEADER, METRIC_CARD, PHASE_CARD, exercise_card
+
+WELCOME_BANNER = CardTemplate("""
+<div style="text-align: center; margin-bottom: 20px;">
+    <h3 style="color: #ffcc00; text-shadow: 0 0 10px rgba(255, 204, 0, 0.5);">Welcome, $name!</h3>
+    <p>Your recovery journey is progressing at superhuman levels!</p>
+</div>
+""")
+
+TIMELINE = CardTemplate("""
+<div class="chart-container">
+    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
+        <h4 style="margin: 0; color: #36d1dc;">Rehabilitation Timeline</h4>
+        <div style="background: rgba(54, 209, 220, 0.2); padding: 5px 12px; border-radius: 50px; font-size: 14px; color: #36d1dc;">
+            $percent% Complete
+        </div>
+    </div>
+    $stages
+    <div style="height: 6px; background: rgba(255,255,255,0.1); border-radius: 3px; margin: 20px 0; overflow: hidden;">
+        <div style="height: 100%; width: $percent%; background: linear-gradient(90deg, #36d1dc, #5b86e5); border-radius: 3px;"></div>
+    </div>
+    <div style="display: flex; justify-content: space-between; margin-top: 5px;">
+        <span style="font-size: 12px; color: rgba(255,255,255,0.5);">Surgery</span>
+        <span style="font-size: 12px; color: rgba(255,255,255,0.5);">6 Months</span>
+    </div>
+</div>
+""")
+
+RECENT_ACTIVITY_FIELDS = [("Date", 'date_str', ""), ("Category", 'category', ""), ("Sets", 'sets', ""),
+                          ("Reps", 'reps', ""), ("Weight", 'weight', " kg")]
+
+def sorted_by_date(log):
+    """Log sorted by parsed date, taking a single copy of the session data"""
+    dates = pd.to_datetime(log['date'])
+    order = np.argsort(dates.to_numpy(), kind='stable')
+    frame = log.take(order)
+    frame['date'] = dates.to_numpy()[order]
+    return frame
 
 def show_dashboard():
     # Helper functions for status text
+    protocol = get_protocol()
+
     def get_rehab_phase(days):
-        if days < 0:
-            return "Pre-Op - Preparation"
-        elif days < 7:
-            return "Phase 0 - Early Motion"
-        elif days < 21:
-            return "Phase 1 - Initial Recovery"
-        elif days < 42:
-            return "Phase 2 - Progressive Loading"
-        elif days < 90:
-            return "Phase 3 - Strength Building"
-        elif days < 180:
-            return "Phase 4 - Power Development"
-        else:
-            return "Phase 5 - Return to Sport"
+        return protocol.phase_for_day(days)['label']
     
     def get_rom_status(extension, flexion):
         if extension <= 0 and flexion >= 135:
@@ -69,12 +104,7 @@ def show_dashboard():
     # Get user information
     if 'name' in st.session_state.user_data.columns and st.session_state.user_data['name'].values[0]:
         user_name = st.session_state.user_data['name'].values[0]
-        st.markdown(f"""
-        <div style="text-align: center; margin-bottom: 20px;">
-            <h3 style="color: #ffcc00; text-shadow: 0 0 10px rgba(255, 204, 0, 0.5);">Welcome, {user_name}!</h3>
-            <p>Your recovery journey is progressing at superhuman levels!</p>
-        </div>
-        """, unsafe_allow_html=True)
+        emit(WELCOME_BANNER.render(name=user_name))
     
     # Calculate days since surgery
     days_since_surgery = None
@@ -92,23 +122,13 @@ def show_dashboard():
     
     with col1:
         if days_since_surgery is not None:
-            st.markdown(f"""
-            <div class="metric-container">
-                <div class="metric-label">DAYS SINCE SURGERY</div>
-                <div class="metric-value">{days_since_surgery}</div>
-                <div style="font-size: 14px; color: rgba(255,255,255,0.7);">{get_rehab_phase(days_since_surgery)}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            emit(METRIC_CARD.render(label="DAYS SINCE SURGERY", value=days_since_surgery, value_style="",
+                                    caption=get_rehab_phase(days_since_surgery)))
     
     with col2:
         total_exercises = len(st.session_state.exercise_log)
-        st.markdown(f"""
-        <div class="metric-container">
-            <div class="metric-label">EXERCISES LOGGED</div>
-            <div class="metric-value">{total_exercises}</div>
-            <div style="font-size: 14px; color: rgba(255,255,255,0.7);">Keep pushing your limits!</div>
-        </div>
-        """, unsafe_allow_html=True)
+        emit(METRIC_CARD.render(label="EXERCISES LOGGED", value=total_exercises, value_style="",
+                                caption="Keep pushing your limits!"))
     
     with col3:
         # Calculate current ROM if data exists
@@ -125,13 +145,8 @@ def show_dashboard():
         
         if current_extension is not None and current_flexion is not None:
             rom_emoji = "🔥" if current_extension <= 0 and current_flexion >= 120 else "💪"
-            st.markdown(f"""
-            <div class="metric-container">
-                <div class="metric-label">CURRENT ROM</div>
-                <div class="metric-value" style="font-size: 1.8rem;">Ext: {current_extension}° | Flex: {current_flexion}°</div>
-                <div style="font-size: 14px; color: rgba(255,255,255,0.7);">{get_rom_status(current_extension, current_flexion)}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            emit(METRIC_CARD.render(label="CURRENT ROM", value=f"Ext: {current_extension}° | Flex: {current_flexion}°",
+                                    value_style="font-size: 1.8rem;", caption=get_rom_status(current_extension, current_flexion)))
     
     with col4:
         # Calculate current pain level if data exists
@@ -144,94 +159,45 @@ def show_dashboard():
         if current_pain is not None:
             pain_emoji = "🌟" if current_pain <= 2 else "😐" if current_pain <= 5 else "😣"
             pain_color = "#36d1dc" if current_pain <= 2 else "#ffab00" if current_pain <= 5 else "#ff6b6b"
-            st.markdown(f"""
-            <div class="metric-container">
-                <div class="metric-label">PAIN LEVEL</div>
-                <div class="metric-value" style="color: {pain_color};">{current_pain}/10</div>
-                <div style="font-size: 14px; color: rgba(255,255,255,0.7);">{get_pain_status(current_pain)}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            emit(METRIC_CARD.render(label="PAIN LEVEL", value=f"{current_pain}/10", value_style=f"color: {pain_color};",
+                                    caption=get_pain_status(current_pain)))
     
     # Create recovery insights section
-    st.markdown("""
-    <div style="margin: 30px 0 20px 0;">
-        <h3 style="color: #36d1dc; border-bottom: 1px solid rgba(255,255,255,0.1); padding-bottom: 10px;">
-            Recovery Insights
-        </h3>
-    </div>
-    """, unsafe_allow_html=True)
+    emit(SECTION_HEADER.render(title="Recovery Insights"))
     
     # Add a progress timeline
     if days_since_surgery is not None:
-        # Timeline stages
+        # Timeline stages: the post-op phases of the shared protocol
         timeline_stages = [
-            {"days": 0, "name": "Surgery", "description": "Beginning of your journey", "color": "#36d1dc"},
-            {"days": 7, "name": "Phase 1", "description": "Early motion & pain control", "color": "#4cc4dc"},
-            {"days": 21, "name": "Phase 2", "description": "Progressive loading", "color": "#5cacdc"},
-            {"days": 42, "name": "Phase 3", "description": "Strength normalization", "color": "#5b86e5"},
-            {"days": 90, "name": "Phase 4", "description": "Power & return to loading", "color": "#7b74e0"},
-            {"days": 180, "name": "Phase 5", "description": "Return to sport/impact", "color": "#9370db"}
+            {"id": phase['id'], "days": phase['start_day'], "name": phase['name'], "description": phase['focus'], "color": phase['color']}
+            for phase in protocol.post_op_phases()
         ]
         
-        # Calculate current phase
-        current_phase_idx = 0
-        for i, stage in enumerate(timeline_stages):
-            if days_since_surgery >= stage["days"]:
-                current_phase_idx = i
+        # Calculate current phase (before surgery the first post-op phase is next)
+        current_id = protocol.phase_for_day(days_since_surgery)['id']
+        current_phase_idx = next((i for i, stage in enumerate(timeline_stages) if stage["id"] == current_id), 0)
         
         current_phase = timeline_stages[current_phase_idx]
         
         # Create progress card
         progress_percent = min(100, max(0, int((days_since_surgery / timeline_stages[-1]["days"]) * 100)))
         
-        # Use a completely different approach without relying on complex timeline CSS
-        st.markdown(f"""
-        <div class="chart-container">
-            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
-                <h4 style="margin: 0; color: #36d1dc;">Rehabilitation Timeline</h4>
-                <div style="background: rgba(54, 209, 220, 0.2); padding: 5px 12px; border-radius: 50px; font-size: 14px; color: #36d1dc;">
-                    {progress_percent}% Complete
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        # Build simple timeline items individually
-        for i, stage in enumerate(timeline_stages):
-            if i <= current_phase_idx + 1:
-                # Create a background color based on whether this is the current phase
-                bg_color = "rgba(25, 30, 40, 0.3)"
-                if i == current_phase_idx:
-                    # Extract RGB components from hex color for rgba
-                    r = int(stage['color'][1:3], 16)
-                    g = int(stage['color'][3:5], 16)
-                    b = int(stage['color'][5:7], 16)
-                    bg_color = f"rgba({r}, {g}, {b}, 0.15)"
-                
-                # Render a simple card for each phase
-                st.markdown(f"""
-                <div style="padding: 15px; margin-bottom: 15px; border-radius: 8px; background: {bg_color}; border-left: 4px solid {stage['color']};">
-                    <div style="font-weight: 600; color: {stage['color']};">
-                        {stage['name']} {" ← Current" if i == current_phase_idx else ""}
-                    </div>
-                    <div style="margin-top: 5px; color: rgba(255,255,255,0.7);">
-                        Day {stage['days']}+: {stage['description']}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        # Add the progress bar and footer
-        st.markdown(f"""
-            <div style="height: 6px; background: rgba(255,255,255,0.1); border-radius: 3px; margin: 20px 0; overflow: hidden;">
-                <div style="height: 100%; width: {progress_percent}%; 
-                        background: linear-gradient(90deg, #36d1dc, #5b86e5); 
-                        border-radius: 3px;"></div>
-            </div>
-            <div style="display: flex; justify-content: space-between; margin-top: 5px;">
-                <span style="font-size: 12px; color: rgba(255,255,255,0.5);">Surgery</span>
-                <span style="font-size: 12px; color: rgba(255,255,255,0.5);">6 Months</span>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        # The whole timeline (header, phase cards up to the next phase, progress bar) is one markdown delta
+        stage_cards = []
+        for i, stage in enumerate(timeline_stages[:current_phase_idx + 2]):
+            # Highlight the current phase with its color at low opacity
+            bg_color = "rgba(25, 30, 40, 0.3)"
+            if i == current_phase_idx:
+                r, g, b = (int(stage['color'][k:k + 2], 16) for k in (1, 3, 5))
+                bg_color = f"rgba({r}, {g}, {b}, 0.15)"
+            stage_cards.append({
+                'margin': "15px",
+                'background': bg_color,
+                'color': stage['color'],
+                'title': f"{stage['name']}{' ← Current' if i == current_phase_idx else ''}",
+                'description': f"Day {stage['days']}+: {stage['description']}",
+            })
+        emit(TIMELINE.render(percent=progress_percent, stages=PHASE_CARD.render_all(stage_cards)))
     
     # Create charts section
     chart_col1, chart_col2 = st.columns(2)
@@ -239,16 +205,10 @@ def show_dashboard():
     with chart_col1:
         if not st.session_state.rom_pain_log.empty:
             # Prepare ROM data for charting
-            rom_df = st.session_state.rom_pain_log.copy()
-            rom_df['date'] = pd.to_datetime(rom_df['date'])
-            rom_df = rom_df.sort_values('date')
+            rom_df = sorted_by_date(st.session_state.rom_pain_log)
             
             # ROM progression chart
-            st.markdown("""
-            <div style="margin: 20px 0 10px 0;">
-                <h4 style="color: #36d1dc; margin-bottom: 10px;">ROM Progression</h4>
-            </div>
-            """, unsafe_allow_html=True)
+            emit(SUBSECTION_HEADER.render(title="ROM Progression"))
             
             # Create the ROM chart with Plotly
             fig_rom = go.Figure()
@@ -299,17 +259,11 @@ def show_dashboard():
     
     with chart_col2:
         if not st.session_state.rom_pain_log.empty:
-            # Prepare pain data for charting
-            pain_df = st.session_state.rom_pain_log.copy()
-            pain_df['date'] = pd.to_datetime(pain_df['date'])
-            pain_df = pain_df.sort_values('date')
+            # Same date-sorted frame as the ROM chart
+            pain_df = rom_df
             
             # Pain progression chart
-            st.markdown("""
-            <div style="margin: 20px 0 10px 0;">
-                <h4 style="color: #36d1dc; margin-bottom: 10px;">Pain & Swelling Trend</h4>
-            </div>
-            """, unsafe_allow_html=True)
+            emit(SUBSECTION_HEADER.render(title="Pain & Swelling Trend"))
             
             # Create the pain chart with Plotly
             fig_pain = go.Figure()
@@ -360,18 +314,41 @@ def show_dashboard():
             
             st.plotly_chart(fig_pain, use_container_width=True)
     
+    # Recovery curve model with milestone predictions (needs a surgery date to align measurements)
+    if days_since_surgery is not None and not st.session_state.rom_pain_log.empty:
+        emit(SECTION_HEADER.render(title="Recovery Forecast"))
+        
+        try:
+            show_recovery_forecast(st.session_state.rom_pain_log, surgery_date)
+        except Exception as e:
+            st.error(f"Error fitting recovery curves: {e}")
+    
+    # The patient's measurements over the percentile bands of all patients at the same days since surgery
+    if days_since_surgery is not None and not st.session_state.rom_pain_log.empty:
+        emit(SECTION_HEADER.render(title="Cohort Comparison"))
+        
+        try:
+            show_cohort_comparison(st.session_state.rom_pain_log, surgery_date)
+        except Exception as e:
+            st.error(f"Error comparing with the cohort: {e}")
+    
+    # Latest and trending measurements against the current phase's ROM and strength targets
+    if days_since_surgery is not None and not (st.session_state.rom_pain_log.empty and st.session_state.exercise_log.empty):
+        emit(SECTION_HEADER.render(title="Phase Targets"))
+        
+        try:
+            weight = st.session_state.user_data['weight'].values[0] if 'weight' in st.session_state.user_data.columns else None
+            show_target_gaps(st.session_state.exercise_log, st.session_state.rom_pain_log, surgery_date, weight)
+        except Exception as e:
+            st.error(f"Error comparing measurements with phase targets: {e}")
+    
     # Exercise activity section
     if not st.session_state.exercise_log.empty:
-        st.markdown("""
-        <div style="margin: 30px 0 20px 0;">
-            <h3 style="color: #36d1dc; border-bottom: 1px solid rgba(255,255,255,0.1); padding-bottom: 10px;">
-                Exercise Activity
-            </h3>
-        </div>
-        """, unsafe_allow_html=True)
+        emit(SECTION_HEADER.render(title="Exercise Activity"))
         
         # Prepare exercise data
-        ex_df = st.session_state.exercise_log.copy()
+        # Shallow copy: only the date column is replaced, the other columns share the session log's data
+        ex_df = st.session_state.exercise_log.copy(deep=False)
         ex_df['date'] = pd.to_datetime(ex_df['date'])
         
         # Calculate exercise statistics
@@ -380,22 +357,8 @@ def show_dashboard():
             category_counts = ex_df['category'].value_counts().reset_index()
             category_counts.columns = ['category', 'count']
             
-            # Create a calendar heatmap of exercise frequency
-            ex_by_date = ex_df.groupby(ex_df['date'].dt.strftime('%Y-%m-%d')).size().reset_index()
-            ex_by_date.columns = ['date', 'count']
-            ex_by_date['date'] = pd.to_datetime(ex_by_date['date'])
-            
-            # Create a date range for all days
-            date_range = None
-            if len(ex_by_date) > 0:
-                start_date = ex_by_date['date'].min()
-                end_date = ex_by_date['date'].max()
-                date_range = pd.date_range(start=start_date, end=end_date)
-                all_dates = pd.DataFrame({'date': date_range})
-                
-                # Merge with existing data
-                ex_calendar = all_dates.merge(ex_by_date, on='date', how='left').fillna(0)
-                
+            # Only build the charts once at least one entry has a usable date
+            if ex_df['date'].notna().any():
                 # Charts row
                 act_col1, act_col2 = st.columns(2)
                 
@@ -440,67 +403,47 @@ def show_dashboard():
                     </div>
                     """, unsafe_allow_html=True)
                     
-                    # Calendar heatmap
-                    fig_cal = px.bar(
-                        ex_calendar, 
-                        x='date', 
-                        y='count',
-                        color='count',
-                        color_continuous_scale=['#1f2730', '#36d1dc', '#5b86e5']
-                    )
-                    
-                    fig_cal.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        margin=dict(l=10, r=10, t=10, b=10),
-                        xaxis=dict(
-                            showgrid=False, 
-                            zeroline=False,
-                            color='rgba(255,255,255,0.5)'
-                        ),
-                        yaxis=dict(
-                            showgrid=True, 
-                            gridcolor='rgba(255,255,255,0.1)',
-                            zeroline=False,
-                            color='rgba(255,255,255,0.5)'
-                        ),
-                        font=dict(color='rgba(255,255,255,0.7)'),
-                        height=300,
-                        coloraxis_showscale=False
-                    )
-                    
-                    st.plotly_chart(fig_cal, use_container_width=True)
-                
-                # Create recent activity cards
-                st.markdown("""
-                <div style="margin: 20px 0 10px 0;">
-                    <h4 style="color: #36d1dc; margin-bottom: 10px;">Recent Activity</h4>
-                </div>
-                """, unsafe_allow_html=True)
+                    # Calendar heatmap (weeks x weekdays) shared with the exercise tracker
+                    show_calendar_heatmap(ex_df, key="dashboard_calendar")
                 
-                # Get recent exercises (last 5)
+                # Recent activity: the last 5 exercises as cards, sent in one markdown delta
                 recent_ex = ex_df.sort_values('date', ascending=False).head(5)
-                
-                # Display as cards
-                for _, row in recent_ex.iterrows():
-                    date_str = row['date'].strftime('%b %d, %Y')
-                    st.markdown(f"""
-                    <div class="exercise-card">
-                        <h4>{row['exercise']}</h4>
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
-                            <div><span style="color: rgba(255,255,255,0.6);">Date:</span> {date_str}</div>
-                            <div><span style="color: rgba(255,255,255,0.6);">Category:</span> {row['category']}</div>
-                            <div><span style="color: rgba(255,255,255,0.6);">Sets:</span> {row['sets']}</div>
-                            <div><span style="color: rgba(255,255,255,0.6);">Reps:</span> {row['reps']}</div>
-                            <div><span style="color: rgba(255,255,255,0.6);">Weight:</span> {row['weight']} kg</div>
-                        </div>
-                        <div style="font-style: italic; color: rgba(255,255,255,0.8);">{row['notes'] if 'notes' in row and row['notes'] else "No notes"}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                recent_ex = recent_ex.assign(date_str=recent_ex['date'].dt.strftime('%b %d, %Y'))
+                emit(
+                    SUBSECTION_HEADER.render(title="Recent Activity"),
+                    *(exercise_card(row, RECENT_ACTIVITY_FIELDS) for _, row in recent_ex.iterrows()),
+                )
                 
         except Exception as e:
             st.error(f"Error generating exercise charts: {e}")
     
+    # Training load section
+    if not st.session_state.exercise_log.empty:
+        emit(SECTION_HEADER.render(title="Training Load"))
+        
+        try:
+            show_training_load(st.session_state.exercise_log)
+        except Exception as e:
+            st.error(f"Error calculating training load: {e}")
+    
+    # Logged exercises against the protocol's prescriptions (needs a surgery date to place days in phases)
+    if days_since_surgery is not None and not st.session_state.exercise_log.empty:
+        emit(SECTION_HEADER.render(title="Plan Adherence"))
+        
+        try:
+            show_adherence(st.session_state.exercise_log, surgery_date)
+        except Exception as e:
+            st.error(f"Error calculating plan adherence: {e}")
+    
+    # Relate training load to the pain/swelling that follows it
+    if not st.session_state.exercise_log.empty and not st.session_state.rom_pain_log.empty:
+        emit(SECTION_HEADER.render(title="Load vs Pain & Swelling"))
+        
+        try:
+            show_load_symptom_analysis(st.session_state.exercise_log, st.session_state.rom_pain_log)
+        except Exception as e:
+            st.error(f"Error analysing load and symptoms: {e}")
+    
     # Wrap up with an encouragement card at the bottom
     st.markdown("""
     <div class="achievement-box" style="margin-top: 30px;">
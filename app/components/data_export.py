@@ -0,0 +1,151 @@
+import argparse
+import os
+from datetime import date
+from itertools import islice
+import pandas as pd
+from db_utils import export_cursor
+from perf import timed_span, get_perf_setting
+
+DEFAULT_BATCH_SIZE = 5000
+KINDS = ['profile', 'exercise', 'rom_pain']
+FORMATS = {'csv': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+
+# Exported columns per collection and their types. Fixing them up front keeps the CSV header and the
+# Parquet schema the same for every batch, whatever fields the first documents happen to have
+FIELDS = {
+    'profile': {
+        'username': 'text', 'name': 'text', 'age': 'int', 'weight': 'float', 'height': 'float',
+        'surgery_date': 'date', 'injury_type': 'text',
+    },
+    'exercise': {
+        'username': 'text', 'date': 'date', 'category': 'text', 'exercise': 'text', 'sets': 'int',
+        'reps': 'int', 'weight': 'float', 'difficulty': 'float', 'notes': 'text',
+    },
+    'rom_pain': {
+        'username': 'text', 'date': 'date', 'extension_angle': 'float', 'flexion_angle': 'float',
+        'pain_level': 'int', 'swelling': 'int', 'notes': 'text',
+    },
+}
+
+def _typed(kind, documents):
+    frame = pd.DataFrame(documents, columns=list(FIELDS[kind]))
+    for column, kind_of in FIELDS[kind].items():
+        values = frame[column]
+        if kind_of == 'text':
+            frame[column] = values.astype('string')
+        elif kind_of == 'date':
+            # Strings from the forms ('' for no surgery date) and datetimes alike
+            frame[column] = pd.to_datetime(values.replace("", None), errors='coerce', format='mixed').dt.normalize()
+        elif kind_of == 'int':
+            frame[column] = pd.to_numeric(values, errors='coerce').round().astype('Int64')
+        else:
+            frame[column] = pd.to_numeric(values, errors='coerce').astype(float)
+    return frame
+
+def iter_batches(kind, usernames=None, start=None, end=None, batch_size=None):
+    """Typed DataFrames of at most batch_size documents, read from a server-side cursor
+
+    The user and date filters run in the query. At least one (possibly empty) frame is yielded, so
+    an empty export still gets its header or schema.
+    """
+    batch_size = int(batch_size or get_perf_setting("export_batch_size", DEFAULT_BATCH_SIZE))
+    cursor = export_cursor(kind, list(FIELDS[kind]), usernames, start, end, batch_size)
+    if cursor is None:
+        raise ConnectionError("Database connection failed")
+    try:
+        first = True
+        while True:
+            documents = list(islice(cursor, batch_size))
+            if not documents and not first:
+                break
+            first = False
+            yield _typed(kind, documents)
+    finally:
+        cursor.close()
+
+def _text_dates(kind, frame):
+    # CSV and JSONL carry dates the way the forms write them
+    for column, kind_of in FIELDS[kind].items():
+        if kind_of == 'date':
+            frame[column] = frame[column].dt.strftime("%Y-%m-%d")
+    return frame
+
+def _write_csv(path, kind, batches):
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as out:
+        for frame in batches:
+            _text_dates(kind, frame).to_csv(out, header=out.tell() == 0, index=False)
+            rows += len(frame)
+    return rows
+
+def _write_jsonl(path, kind, batches):
+    rows = 0
+    with open(path, 'w', encoding='utf-8') as out:
+        for frame in batches:
+            if len(frame):
+                _text_dates(kind, frame).to_json(out, orient='records', lines=True, force_ascii=False)
+            rows += len(frame)
+    return rows
+
+def parquet_schema(kind):
+    import pyarrow as pa
+    types = {'text': pa.string(), 'date': pa.date32(), 'int': pa.int64(), 'float': pa.float64()}
+    return pa.schema([(column, types[kind_of]) for column, kind_of in FIELDS[kind].items()])
+
+def _write_parquet(path, kind, batches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = parquet_schema(kind)
+    rows = 0
+    # Every batch is appended as its own row group
+    with pq.ParquetWriter(path, schema) as writer:
+        for frame in batches:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            rows += len(frame)
+    return rows
+
+WRITERS = {'csv': _write_csv, 'jsonl': _write_jsonl, 'parquet': _write_parquet}
+
+@timed_span("export.kind")
+def export_kind(kind, path, fmt='csv', usernames=None, start=None, end=None, batch_size=None):
+    """Stream one collection to a CSV, JSONL or Parquet file batch by batch; returns the rows written"""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported format '{fmt}': use {', '.join(WRITERS)}")
+    return WRITERS[fmt](path, kind, iter_batches(kind, usernames, start, end, batch_size))
+
+def export_data(directory, fmt='csv', kinds=None, usernames=None, start=None, end=None, batch_size=None):
+    """Export profiles and logs to <directory>/<kind>.<format>; returns {kind: (path, rows)}
+
+    usernames=None exports every user. start and end (dates, inclusive) filter the log entries.
+    """
+    os.makedirs(directory, exist_ok=True)
+    written = {}
+    for kind in kinds or KINDS:
+        path = os.path.join(directory, kind + FORMATS[fmt])
+        written[kind] = (path, export_kind(kind, path, fmt, usernames, start, end, batch_size))
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export patient profiles, exercise logs and ROM & pain logs")
+    parser.add_argument('--out', required=True, help="output directory, one file per collection")
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--kind', action='append', choices=KINDS, dest='kinds', help="collection to export (repeatable, default all)")
+    parser.add_argument('--user', action='append', dest='usernames', help="username to export (repeatable, default all users)")
+    parser.add_argument('--start', type=date.fromisoformat, help="first log date, YYYY-MM-DD")
+    parser.add_argument('--end', type=date.fromisoformat, help="last log date, YYYY-MM-DD")
+    parser.add_argument('--batch-size', type=int, help=f"documents per cursor batch and write (default {DEFAULT_BATCH_SIZE})")
+    args = parser.parse_args(argv)
+
+    try:
+        written = export_data(args.out, args.format, args.kinds, args.usernames, args.start, args.end, args.batch_size)
+    except (ConnectionError, ValueError) as e:
+        raise SystemExit(f"Export failed: {e}")
+    for kind, (path, rows) in written.items():
+        print(f"{kind:<10} {rows:>10,} rows  {path}")
+    return written
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+import json
+import bisect
+import threading
+from collections import deque
+from datetime import datetime
+import bson
+import streamlit as st
+import pandas as pd
+from pymongo import monitoring
+from perf import get_perf_setting, is_operator
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+DEFAULT_SLOW_MS = 100
+SLOW_LOG_LENGTH = 50
+
+# Commands whose first field is not a collection name
+NO_COLLECTION = "-"
+
+def query_shape(value):
+    """The structure of a filter or pipeline with every literal replaced by '?'"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Operator lists ($and, $or, pipelines) keep their structure, plain value lists collapse to one '?'
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value]
+        return "?"
+    return "?"
+
+def _collection_of(command_name, command):
+    if command_name == 'getMore':
+        return command.get('collection', NO_COLLECTION)
+    target = command.get(command_name)
+    return target if isinstance(target, str) else NO_COLLECTION
+
+def _shape_of(command_name, command):
+    if command_name in ('find', 'count', 'distinct'):
+        return query_shape(command.get('filter', command.get('query', {})))
+    if command_name == 'findAndModify':
+        return query_shape(command.get('query', {}))
+    if command_name == 'delete':
+        return [query_shape(d.get('q', {})) for d in command.get('deletes', [])]
+    if command_name == 'update':
+        return [query_shape(u.get('q', {})) for u in command.get('updates', [])]
+    if command_name == 'aggregate':
+        return query_shape(command.get('pipeline', []))
+    if command_name == 'insert':
+        return {'documents': len(command.get('documents', []))}
+    return None
+
+def _documents_of(command_name, command, reply):
+    """Documents returned (reads) or affected (writes) by one command"""
+    if command_name == 'insert':
+        return len(command.get('documents', []))
+    if command_name in ('delete', 'update', 'count'):
+        return int(reply.get('n', 0))
+    if command_name in ('find', 'aggregate', 'getMore'):
+        cursor = reply.get('cursor', {})
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    if command_name == 'findAndModify':
+        return 1 if reply.get('value') is not None else 0
+    return 0
+
+def _encoded_size(document):
+    try:
+        return len(bson.encode(document))
+    except Exception:
+        return 0
+
+class CommandMetrics(monitoring.CommandListener):
+    """Process-wide latency histograms, document counts and bytes per command and collection"""
+
+    def __init__(self, slow_ms=DEFAULT_SLOW_MS):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self._pending.clear()
+            self.slow_operations = deque(maxlen=SLOW_LOG_LENGTH)
+            self.started_at = datetime.now().isoformat(timespec='seconds')
+
+    def started(self, event):
+        # Encoding and inspecting the command happen before the lock, which every pool thread shares
+        command = event.command
+        pending = (_collection_of(event.command_name, command), command, _encoded_size(command))
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = pending
+
+    def succeeded(self, event):
+        self._finish(event, event.reply, failed=False)
+
+    def failed(self, event):
+        self._finish(event, {}, failed=True)
+
+    def _finish(self, event, reply, failed):
+        duration_ms = event.duration_micros / 1000
+        reply_bytes = _encoded_size(reply) if reply else 0
+        with self._lock:
+            collection, command, request_bytes = self._pending.pop(
+                (event.connection_id, event.request_id), (NO_COLLECTION, {}, 0))
+        documents = 0 if failed else _documents_of(event.command_name, command, reply)
+        slow = duration_ms >= self.slow_ms
+        shape = _shape_of(event.command_name, command) if slow else None
+
+        with self._lock:
+            key = (event.command_name, collection)
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = {'count': 0, 'failures': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'documents': 0,
+                         'bytes_sent': 0, 'bytes_received': 0, 'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+                self._stats[key] = stats
+            stats['count'] += 1
+            stats['failures'] += failed
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['buckets'][bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+            stats['bytes_sent'] += request_bytes
+            stats['bytes_received'] += reply_bytes
+            stats['documents'] += documents
+
+            if slow:
+                self.slow_operations.append({
+                    'at': datetime.now().isoformat(timespec='milliseconds'),
+                    'command': event.command_name,
+                    'collection': collection,
+                    'duration_ms': round(duration_ms, 3),
+                    'failed': failed,
+                    'shape': shape,
+                })
+
+    def snapshot(self):
+        """Copy of the current metrics as plain data (JSON-serialisable)"""
+        with self._lock:
+            operations = [
+                {'command': command, 'collection': collection, **stats, 'buckets': list(stats['buckets'])}
+                for (command, collection), stats in sorted(self._stats.items())
+            ]
+            return {
+                'since': self.started_at,
+                'slow_ms': self.slow_ms,
+                'bucket_bounds_ms': list(LATENCY_BUCKETS_MS),
+                'operations': operations,
+                'slow_operations': list(self.slow_operations),
+            }
+
+def _slow_threshold():
+    try:
+        return float(get_perf_setting("db_slow_ms", DEFAULT_SLOW_MS))
+    except (TypeError, ValueError):
+        return DEFAULT_SLOW_MS
+
+# Shared by every MongoClient created in init_connection()
+command_metrics = CommandMetrics(_slow_threshold())
+
+def bucket_percentile(buckets, fraction):
+    """Upper bound (ms) of the bucket holding the given fraction of calls"""
+    total = sum(buckets)
+    if total == 0:
+        return None
+    running = 0
+    for bound, count in zip(list(LATENCY_BUCKETS_MS) + [float('inf')], buckets):
+        running += count
+        if running >= fraction * total:
+            return bound
+    return float('inf')
+
+def metrics_frame(snapshot=None):
+    """One row per (command, collection) with mean/max latency, histogram percentiles, documents and bytes"""
+    snapshot = snapshot or command_metrics.snapshot()
+    rows = []
+    for op in snapshot['operations']:
+        rows.append({
+            'command': op['command'],
+            'collection': op['collection'],
+            'calls': op['count'],
+            'failures': op['failures'],
+            'total_ms': round(op['total_ms'], 1),
+            'mean_ms': round(op['total_ms'] / op['count'], 2) if op['count'] else 0.0,
+            'p50_ms': bucket_percentile(op['buckets'], 0.5),
+            'p95_ms': bucket_percentile(op['buckets'], 0.95),
+            'max_ms': round(op['max_ms'], 2),
+            'documents': op['documents'],
+            'kb_sent': round(op['bytes_sent'] / 1024, 1),
+            'kb_received': round(op['bytes_received'] / 1024, 1),
+        })
+    frame = pd.DataFrame(rows)
+    if not frame.empty:
+        frame = frame.sort_values('total_ms', ascending=False).reset_index(drop=True)
+    return frame
+
+def dump_metrics(path=None):
+    """Metrics snapshot as JSON, written to `path` when given"""
+    document = json.dumps(command_metrics.snapshot(), indent=2, default=str)
+    if path:
+        with open(path, 'w') as f:
+            f.write(document)
+    return document
+
+def show_db_metrics_panel(username):
+    """Sidebar view of the Mongo command metrics for operators"""
+    if not is_operator(username):
+        return
+
+    with st.sidebar.expander("🗄️ Database"):
+        snapshot = command_metrics.snapshot()
+        frame = metrics_frame(snapshot)
+        if frame.empty:
+            st.info("No MongoDB commands recorded yet.")
+            return
+
+        st.caption(f"Since {snapshot['since']}, process-wide. Percentiles are histogram bucket upper bounds.")
+        st.dataframe(frame, use_container_width=True, hide_index=True)
+
+        slow = snapshot['slow_operations']
+        st.markdown(f"**Slow operations** (≥ {snapshot['slow_ms']:g} ms): {len(slow)}")
+        for op in reversed(slow[-5:]):
+            st.code(f"{op['command']} {op['collection']} {op['duration_ms']:.1f} ms\n{json.dumps(op['shape'], default=str)}",
+                    language="json")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Download", data=dump_metrics(), file_name="db_metrics.json",
+                               mime="application/json", key="db_metrics_download")
+        with col2:
+            if st.button("Reset", key="db_metrics_reset"):
+                command_metrics.reset()
+                st.rerun()
@@ -1,11 +1,19 @@
 import os
+import time
+import hashlib
 import pymongo
+import threading
 import streamlit as st
 from pymongo import MongoClient
 from passlib.hash import pbkdf2_sha256
 from dotenv import load_dotenv
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
+from power_level import exercise_power, rom_pain_power, power_level_from_logs, DEFAULT_DIFFICULTY
+from perf import timed_span, get_perf_setting
+from db_metrics import command_metrics
+from metrics import AUTH_SECONDS, PASSWORD_HASH_SECONDS
+import user_directory
 
 # Load environment variables
 load_dotenv()
@@ -44,15 +52,34 @@ def init_connection():
             serverSelectionTimeoutMS=10000,    # Give servers more time to respond
             retryWrites=True,                  # Retry write operations if they fail
             connectTimeoutMS=30000,            # Longer connection timeout
-            socketTimeoutMS=30000              # Longer socket timeout
+            socketTimeoutMS=30000,             # Longer socket timeout
+            event_listeners=[command_metrics]  # Per-command latency, documents and bytes (db_metrics.py)
         )
         # Test the connection
         client.admin.command('ping')
+        ensure_indexes(client.acl_rehab_db)
         return client
     except Exception as e:
         st.error(f"Error connecting to MongoDB: {e}")
         return None
 
+# Indexes behind the per-user reads and writes, the change log and the clinician list (idempotent)
+INDEXES = [
+    ('exercises', [('username', 1), ('date', -1)], {}),
+    ('rom_pain', [('username', 1), ('date', -1)], {}),
+    ('profiles', [('username', 1)], {}),
+    ('data_changes', [('username', 1), ('kind', 1)], {'unique': True}),
+    ('patient_summaries', [('username', 1)], {'unique': True}),
+    ('patient_summaries', [('clinicians', 1), ('username', 1)], {}),
+]
+
+def ensure_indexes(db):
+    for collection, keys, options in INDEXES:
+        try:
+            db[collection].create_index(keys, **options)
+        except Exception as e:
+            st.warning(f"Could not create index on {collection}: {e}")
+
 # Get database
 def get_database():
     client = init_connection()
@@ -60,14 +87,30 @@ def get_database():
         return client.acl_rehab_db
     return None
 
+# At most password_workers PBKDF2 runs at once. The calling script thread still waits for its own
+# hash (hashlib releases the GIL meanwhile); a burst of logins queues here instead of taking every
+# core away from other sessions' reruns
+def _password_workers():
+    try:
+        return max(1, int(get_perf_setting("password_workers", min(4, os.cpu_count() or 1))))
+    except (TypeError, ValueError):
+        return 1
+
+_password_slots = threading.BoundedSemaphore(_password_workers())
+
+def _timed_hash(operation, function, *args):
+    with _password_slots, PASSWORD_HASH_SECONDS.time(operation=operation):
+        return function(*args)
+
 # User authentication functions
 def hash_password(password):
-    return pbkdf2_sha256.hash(password)
+    return _timed_hash("hash", pbkdf2_sha256.hash, password)
 
 def verify_password(stored_password, provided_password):
-    return pbkdf2_sha256.verify(provided_password, stored_password)
+    return _timed_hash("verify", pbkdf2_sha256.verify, provided_password, stored_password)
 
 # User management
+@timed_span("db.create_user")
 def create_user(username, password, email=None):
     db = get_database()
     if db is None:
@@ -85,6 +128,7 @@ def create_user(username, password, email=None):
         "username": username,
         "password": hashed_password,
         "email": email,
+        "power_level": 0,
         "created_at": datetime.now()
     }
     
@@ -94,7 +138,14 @@ def create_user(username, password, email=None):
     except Exception as e:
         return False, f"Error creating user: {e}"
 
+@timed_span("db.authenticate_user")
 def authenticate_user(username, password):
+    start = time.perf_counter()
+    success, result = _check_credentials(username, password)
+    AUTH_SECONDS.observe(time.perf_counter() - start, result="success" if success else "failure")
+    return success, result
+
+def _check_credentials(username, password):
     db = get_database()
     if db is None:
         return False, "Database connection failed"
@@ -108,7 +159,126 @@ def authenticate_user(username, password):
     else:
         return False, "Incorrect password"
 
+# Change tracking for the snapshot job (snapshot.py): every write of a user's profile or log upserts
+# {username, kind, updated_at} in data_changes, so a run only re-reads the users written since the last
+def _record_change(db, username, kind):
+    db.data_changes.update_one(
+        {"username": username, "kind": kind},
+        {"$set": {"updated_at": datetime.now(timezone.utc).replace(tzinfo=None)}},
+        upsert=True
+    )
+
+# Per-patient summaries read by the clinician list (clinician.py) instead of each patient's profile and logs:
+# name, surgery date, last active days, latest ROM and the mean of the last PAIN_WINDOW pain scores against
+# the PAIN_WINDOW before. The document also holds the patient's clinicians, so the list needs no join
+SUMMARY_ACTIVE_DAYS = 28
+PAIN_WINDOW = 3
+SUMMARY_BATCH_USERS = 500
+
+def _day_text(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return value or None
+
+def _exercise_summary_pipeline(usernames):
+    return [
+        {"$match": {"username": {"$in": usernames}}},
+        # Distinct days with an entry, newest first
+        {"$group": {"_id": {"username": "$username", "date": "$date"}}},
+        {"$sort": {"_id.username": 1, "_id.date": -1}},
+        {"$group": {"_id": "$_id.username", "days": {"$push": "$_id.date"}}},
+        {"$project": {"last_exercise": {"$arrayElemAt": ["$days", 0]}, "exercise_days": {"$slice": ["$days", SUMMARY_ACTIVE_DAYS]}}},
+    ]
+
+def _rom_pain_summary_pipeline(usernames):
+    return [
+        {"$match": {"username": {"$in": usernames}}},
+        {"$sort": {"username": 1, "date": -1}},
+        {"$group": {
+            "_id": "$username",
+            "last_rom": {"$first": "$date"},
+            "extension": {"$first": "$extension_angle"},
+            "flexion": {"$first": "$flexion_angle"},
+            "pain": {"$push": "$pain_level"},
+        }},
+        # Only the newest 2 * PAIN_WINDOW scores are unwound; the two windows are averaged by position
+        {"$project": {"last_rom": 1, "extension": 1, "flexion": 1, "pain": {"$slice": ["$pain", 2 * PAIN_WINDOW]}}},
+        {"$unwind": {"path": "$pain", "includeArrayIndex": "position", "preserveNullAndEmptyArrays": True}},
+        {"$group": {
+            "_id": "$_id",
+            "last_rom": {"$first": "$last_rom"},
+            "extension": {"$first": "$extension"},
+            "flexion": {"$first": "$flexion"},
+            "pain_latest": {"$first": "$pain"},
+            "pain_recent": {"$avg": {"$cond": [{"$lt": ["$position", PAIN_WINDOW]}, "$pain", None]}},
+            "pain_previous": {"$avg": {"$cond": [{"$gte": ["$position", PAIN_WINDOW]}, "$pain", None]}},
+        }},
+    ]
+
+def _refresh_summaries(db, usernames):
+    refreshed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    for start in range(0, len(usernames), SUMMARY_BATCH_USERS):
+        batch = list(usernames[start:start + SUMMARY_BATCH_USERS])
+        summaries = {username: {
+            "username": username, "name": None, "surgery_date": None, "last_exercise": None, "exercise_days": [],
+            "last_rom": None, "extension": None, "flexion": None, "pain_latest": None, "pain_recent": None,
+            "pain_previous": None,
+        } for username in batch}
+        for profile in db.profiles.find({"username": {"$in": batch}}, {"_id": 0, "username": 1, "name": 1, "surgery_date": 1}):
+            summaries[profile["username"]].update(name=profile.get("name"), surgery_date=_day_text(profile.get("surgery_date")))
+        for row in db.exercises.aggregate(_exercise_summary_pipeline(batch)):
+            summaries[row["_id"]].update(
+                last_exercise=_day_text(row.get("last_exercise")),
+                exercise_days=[_day_text(day) for day in row.get("exercise_days", [])],
+            )
+        for row in db.rom_pain.aggregate(_rom_pain_summary_pipeline(batch)):
+            summaries[row["_id"]].update({field: row.get(field) for field in (
+                "last_rom", "extension", "flexion", "pain_latest", "pain_recent", "pain_previous")})
+        for summary in summaries.values():
+            seen = [day for day in (summary["last_exercise"], _day_text(summary["last_rom"])) if day]
+            summary["last_seen"] = max(seen) if seen else None
+            recent, previous = summary["pain_recent"], summary["pain_previous"]
+            summary["pain_trend"] = recent - previous if recent is not None and previous is not None else None
+            summary["refreshed_at"] = refreshed_at
+        # $set leaves the clinicians alone
+        db.patient_summaries.bulk_write(
+            [pymongo.UpdateOne({"username": username}, {"$set": summary}, upsert=True) for username, summary in summaries.items()],
+            ordered=False
+        )
+
+def _refresh_summary(db, username):
+    # Called once per save, removal or import (not per write batch)
+    try:
+        _refresh_summaries(db, [username])
+    except Exception:
+        # The write itself succeeded; the summary catches up on the patient's next save
+        pass
+
+@timed_span("db.refresh_patient_summaries")
+def refresh_patient_summaries(usernames):
+    """Recompute the clinician-list summaries of these patients from their profiles and logs"""
+    db = get_database()
+    if db is None:
+        return False, "Database connection failed"
+    
+    try:
+        _refresh_summaries(db, list(usernames))
+        return True, "Patient summaries refreshed"
+    except Exception as e:
+        return False, f"Error refreshing patient summaries: {e}"
+
+def data_fingerprint(frame):
+    """Content hash of a profile or log frame (row order included), or None when its cells cannot be hashed"""
+    try:
+        hashes = pd.util.hash_pandas_object(frame, index=False)
+    except Exception:
+        return None
+    digest = hashlib.blake2b(repr(tuple(frame.columns)).encode('utf-8'), digest_size=16)
+    digest.update(hashes.to_numpy().tobytes())
+    return digest.hexdigest()
+
 # Data management functions
+@timed_span("db.save_user_profile")
 def save_user_profile(username, profile_data):
     db = get_database()
     if db is None:
@@ -125,10 +295,14 @@ def save_user_profile(username, profile_data):
             {"$set": profile_dict},
             upsert=True
         )
+        user_directory.record_profile(username, profile_dict.get('name', ''))
+        _record_change(db, username, 'profile')
+        _refresh_summary(db, username)
         return True, "Profile saved successfully"
     except Exception as e:
         return False, f"Error saving profile: {e}"
 
+@timed_span("db.get_user_profile")
 def get_user_profile(username):
     db = get_database()
     if db is None:
@@ -153,6 +327,7 @@ def get_user_profile(username):
         st.error(f"Error retrieving profile: {e}")
         return None
 
+@timed_span("db.save_exercise_log")
 def save_exercise_log(username, exercise_data):
     db = get_database()
     if db is None:
@@ -173,10 +348,13 @@ def save_exercise_log(username, exercise_data):
         if exercise_records:
             db.exercises.insert_many(exercise_records)
         
+        _record_change(db, username, 'exercise')
+        _refresh_summary(db, username)
         return True, "Exercise log saved successfully"
     except Exception as e:
         return False, f"Error saving exercise log: {e}"
 
+@timed_span("db.get_exercise_log")
 def get_exercise_log(username):
     db = get_database()
     if db is None:
@@ -200,6 +378,7 @@ def get_exercise_log(username):
             'date', 'category', 'exercise', 'sets', 'reps', 'weight', 'notes', 'username'
         ])
 
+@timed_span("db.save_rom_pain_log")
 def save_rom_pain_log(username, rom_pain_data):
     db = get_database()
     if db is None:
@@ -220,10 +399,13 @@ def save_rom_pain_log(username, rom_pain_data):
         if rom_pain_records:
             db.rom_pain.insert_many(rom_pain_records)
         
+        _record_change(db, username, 'rom_pain')
+        _refresh_summary(db, username)
         return True, "ROM and pain log saved successfully"
     except Exception as e:
         return False, f"Error saving ROM and pain log: {e}"
 
+@timed_span("db.get_rom_pain_log")
 def get_rom_pain_log(username):
     db = get_database()
     if db is None:
@@ -247,43 +429,222 @@ def get_rom_pain_log(username):
             'date', 'extension_angle', 'flexion_angle', 'pain_level', 'swelling', 'notes', 'username'
         ])
 
+# Collections holding each log, for the bulk import path
+LOG_COLLECTIONS = {'exercise': 'exercises', 'rom_pain': 'rom_pain'}
+
+@timed_span("db.get_log_keys")
+def get_log_keys(username, kind, fields):
+    """The identifying fields of a user's existing log entries, used to skip duplicates on import"""
+    db = get_database()
+    if db is None:
+        return pd.DataFrame(columns=fields)
+    
+    try:
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        entries = list(db[LOG_COLLECTIONS[kind]].find({"username": username}, projection, batch_size=10000))
+        return pd.DataFrame(entries, columns=fields)
+    except Exception as e:
+        st.error(f"Error retrieving existing entries: {e}")
+        return pd.DataFrame(columns=fields)
+
+@timed_span("db.bulk_insert_log")
+def bulk_insert_log(username, kind, records):
+    """Insert a batch of validated log entries with one unordered bulk_write
+
+    The patient's clinician-list summary is not refreshed per batch: call refresh_patient_summaries()
+    once after the last one.
+    """
+    db = get_database()
+    if db is None:
+        return False, "Database connection failed"
+    
+    try:
+        result = db[LOG_COLLECTIONS[kind]].bulk_write(
+            [pymongo.InsertOne({**record, 'username': username}) for record in records],
+            ordered=False
+        )
+        _record_change(db, username, kind)
+        return True, f"Imported {result.inserted_count} entries"
+    except Exception as e:
+        return False, f"Error importing entries: {e}"
+
+# Collections read by the export, the logs' entries filtered by date
+EXPORT_COLLECTIONS = {'profile': 'profiles', **LOG_COLLECTIONS}
+
+def export_query(kind, usernames=None, start=None, end=None):
+    """Filter for an export: the users (None for all) and, for the logs, the inclusive date range"""
+    query = {}
+    if usernames is not None:
+        query['username'] = {"$in": list(usernames)}
+    if kind in LOG_COLLECTIONS and (start is not None or end is not None):
+        # The tracker stores dates as "YYYY-MM-DD" strings and the ROM form as datetimes; the server
+        # compares values within one BSON type, so each representation gets its own range
+        as_text, as_datetime = {}, {}
+        if start is not None:
+            as_text["$gte"] = start.strftime("%Y-%m-%d")
+            as_datetime["$gte"] = datetime(start.year, start.month, start.day)
+        if end is not None:
+            as_text["$lte"] = end.strftime("%Y-%m-%d")
+            as_datetime["$lt"] = datetime(end.year, end.month, end.day) + pd.Timedelta(days=1)
+        query["$or"] = [{"date": as_text}, {"date": as_datetime}]
+    return query
+
+def export_cursor(kind, fields, usernames=None, start=None, end=None, batch_size=1000):
+    """Server-side cursor over the filtered documents, fetched batch_size at a time (None without a database)"""
+    db = get_database()
+    if db is None:
+        return None
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    return db[EXPORT_COLLECTIONS[kind]].find(export_query(kind, usernames, start, end), projection, batch_size=batch_size)
+
+@timed_span("db.get_changes_since")
+def get_changes_since(since=None):
+    """Users whose profile or logs were written after `since` (naive UTC; None for all), per kind"""
+    db = get_database()
+    if db is None:
+        return None
+    query = {} if since is None else {"updated_at": {"$gt": since}}
+    changes = {kind: set() for kind in EXPORT_COLLECTIONS}
+    for change in db.data_changes.find(query, {"_id": 0, "username": 1, "kind": 1}, batch_size=10000):
+        changes.setdefault(change["kind"], set()).add(change["username"])
+    return changes
+
+@timed_span("db.get_stored_usernames")
+def get_stored_usernames(kind):
+    """Every user with documents in a profile or log collection"""
+    db = get_database()
+    if db is None:
+        return None
+    return set(db[EXPORT_COLLECTIONS[kind]].distinct("username"))
+
+# Clinician-patient assignments (clinician.py), kept on the patient's summary
+@timed_span("db.assign_patient")
+def assign_patient(clinician, username):
+    db = get_database()
+    if db is None:
+        return False, "Database connection failed"
+    
+    try:
+        if not db.users.find_one({"username": username}, {"_id": 1}):
+            return False, f"No patient named {username}"
+        # Patients whose logs predate the summaries get one now
+        if not db.patient_summaries.find_one({"username": username}, {"_id": 1}):
+            _refresh_summaries(db, [username])
+        db.patient_summaries.update_one({"username": username}, {"$addToSet": {"clinicians": clinician}})
+        return True, f"{username} added to your patients"
+    except Exception as e:
+        return False, f"Error assigning patient: {e}"
+
+@timed_span("db.unassign_patient")
+def unassign_patient(clinician, username):
+    db = get_database()
+    if db is None:
+        return False, "Database connection failed"
+    
+    try:
+        removed = db.patient_summaries.update_one({"username": username, "clinicians": clinician},
+                                                  {"$pull": {"clinicians": clinician}})
+        if removed.modified_count:
+            return True, f"{username} removed from your patients"
+        return False, f"{username} is not one of your patients"
+    except Exception as e:
+        return False, f"Error removing patient: {e}"
+
+@timed_span("db.aggregate_patient_summaries")
+def aggregate_patient_summaries(pipeline):
+    db = get_database()
+    if db is None:
+        return None
+    
+    try:
+        return list(db.patient_summaries.aggregate(pipeline, allowDiskUse=True))
+    except Exception as e:
+        st.error(f"Error retrieving patients: {e}")
+        return None
+
+# Cohort percentile bands (cohort.py): one small document read by every replica
+@timed_span("db.save_cohort_bands")
+def save_cohort_bands(bands):
+    db = get_database()
+    if db is None:
+        return False, "Database connection failed"
+    
+    try:
+        db.cohort_bands.replace_one({"_id": "rom_pain"}, bands, upsert=True)
+        return True, "Cohort bands saved"
+    except Exception as e:
+        return False, f"Error saving cohort bands: {e}"
+
+@timed_span("db.get_cohort_bands")
+def get_cohort_bands():
+    db = get_database()
+    if db is None:
+        return None
+    
+    try:
+        return db.cohort_bands.find_one({"_id": "rom_pain"}, {"_id": 0})
+    except Exception as e:
+        st.error(f"Error retrieving cohort bands: {e}")
+        return None
+
+@timed_span("db.remove_exercise_entry")
 def remove_exercise_entry(username, date, exercise):
     db = get_database()
     if db is None:
         return False, "Database connection failed"
     
     try:
-        result = db.exercises.delete_one({
+        removed = db.exercises.find_one_and_delete({
             "username": username, 
             "date": date, 
             "exercise": exercise
         })
         
-        if result.deleted_count > 0:
+        if removed:
+            # Take the entry's power back out of the running counter
+            difficulty = removed.get("difficulty")
+            if difficulty is None or pd.isna(difficulty):
+                difficulty = DEFAULT_DIFFICULTY
+            lost_power = int(exercise_power(removed.get("sets", 0), removed.get("reps", 0), removed.get("weight", 0), difficulty))
+            increment_power_level(username, -lost_power)
+            _record_change(db, username, 'exercise')
+            _refresh_summary(db, username)
             return True, f"Exercise entry removed successfully"
         else:
             return False, "Entry not found"
     except Exception as e:
         return False, f"Error removing exercise entry: {e}"
 
+@timed_span("db.remove_rom_pain_entry")
 def remove_rom_pain_entry(username, date):
     db = get_database()
     if db is None:
         return False, "Database connection failed"
     
     try:
-        result = db.rom_pain.delete_one({
+        removed = db.rom_pain.find_one_and_delete({
             "username": username, 
             "date": date
         })
         
-        if result.deleted_count > 0:
+        if removed:
+            # Take the entry's power back out of the running counter
+            lost_power = int(rom_pain_power(
+                removed.get("extension_angle", 0),
+                removed.get("flexion_angle", 0),
+                removed.get("pain_level", 0),
+                removed.get("swelling", 0)
+            ))
+            increment_power_level(username, -lost_power)
+            _record_change(db, username, 'rom_pain')
+            _refresh_summary(db, username)
             return True, f"ROM/Pain entry removed successfully"
         else:
             return False, "Entry not found"
     except Exception as e:
         return False, f"Error removing ROM/Pain entry: {e}"
 
+@timed_span("db.get_user_list")
 def get_user_list():
     db = get_database()
     if db is None:
@@ -291,8 +652,73 @@ def get_user_list():
     
     try:
         # Get all profile documents
-        profiles = list(db.profiles.find({}, {"username": 1, "name": 1}))
+        profiles = db.profiles.find({}, {"_id": 0, "username": 1, "name": 1}, batch_size=10000)
         return [{"username": p.get("username"), "name": p.get("name", "")} for p in profiles]
     except Exception as e:
         st.error(f"Error retrieving user list: {e}")
         return []
+
+# Login page typeahead: served from a cached prefix index instead of listing every profile per render
+@timed_span("db.search_users")
+def search_users(query="", page=0, page_size=user_directory.PAGE_SIZE):
+    return user_directory.search_users(get_user_list, query, page, page_size)
+
+# Power level is kept as a running counter on the user document so login is a single lookup
+@timed_span("db.get_power_level")
+def get_power_level(username):
+    db = get_database()
+    if db is None:
+        return 0
+    
+    try:
+        user = db.users.find_one({"username": username}, {"power_level": 1})
+        if user and user.get("power_level") is not None:
+            return int(user["power_level"])
+        # Users created before the counter existed get it backfilled once
+        return recompute_power_level(username)
+    except Exception as e:
+        st.error(f"Error retrieving power level: {e}")
+        return 0
+
+@timed_span("db.increment_power_level")
+def increment_power_level(username, amount):
+    db = get_database()
+    if db is None:
+        return None
+    
+    try:
+        user = db.users.find_one_and_update(
+            {"username": username},
+            {"$inc": {"power_level": int(amount)}},
+            projection={"power_level": 1},
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        return int(user["power_level"]) if user else None
+    except Exception as e:
+        st.error(f"Error updating power level: {e}")
+        return None
+
+@timed_span("db.recompute_power_level")
+def recompute_power_level(username):
+    """Rebuild the power level from the stored logs and reset the running counter (used for audits)"""
+    db = get_database()
+    if db is None:
+        return 0
+    
+    try:
+        exercises = pd.DataFrame(list(db.exercises.find(
+            {"username": username}, {"_id": 0, "sets": 1, "reps": 1, "weight": 1, "difficulty": 1}
+        )))
+        rom_pain = pd.DataFrame(list(db.rom_pain.find(
+            {"username": username}, {"_id": 0, "extension_angle": 1, "flexion_angle": 1, "pain_level": 1, "swelling": 1}
+        )))
+        power_level = power_level_from_logs(exercises, rom_pain)
+        
+        db.users.update_one(
+            {"username": username},
+            {"$set": {"power_level": power_level, "power_level_audited_at": datetime.now()}}
+        )
+        return power_level
+    except Exception as e:
+        st.error(f"Error recomputing power level: {e}")
+        return 0
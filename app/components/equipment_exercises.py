@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from lazy_tabs import lazy_tabs
 
 def show_equipment_exercises():
     st.title("Equipment-Based Rehabilitation Exercises")
@@ -10,18 +11,19 @@ def show_equipment_exercises():
     incorporated into your daily routine based on your current phase.
     """)
     
-    # Create tabs for different equipment types
-    tabs = st.tabs([
+    # Sections for different equipment types; only the selected one runs
+    labels = [
         "Foam Roller", 
         "Massage Gun", 
         "Pilates/Stability Ball",
         "Small Ball",
         "Plyometrics",
         "Daily Routines"
-    ])
+    ]
+    section = lazy_tabs(labels, key="equipment_section")
     
     # Foam Roller content
-    with tabs[0]:
+    if section == labels[0]:
         st.subheader("Foam Roller Exercises")
         
         st.markdown("""
@@ -84,7 +86,7 @@ def show_equipment_exercises():
         """)
     
     # Massage Gun content
-    with tabs[1]:
+    if section == labels[1]:
         st.subheader("Massage Gun Protocols")
         
         st.markdown("""
@@ -147,7 +149,7 @@ def show_equipment_exercises():
         """)
     
     # Pilates/Stability Ball content
-    with tabs[2]:
+    if section == labels[2]:
         st.subheader("Pilates/Stability Ball Exercises")
         
         st.markdown("""
@@ -210,7 +212,7 @@ def show_equipment_exercises():
         """)
     
     # Small Ball content
-    with tabs[3]:
+    if section == labels[3]:
         st.subheader("Small Ball Exercises")
         
         st.markdown("""
@@ -273,7 +275,7 @@ def show_equipment_exercises():
         """)
     
     # Plyometrics content
-    with tabs[4]:
+    if section == labels[4]:
         st.subheader("Plyometric Training Progression")
         
         st.markdown("""
@@ -329,7 +331,7 @@ def show_equipment_exercises():
         """)
     
     # Daily Routines content
-    with tabs[5]:
+    if section == labels[5]:
         st.subheader("Daily Rehab Routines by Phase")
         
         st.markdown("""
@@ -0,0 +1,155 @@
+import os
+import re
+import json
+import bisect
+from collections import Counter, defaultdict
+import streamlit as st
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'exercises.json')
+
+# Matches scoring below this are dropped; roughly one typo in a short word still passes
+MIN_SCORE = 0.3
+
+def normalize(text):
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def trigrams(text):
+    """Character trigrams of each word, padded so word starts weigh more (typo-tolerant matching)"""
+    grams = []
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _dice(a, b):
+    """Dice coefficient of two trigram multisets"""
+    return 2 * sum((a & b).values()) / (sum(a.values()) + sum(b.values()))
+
+class ExerciseCatalog:
+    """Exercises by category and name, with token and trigram inverted indexes for ranked fuzzy search"""
+
+    def __init__(self, categories):
+        # category -> exercise names in display order
+        self.categories = {}
+        # exercise name -> {'name', 'category', 'description'}
+        self.exercises = {}
+        for category in categories:
+            names = []
+            for exercise in category['exercises']:
+                self.exercises[exercise['name']] = {
+                    'name': exercise['name'],
+                    'category': category['name'],
+                    'description': exercise.get('description'),
+                }
+                names.append(exercise['name'])
+            self.categories[category['name']] = names
+
+        self._names = list(self.exercises)
+        self._normalized = [normalize(name) for name in self._names]
+        self._by_normalized = {text: i for i, text in enumerate(self._normalized)}
+        self._tokens = defaultdict(set)
+        # trigram -> {exercise index: occurrences}
+        self._trigrams = defaultdict(dict)
+        self._trigram_counts = []
+        # Trigrams of every distinct name word, for per-word similarity
+        self._word_trigrams = {}
+        for i, name in enumerate(self._names):
+            for token in self._normalized[i].split():
+                self._tokens[token].add(i)
+            grams = trigrams(name)
+            self._trigram_counts.append(len(grams))
+            for word in self._normalized[i].split():
+                if word not in self._word_trigrams:
+                    self._word_trigrams[word] = Counter(trigrams(word))
+            for gram, count in Counter(grams).items():
+                self._trigrams[gram][i] = count
+        self._sorted_tokens = sorted(self._tokens)
+
+    @classmethod
+    def from_file(cls, path=CATALOG_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['categories'])
+
+    def get(self, name):
+        return self.exercises.get(name)
+
+    def description(self, name):
+        exercise = self.exercises.get(name)
+        return exercise['description'] if exercise else None
+
+    def category_of(self, name):
+        exercise = self.exercises.get(name)
+        return exercise['category'] if exercise else None
+
+    def _token_prefix_matches(self, prefix):
+        start = bisect.bisect_left(self._sorted_tokens, prefix)
+        matches = set()
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self._tokens[token]
+        return matches
+
+    def search(self, query, category=None, limit=20):
+        """Exercises ranked by how well their name matches query: [{'name', 'category', 'score'}, ...]
+
+        Exact and prefix matches rank first, then names whose words start with every query word,
+        then trigram similarity, which tolerates typos. The similarity averages the whole name's with each
+        query word's best match among the name's words, so a misspelt word ("nordc") still finds a long
+        name. Searches all categories unless one is given.
+        """
+        text = normalize(query or "")
+        if not text:
+            names = self.categories.get(category, []) if category else self._names
+            return [{'name': name, 'category': self.exercises[name]['category'], 'score': 0.0} for name in names[:limit]]
+
+        query_grams = Counter(trigrams(text))
+        query_size = sum(query_grams.values())
+        shared = Counter()
+        for gram, count in query_grams.items():
+            for i, name_count in self._trigrams.get(gram, {}).items():
+                shared[i] += min(count, name_count)
+
+        # Every query word is a prefix of some word in the name
+        words = text.split()
+        word_matches = self._token_prefix_matches(words[0])
+        for word in words[1:]:
+            word_matches &= self._token_prefix_matches(word)
+
+        # Similarity of each query word to a name word, computed once per search since names share words
+        word_grams = [Counter(trigrams(word)) for word in words]
+        word_similarity = {}
+
+        def similarity_to(name_word):
+            if name_word not in word_similarity:
+                word_similarity[name_word] = [_dice(grams, self._word_trigrams[name_word]) for grams in word_grams]
+            return word_similarity[name_word]
+
+        exact = self._by_normalized.get(text)
+        results = []
+        for i in set(shared) | word_matches:
+            name = self._names[i]
+            if category and self.exercises[name]['category'] != category:
+                continue
+            # Dice coefficient over the trigram multisets, averaged with the per-word one
+            whole = 2 * shared[i] / (query_size + self._trigram_counts[i])
+            by_name_word = [similarity_to(name_word) for name_word in self._normalized[i].split()]
+            per_word = sum(max(column) for column in zip(*by_name_word)) / len(words)
+            score = (whole + per_word) / 2
+            if i == exact:
+                score += 3
+            elif self._normalized[i].startswith(text):
+                score += 2
+            elif i in word_matches:
+                score += 1
+            elif text in self._normalized[i]:
+                score += 0.5
+            if score >= MIN_SCORE:
+                results.append({'name': name, 'category': self.exercises[name]['category'], 'score': round(score, 4)})
+        results.sort(key=lambda r: (-r['score'], r['name']))
+        return results[:limit]
+
+@st.cache_resource
+def get_catalog():
+    """Catalog loaded once per process from app/data/exercises.json"""
+    return ExerciseCatalog.from_file()
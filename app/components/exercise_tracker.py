@@ -1,206 +1,28 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from db_utils import remove_exercise_entry
+from db_utils import remove_exercise_entry, get_exercise_log, increment_power_level, get_power_level
+from power_level import exercise_power
 import base64
-import plotly.express as px
+from heatmap import show_calendar_heatmap
+from exercise_catalog import get_catalog
+from lazy_tabs import lazy_tabs
+from cards import emit, DATE_HEADING, METRIC_CARD, exercise_card
+from bulk_import import show_bulk_import
+
+HISTORY_FIELDS = [("Category", 'category', ""), ("Sets", 'sets', ""), ("Reps", 'reps', ""), ("Weight", 'weight', " kg")]
 
 def show_exercise_tracker():
     st.title("Exercise Tracker")
     
-    # Create tabs for logging new exercises and viewing history
-    tab1, tab2 = st.tabs(["Log Exercise", "Exercise History"])
+    # Sections for logging new exercises and viewing history; only the selected one runs
+    section = lazy_tabs(["Log Exercise", "Exercise History"], key="exercise_tracker_section")
     
-    # Exercise descriptions for guidance
-    exercise_descriptions = {
-        # ROM Exercises
-        "Heel Slides": "Lie on your back with legs straight. Slowly slide your heel toward your buttocks, bending your knee as much as comfortable. Hold 3-5 seconds, then slide back.",
-        "Wall Slides": "Sit with your back against a wall, affected leg straight. Slowly slide down the wall, bending the knee. Hold, then slide back up.",
-        "Prone Hangs": "Lie face down with legs extended off the edge of a bed/table. Let gravity gently pull your knee into extension. Great for regaining terminal extension.",
-        "Heel Props": "Place a rolled towel under your heel with leg extended. Relax and let gravity push the knee down. Excellent passive extension exercise.",
-        "Stationary Bike": "Use minimal resistance initially. Focus on increasing range of motion rather than resistance. Great for improving flexion.",
-        "Seated Knee Extensions": "Sit with knees bent, slowly extend one knee until leg is straight. Hold briefly, then lower. Start without weights.",
-        "Patella Mobilizations": "Gently move kneecap in all directions with fingers. Helps prevent scar tissue adhesions around the patella.",
-        "Band-Assisted Knee Flexion": "Loop a band around ankle and pull to assist knee bending. Helps regain flexion with support.",
-        "Band-Assisted Terminal Knee Extension": "Anchor band behind knee, loop around foot. The band helps achieve full extension.",
-        "Supine Active Knee Extension": "Lie on back, hip at 90°. Extend knee as far as possible while maintaining hip position.",
-        "Seated Active Knee Flexion": "Sit with leg extended, actively bend knee as far as possible. Helps regain active flexion.",
-        "Wall Knee Flexion": "Stand facing wall, bend knee to bring foot up behind you. Wall provides balance support.",
-        "Standing Hamstring Stretch": "Place heel on low surface, lean forward at hips keeping back straight. Feel stretch in hamstring.",
-        "Quad Stretch": "Stand on one leg, pull other foot toward buttocks. Feel stretch in front of thigh.",
-        
-        # Strength Exercises
-        "Straight Leg Raises": "Lie on your back with one leg bent and the other straight. Raise the straight leg to the height of the opposite knee. Great for early quad activation.",
-        "Quad Sets": "Sit with leg extended, tighten quad muscle to push back of knee down. Hold 5 seconds. Fundamental for reactivating quad control.",
-        "Hamstring Curls": "Lie face down, bend knee to bring heel toward buttocks. Start without weights, progress as tolerated.",
-        "Glute Bridges": "Lie on back, feet flat. Lift hips toward ceiling by squeezing glutes. Essential for posterior chain strengthening.",
-        "Wall Squats": "Stand with back against wall, slide down until knees are at 45-60°. Hold position. Great controlled squat progression.",
-        "Step-Ups": "Step up onto a platform leading with affected leg. Start with low step, progress height as tolerated.",
-        "Leg Press": "Use machine with light weight initially. Focus on controlled movement through comfortable range.",
-        "Lunges": "Step forward into lunge position. Ensure knee tracks over toes. Start with partial range, progress to full.",
-        "Romanian Deadlifts": "Hold weights, hinge at hips keeping back straight. Excellent for hamstring and posterior chain strength.",
-        "Calf Raises": "Rise onto toes, lower slowly. Can be done double or single leg. Essential for push-off strength.",
-        "Terminal Knee Extensions": "Stand with resistance band around back of knee. Extend knee against resistance. Critical for quad control.",
-        "Reverse Lunges": "Step backward into lunge position. Often better tolerated than forward lunges early in rehab.",
-        "Bulgarian Split Squats": "Stand in lunge position with rear foot elevated. Lower into lunge. Excellent single-leg stability exercise with reduced knee load compared to regular lunges.",
-        "Pistol Squat Progression": "Single leg squat progression. Start with partial range using support, progress to deeper range.",
-        "Good Mornings": "Hinge at hips with slight knee bend. Targets hamstrings and low back. Start without weights.",
-        "Hip Adduction": "Move leg inward against resistance. Works inner thigh muscles important for knee stability.",
-        "Hip Abduction": "Move leg outward against resistance. Critical for hip stability which supports knee function.",
-        "Hip Thrusts": "Similar to glute bridge but shoulders elevated on bench. Advanced glute strengthening.",
-        "Nordic Hamstring Curls": "Kneel with ankles anchored, hands ready to catch yourself. Slowly lower your torso toward the floor, resisting with your hamstrings. Advanced exercise for hamstring strength.",
-        "Lateral Step-Downs": "Stand on step, lower other foot toward floor with controlled knee bend. Excellent for knee stability and control.",
-        "Single-Leg Calf Raises": "Rise onto toes of one foot, lower slowly. Advanced progression for calf strength.",
-        "Walking Lunges": "Continuous lunges while walking forward. More dynamic progression of static lunges.",
-        
-        # Band Exercises
-        "Band Terminal Knee Extensions": "Sit with a band around the ankle, anchored behind you. Start with knee bent, then extend fully against resistance. Crucial for quad control.",
-        "Band Hip Abduction": "Stand with a band around ankles/thighs. Move leg sideways against resistance. Strengthens hip stabilizers important for knee control.",
-        "Band Hip Adduction": "Stand with one end of band anchored, loop around the inside of ankle. Pull leg inward against resistance. Works inner thigh muscles.",
-        "Band Lateral Walks": "Place band around ankles/thighs. Take sidesteps while maintaining tension. Great for hip stabilizers and preventing knee valgus.",
-        "Band Monster Walks": "Place band around ankles/thighs. Walk forward with small steps, maintaining outward tension. Activates glutes and teaches proper knee alignment.",
-        "Band Hamstring Curls": "Anchor band in front, loop around ankle. Bend knee against resistance to work hamstrings. Crucial for ACL protection.",
-        "Band Glute Bridges": "Lie on back with band above knees. Perform bridge by lifting hips. Band adds resistance to glutes, essential for knee stability.",
-        "Band Standing Leg Press": "Anchor band under foot, hold other end in hands. Press leg back against resistance. Modified leg press for early strength building.",
-        "Band Hip Extensions": "Anchor band in front, loop around ankle. Extend leg behind you against resistance. Targets glutes and hamstrings.",
-        "Band Squats": "Stand on band with feet shoulder-width, hold ends at shoulders. Squat against resistance. Adds variable resistance to the squat pattern.",
-        "Band Seated Row": "Sit with legs extended, band around feet. Pull band toward torso. Improves upper body posture which affects lower body mechanics.",
-        "Band Clamshells": "Lie on side with band around knees, open knees while keeping feet together. Excellent for gluteus medius activation.",
-        "Band Pull-Aparts": "Hold band in both hands at chest height. Pull apart, keeping arms straight. Strengthens upper back which improves overall posture during leg exercises.",
-        "Band Deadlifts": "Stand on middle of band, holding ends. Perform deadlift motion against resistance. Total-body exercise that teaches proper hip-hinge mechanics.",
-        "Band Standing Leg Abduction": "Anchor band at ankle level, loop around ankle. Abduct leg against resistance while standing. More functional position than lying.",
-        "Band Lateral Raises": "Stand on band, raise arms out to sides. Upper body strength to complement lower body rehabilitation.",
-        
-        # Balance & Neuromuscular
-        "Single-Leg Balance": "Stand on affected leg, maintain balance. Progress by closing eyes or standing on unstable surface. Fundamental exercise for proprioception.",
-        "Mini-Trampoline": "Gentle bouncing on trampoline. Good for proprioception and low-impact loading of knee.",
-        "Wobble Board": "Stand on wobble board, maintain balance. Progress from double-leg to single-leg stance. Excellent for ankle and knee proprioception.",
-        "Bosu Ball": "Balance on flat or rounded side. More challenging than wobble board. Great for advanced proprioception training.",
-        "Y-Balance Training": "Balance on one leg while reaching other leg in three directions. Excellent functional assessment and training tool.",
-        "Side Stepping with Band": "Place band around ankles or above knees. Take side steps while maintaining tension. Good for hip stabilizers.",
-        "Tandem Walking": "Walk heel-to-toe as if on a tightrope. Great for balance and proprioception.",
-        "Single-Leg Deadlift": "Balance on one leg, hinge at hips reaching toward floor. Combines balance and strength training.",
-        "Single-Leg Squat": "Squat on one leg with other leg extended. Advanced exercise for knee stability and strength.",
-        "Balance Reach Exercises": "Balance on one leg while reaching other leg in different directions. Progressive challenge to stability.",
-        "Agility Ladder Drills": "Various foot patterns through ladder on ground. Good for neuromuscular control and agility.",
-        "Ball Toss with Balance": "Stand on one leg while tossing/catching a ball. Adds cognitive challenge to balance task.",
-        "Single-Leg Clock Tap": "Balance on one leg, tap foot to clock positions (12, 3, 6, 9) while maintaining balance. Great for controlled stability.",
-        "STAR Excursion Balance": "Similar to Y-balance but with more reaching directions. Advanced proprioceptive challenge.",
-        "Band-Resisted Balance Work": "Maintain balance while band creates perturbation forces. Advanced proprioceptive training.",
-        
-        # Plyometrics
-        "Double-Leg Hops": "Start with small, controlled hops in place. Progress to forward/backward and side-to-side. Focus on soft landings with bent knees.",
-        "Lateral Hops": "Jump side to side over line or small object. Start small, progress distance and height. Important for change of direction confidence.",
-        "Box Jumps": "Jump onto raised platform, step down. Focus on soft, controlled landing. Height progressions based on control.",
-        "Lunge Jumps": "Start in lunge position, jump and switch legs mid-air. Advanced plyometric for power development.",
-        "Depth Jumps": "Step off box, land and immediately jump again. Advanced plyometric for reactive strength.",
-        "Skater Jumps": "Lateral jumps landing on one leg, mimicking skating motion. Great for lateral stability and power.",
-        "Broad Jumps": "Jump forward for distance with double-leg takeoff and landing. Power development with horizontal emphasis.",
-        "Tuck Jumps": "Jump straight up, bringing knees toward chest. Advanced plyometric for vertical power.",
-        "Split Jumps": "Similar to lunge jumps but with more vertical emphasis. Good progression before more intense plyometrics.",
-        "Single-Leg Hops": "Hopping on one leg in different directions. Advanced progression requiring good stability and strength.",
-        "Jump Rope": "Basic jumping or running in place with rope. Low-level plyometric with good endurance component.",
-        "Reactive Squat Jumps": "Quickly transition from landing to jumping again. Tests and builds reactive strength.",
-        "Lateral Bound": "Powerful lateral jumps emphasizing distance. More advanced than lateral hops.",
-        "Forward/Backward Bound": "Powerful jumps forward or backward. Tests linear power development.",
-        "Band-Resisted Jumps": "Place band around thighs. Perform small jumps against resistance. Teaches proper landing mechanics with external feedback.",
-        "Drop Jumps": "More intense version of depth jumps focusing on minimal ground contact time. Advanced plyometric.",
-        
-        # Martial Arts Training
-        "Shadow Boxing": "Practice punches and defensive movements without contact. Low-impact way to maintain conditioning.",
-        "Front Kick Drills": "Practice front kicks with focus on control and gradually increasing height. Good for hip flexor strength and knee control.",
-        "Roundhouse Kick": "Circular kick targeting side of opponent. Start with low height, progress as tolerated. Good for hip rotation and control.",
-        "Side Kick": "Linear kick to side with blade of foot. Start low and controlled, progress height. Good for hip abductor strength.",
-        "Defensive Footwork": "Practice movement patterns focusing on proper foot placement and weight shifting. Essential for safe return to sport.",
-        "Speed Bag": "Quick rhythmic punching of suspended bag. Good hand-eye coordination and endurance.",
-        "Heavy Bag": "Striking larger bag with punches and kicks. Progress intensity and techniques as knee tolerates.",
-        "Technical Sparring": "Light contact practice with partner. Emphasize control rather than power during rehabilitation.",
-        "Slow Motion Kicks": "Perform kicks at reduced speed focusing on perfect form. Great for regaining neuromuscular control.",
-        "Stance Transitions": "Practice shifting between fighting stances smoothly. Builds lower body control and stability.",
-        "Band-Resisted Kicks": "Perform kicks against band resistance. Builds strength in specific kicking patterns.",
-        "Knee Strike Practice": "Practice knee strike techniques gradually. Direct knee strengthening in functional pattern.",
-        "Focus Mitt Work": "Strike partner-held targets. Partner can adjust height and position based on rehabilitation stage.",
-        "Agility Ladder": "Footwork drills through ladder on ground. Builds agility and foot coordination.",
-        "Controlled Pivoting": "Practice pivot movements slowly with focus on technique. Critical for knee confidence in rotational movements.",
-        "Slide Steps": "Practice sliding step techniques common in martial arts. Low-impact movement pattern training.",
-        "Blocking Drills": "Practice defensive blocking techniques. May involve less knee stress than attacking techniques.",
-        
-        # Recovery
-        "Foam Rolling": "Self-myofascial release using foam roller. Target quads, ITB, hamstrings, and calves to reduce muscle tension.",
-        "Massage Gun": "Use percussion massage device on tight muscles. Effective for localized muscle tension relief.",
-        "Ice": "Apply ice pack for 15-20 minutes. Helpful for acute pain or post-exercise inflammation management.",
-        "Compression": "Use compression sleeve or wrap. Helps manage swelling and provides proprioceptive feedback.",
-        "Stretching": "Gentle static stretching of all lower limb muscles. Hold each stretch 30-60 seconds without bouncing.",
-        "EMS": "Electrical muscle stimulation. Useful for muscle reeducation and pain management.",
-        "Contrast Bath": "Alternate hot and cold water immersion. Can help with circulation and pain management.",
-        "Light Cycling": "Gentle cycling with minimal resistance. Active recovery that promotes circulation without stress.",
-        "Pool Walking": "Walking in water for reduced weight-bearing. Excellent for early-stage loading within pain limits.",
-        "Static Stretching": "Hold stretches for 30+ seconds. Most effective after activity when tissues are warm.",
-        "Dynamic Stretching": "Moving stretches without holding. Good preparation before more intense activity.",
-        "PNF Stretching": "Contract-relax stretching technique. Contract muscle for 5-6 seconds, then relax and stretch further. More effective than static stretching alone.",
-        "Meditation": "Mind-body practice focusing on breathing and present moment. Can help with pain management and rehabilitation mindset.",
-        "Deep Breathing": "Diaphragmatic breathing exercises. Reduces stress which can impact muscle tension and recovery.",
-        "Self-Massage": "Manual massage techniques performed on yourself. Can target specific trigger points or tight areas.",
-        "TENS Unit": "Transcutaneous electrical nerve stimulation. May help with pain management through different mechanism than EMS.",
-        "Progressive Muscle Relaxation": "Systematically tense and release muscle groups. Helps identify and reduce chronic tension patterns.",
-        "Band-Assisted Stretching": "Use a band to assist in stretching tight muscles, particularly hamstrings and calves. Provides control and leverage for effective stretching.",
-        "Joint Mobilizations": "Gentle oscillation movements of the knee joint to improve mobility without strain. Can be self-performed or with physical therapist."
-    }
+    # Exercise categories, descriptions and search come from the shared catalog (app/data/exercises.json)
+    catalog = get_catalog()
+    exercise_categories = catalog.categories
     
-    with tab1:
-        # Exercise selection with common rehab exercises
-        exercise_categories = {
-            "🔥 ROM Exercises": [
-                "Heel Slides", "Wall Slides", "Prone Hangs", "Heel Props", 
-                "Stationary Bike", "Seated Knee Extensions", "Patella Mobilizations",
-                "Band-Assisted Knee Flexion", "Band-Assisted Terminal Knee Extension",
-                "Supine Active Knee Extension", "Seated Active Knee Flexion",
-                "Wall Knee Flexion", "Standing Hamstring Stretch", "Quad Stretch"
-            ],
-            "💪 Strength Exercises": [
-                "Straight Leg Raises", "Quad Sets", "Hamstring Curls", "Glute Bridges",
-                "Wall Squats", "Step-Ups", "Leg Press", "Lunges", "Romanian Deadlifts",
-                "Calf Raises", "Terminal Knee Extensions", "Reverse Lunges", 
-                "Bulgarian Split Squats", "Pistol Squat Progression", "Good Mornings",
-                "Hip Adduction", "Hip Abduction", "Hip Thrusts", "Nordic Hamstring Curls",
-                "Lateral Step-Downs", "Single-Leg Calf Raises", "Walking Lunges"
-            ],
-            "🎯 Resistance Band Exercises": [
-                "Band Terminal Knee Extensions", "Band Hip Abduction", "Band Hip Adduction",
-                "Band Lateral Walks", "Band Monster Walks", "Band Hamstring Curls",
-                "Band Glute Bridges", "Band Standing Leg Press", "Band Hip Extensions",
-                "Band Squats", "Band Seated Row", "Band Clamshells", "Band Pull-Aparts",
-                "Band Deadlifts", "Band Standing Leg Abduction", "Band Lateral Raises"
-            ],
-            "🧠 Balance & Neuromuscular": [
-                "Single-Leg Balance", "Mini-Trampoline", "Wobble Board", "Bosu Ball",
-                "Y-Balance Training", "Side Stepping with Band", "Tandem Walking",
-                "Single-Leg Deadlift", "Single-Leg Squat", "Balance Reach Exercises",
-                "Agility Ladder Drills", "Ball Toss with Balance", "Single-Leg Clock Tap",
-                "STAR Excursion Balance", "Band-Resisted Balance Work"
-            ],
-            "⚡ Plyometrics": [
-                "Double-Leg Hops", "Lateral Hops", "Box Jumps", "Lunge Jumps", "Depth Jumps",
-                "Skater Jumps", "Broad Jumps", "Tuck Jumps", "Split Jumps",
-                "Single-Leg Hops", "Jump Rope", "Reactive Squat Jumps", "Lateral Bound",
-                "Forward/Backward Bound", "Band-Resisted Jumps", "Drop Jumps"
-            ],
-            "👊 Martial Arts Training": [
-                "Shadow Boxing", "Front Kick Drills", "Roundhouse Kick", "Side Kick",
-                "Defensive Footwork", "Speed Bag", "Heavy Bag", "Technical Sparring",
-                "Slow Motion Kicks", "Stance Transitions", "Band-Resisted Kicks",
-                "Knee Strike Practice", "Focus Mitt Work", "Agility Ladder",
-                "Controlled Pivoting", "Slide Steps", "Blocking Drills"
-            ],
-            "🧘 Recovery": [
-                "Foam Rolling", "Massage Gun", "Ice", "Compression", "Stretching", "EMS",
-                "Contrast Bath", "Light Cycling", "Pool Walking", "Static Stretching",
-                "Dynamic Stretching", "PNF Stretching", "Meditation", "Deep Breathing",
-                "Self-Massage", "TENS Unit", "Progressive Muscle Relaxation",
-                "Band-Assisted Stretching", "Joint Mobilizations"
-            ]
-        }
-        
+    if section == "Log Exercise":
         # Add styling to the category selection
         st.markdown("""
         <style>
@@ -244,13 +66,13 @@ def show_exercise_tracker():
             
             st.markdown('</div>', unsafe_allow_html=True)
         
-        # Filter exercises based on search term
+        # Ranked fuzzy search across every category (typo-tolerant)
         if search_term:
-            filtered_exercises = [ex for ex in available_exercises if search_term.lower() in ex.lower()]
+            filtered_exercises = [result['name'] for result in catalog.search(search_term)]
             if filtered_exercises:
                 available_exercises = filtered_exercises
             else:
-                st.info(f"No exercises matching '{search_term}' found in {selected_category}. Showing all exercises.")
+                st.info(f"No exercises matching '{search_term}' found. Showing all exercises in {selected_category}.")
         
         # Use session state to keep track of selected exercise
         if 'selected_exercise' not in st.session_state or st.session_state.selected_exercise not in available_exercises:
@@ -266,21 +88,25 @@ def show_exercise_tracker():
                 "Select Exercise", 
                 options=available_exercises,
                 index=available_exercises.index(st.session_state.selected_exercise) if st.session_state.selected_exercise in available_exercises else 0,
+                format_func=lambda ex: ex if catalog.category_of(ex) == selected_category else f"{ex} ({catalog.category_of(ex)})",
                 key=f"exercise_selector_{selected_category}_{search_term}"
             )
             
             # Update session state with selected exercise
             st.session_state.selected_exercise = selected_exercise
+            # Search results can come from other categories; log the exercise under its own
+            exercise_category = catalog.category_of(selected_exercise) or selected_category
+            description = catalog.description(selected_exercise)
             
             # Display exercise description with modern styling
-            if selected_exercise in exercise_descriptions:
+            if description:
                 st.markdown(f"""
                 <div style="background: linear-gradient(90deg, rgba(54, 209, 220, 0.1), rgba(54, 209, 220, 0.02)); 
                             border-left: 3px solid #36d1dc; 
                             padding: 15px; 
                             margin: 15px 0; 
                             border-radius: 8px;">
-                    <span style="font-weight: 600; color: #36d1dc;">How to perform:</span> {exercise_descriptions[selected_exercise]}
+                    <span style="font-weight: 600; color: #36d1dc;">How to perform:</span> {description}
                 </div>
                 """, unsafe_allow_html=True)
             else:
@@ -307,7 +133,7 @@ def show_exercise_tracker():
             st.markdown(f"""
             <div style="margin-bottom: 15px;">
                 <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">SELECTED EXERCISE</span>
-                <div style="font-weight: 600; color: #36d1dc; font-size: 1.1rem;">{selected_category} - {selected_exercise}</div>
+                <div style="font-weight: 600; color: #36d1dc; font-size: 1.1rem;">{exercise_category} - {selected_exercise}</div>
             </div>
             """, unsafe_allow_html=True)
             
@@ -324,7 +150,7 @@ def show_exercise_tracker():
             notes = st.text_area("Notes", placeholder="How did it feel? Any modifications?", height=100)
             
             # Calculate power level gain based on exercise complexity and sets/reps
-            power_gain = int((sets * reps * (1 + weight/10) * difficulty) * 1.5)
+            power_gain = int(exercise_power(sets, reps, weight, difficulty))
             
             # Close the card
             st.markdown('</div>', unsafe_allow_html=True)
@@ -336,11 +162,12 @@ def show_exercise_tracker():
             # Create a new entry - using selected_exercise from session state
             new_entry = pd.DataFrame({
                 'date': [exercise_date.strftime("%Y-%m-%d")],
-                'category': [selected_category],
+                'category': [exercise_category],
                 'exercise': [selected_exercise],  # Use the selected exercise from session state
                 'sets': [int(sets)],
                 'reps': [int(reps)],
                 'weight': [float(weight)],
+                'difficulty': [float(difficulty)],
                 'notes': [notes]
             })
             
@@ -358,7 +185,7 @@ def show_exercise_tracker():
                                 st.session_state.exercise_log[col] = st.session_state.exercise_log[col].astype(str)
                             elif col == 'sets' or col == 'reps':
                                 st.session_state.exercise_log[col] = st.session_state.exercise_log[col].astype(int)
-                            elif col == 'weight':
+                            elif col == 'weight' or col == 'difficulty':
                                 st.session_state.exercise_log[col] = st.session_state.exercise_log[col].astype(float)
                             else:
                                 st.session_state.exercise_log[col] = st.session_state.exercise_log[col].astype(str)
@@ -375,8 +202,11 @@ def show_exercise_tracker():
             
             # Ensure data is saved immediately
             try:
-                # Update power level
-                st.session_state.power_level += power_gain
+                # Update power level (persisted as a running counter, session value if the DB is unavailable)
+                new_power_level = increment_power_level(st.session_state.current_username, power_gain)
+                if new_power_level is None:
+                    new_power_level = st.session_state.power_level + power_gain
+                st.session_state.power_level = new_power_level
                 st.session_state.show_power_up = True
                 
                 # Get base64 encoded GIF image for inline display
@@ -463,8 +293,10 @@ def show_exercise_tracker():
                     st.success("ELITE LEVEL ACHIEVED! Your dedication has reached professional levels!")
                 if st.session_state.power_level > 100000:
                     st.success("MASTER LEVEL ACHIEVED! You've reached the pinnacle of rehabilitation excellence!")
+
+        show_bulk_import('exercise')
     
-    with tab2:
+    if section == "Exercise History":
         # Improve history display with modern card layout
         st.markdown('<div class="fitness-card">', unsafe_allow_html=True)
         st.subheader("Exercise History")
@@ -492,7 +324,7 @@ def show_exercise_tracker():
             if isinstance(st.session_state.exercise_log, dict):
                 exercise_log_df = pd.DataFrame(st.session_state.exercise_log)
             else:
-                exercise_log_df = st.session_state.exercise_log.copy()
+                exercise_log_df = st.session_state.exercise_log.copy(deep=False)
             
             # Apply filters
             if filter_category != "All Categories":
@@ -514,45 +346,15 @@ def show_exercise_tracker():
             
             # Show data in a modern format
             if not exercise_log_df.empty:
-                # Display exercises in card format instead of table
-                st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                
-                # Group by date for better organization
+                # Cards grouped by date, the whole history in one markdown delta
                 exercise_log_df['date'] = pd.to_datetime(exercise_log_df['date'])
                 grouped = exercise_log_df.groupby(exercise_log_df['date'].dt.strftime('%Y-%m-%d'))
-                
-                for date, group in grouped:
-                    st.markdown(f'<h4 style="color: #36d1dc; margin-top: 20px;">{date}</h4>', unsafe_allow_html=True)
-                    
-                    for _, row in group.iterrows():
-                        st.markdown(f"""
-                        <div class="exercise-card">
-                            <h4>{row['exercise']}</h4>
-                            <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
-                                <div><span style="color: rgba(255,255,255,0.6);">Category:</span> {row['category']}</div>
-                                <div><span style="color: rgba(255,255,255,0.6);">Sets:</span> {row['sets']}</div>
-                                <div><span style="color: rgba(255,255,255,0.6);">Reps:</span> {row['reps']}</div>
-                                <div><span style="color: rgba(255,255,255,0.6);">Weight:</span> {row['weight']} kg</div>
-                            </div>
-                            <div style="font-style: italic; color: rgba(255,255,255,0.8);">{row['notes'] if 'notes' in row and row['notes'] else "No notes"}</div>
-                            <div style="text-align: right; margin-top: 10px;">
-                                <a style="color: #ff6b6b; cursor: pointer; text-decoration: none;" 
-                                   onclick="this.closest('.exercise-card').style.display='none'; parent.postMessage({{'type': 'streamlit:deleteExercise', 'date': '{date}', 'exercise': '{row['exercise']}'}}, '*')">
-                                   Delete
-                                </a>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # Add JavaScript to handle deletion (not directly functional, would need backend integration)
-                st.markdown("""
-                <script>
-                // This is just a placeholder. Streamlit's sandboxed iframe prevents this from working directly.
-                // Would need custom components for full functionality
-                </script>
-                """, unsafe_allow_html=True)
+                emit(
+                    '<div class="chart-container">',
+                    *(DATE_HEADING.render(date=date) + "".join(exercise_card(row, HISTORY_FIELDS) for _, row in group.iterrows())
+                      for date, group in grouped),
+                    '</div>',
+                )
                 
                 # Add a delete button that uses Streamlit's state management instead
                 with st.expander("Delete Exercise Entry"):
@@ -571,8 +373,9 @@ def show_exercise_tracker():
                         success = remove_exercise_entry(st.session_state.current_username, delete_date, delete_exercise)
                         if success:
                             st.success(f"Deleted {delete_exercise} entry from {delete_date}")
-                            # Update the session state exercise log
+                            # Update the session state exercise log and the adjusted power level
                             st.session_state.exercise_log = get_exercise_log(st.session_state.current_username)
+                            st.session_state.power_level = get_power_level(st.session_state.current_username)
                             st.rerun()
                         else:
                             st.error("Failed to delete exercise entry")
@@ -588,7 +391,7 @@ def show_exercise_tracker():
                 if isinstance(st.session_state.exercise_log, dict):
                     summary_df = pd.DataFrame(st.session_state.exercise_log)
                 else:
-                    summary_df = st.session_state.exercise_log.copy()
+                    summary_df = st.session_state.exercise_log.copy(deep=False)
                 
                 # Create proper date column
                 summary_df['date'] = pd.to_datetime(summary_df['date'])
@@ -599,69 +402,20 @@ def show_exercise_tracker():
                 most_common_exercise = summary_df['exercise'].value_counts().idxmax() if not summary_df.empty else "None"
                 most_recent_date = summary_df['date'].max().strftime("%Y-%m-%d") if not summary_df.empty else "None"
                 
-                # Create a summary metrics row
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-                    st.markdown(f'<div class="metric-label">TOTAL WORKOUTS</div>', unsafe_allow_html=True)
-                    st.markdown(f'<div class="metric-value">{total_workouts}</div>', unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-                    st.markdown(f'<div class="metric-label">TOTAL EXERCISES</div>', unsafe_allow_html=True)
-                    st.markdown(f'<div class="metric-value">{total_exercises}</div>', unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                
-                with col3:
-                    st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-                    st.markdown(f'<div class="metric-label">FAVORITE EXERCISE</div>', unsafe_allow_html=True)
-                    st.markdown(f'<div class="metric-value" style="font-size: 1.5rem;">{most_common_exercise}</div>', unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                
-                with col4:
-                    st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-                    st.markdown(f'<div class="metric-label">LAST WORKOUT</div>', unsafe_allow_html=True)
-                    st.markdown(f'<div class="metric-value" style="font-size: 1.5rem;">{most_recent_date}</div>', unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
+                # Create a summary metrics row; exercise names are user text, escaped by the template
+                summary = [("TOTAL WORKOUTS", total_workouts, ""), ("TOTAL EXERCISES", total_exercises, ""),
+                           ("FAVORITE EXERCISE", most_common_exercise, "font-size: 1.5rem;"),
+                           ("LAST WORKOUT", most_recent_date, "font-size: 1.5rem;")]
+                for column, (label, value, value_style) in zip(st.columns(4), summary):
+                    with column:
+                        emit(METRIC_CARD.render(label=label, value=value, value_style=value_style, caption=""))
                 
                 # Add workout frequency chart
                 st.markdown('<div class="chart-container">', unsafe_allow_html=True)
                 st.subheader("Workout Frequency")
                 
-                # Create chart data
-                workout_dates = summary_df['date'].dt.strftime('%Y-%m-%d').value_counts().reset_index()
-                workout_dates.columns = ['date', 'count']
-                workout_dates['date'] = pd.to_datetime(workout_dates['date'])
-                workout_dates = workout_dates.sort_values('date')
-                
-                # Create a date range including all days
-                if not workout_dates.empty:
-                    date_range = pd.date_range(start=workout_dates['date'].min(), end=workout_dates['date'].max())
-                    all_dates = pd.DataFrame({'date': date_range})
-                    
-                    # Merge with actual workout dates
-                    merged_dates = all_dates.merge(workout_dates, on='date', how='left').fillna(0)
-                    
-                    # Plot
-                    fig = px.bar(
-                        merged_dates, 
-                        x='date', 
-                        y='count',
-                        color_discrete_sequence=['#36d1dc'],
-                        labels={'date': 'Date', 'count': 'Exercises'},
-                        title='Your Workout Frequency'
-                    )
-                    fig.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='rgba(255,255,255,0.8)',
-                        xaxis=dict(showgrid=False),
-                        yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.1)')
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("Not enough data to generate workout frequency chart.")
+                # Calendar heatmap shared with the dashboard
+                show_calendar_heatmap(summary_df, key="tracker_calendar")
                 
                 st.markdown('</div>', unsafe_allow_html=True)
                 
@@ -0,0 +1,130 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from perf import timed_span
+
+WEEKDAY_LABELS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+ALL_CATEGORIES = "All Categories"
+
+def to_day_numbers(dates):
+    """Convert a column of dates (strings or timestamps) to integer day numbers since 1970-01-01"""
+    parsed = pd.to_datetime(pd.Series(dates).reset_index(drop=True), errors='coerce')
+    days = parsed.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    valid = ~np.isnat(days)
+    return days.astype(np.int64), valid
+
+def weekday_of(day_numbers):
+    # 1970-01-01 was a Thursday, shift so that Monday = 0
+    return (day_numbers + 3) % 7
+
+def exercise_calendar(dates, categories=None):
+    """Count entries per day on a weeks x weekdays grid, optionally split into per-category layers"""
+    days, valid = to_day_numbers(dates)
+    if not valid.any():
+        return None
+    days = days[valid]
+
+    first_day = int(days.min())
+    last_day = int(days.max())
+
+    # Align the grid to the Monday of the first week
+    grid_start = first_day - int(weekday_of(first_day))
+    n_weeks = (last_day - grid_start) // 7 + 1
+    n_cells = n_weeks * 7
+    offsets = days - grid_start
+
+    # One bincount over day offsets gives the whole calendar
+    counts = np.bincount(offsets, minlength=n_cells).reshape(n_weeks, 7).T.astype(float)
+
+    # Cells outside the logged range are shown as empty rather than zero
+    cell_days = grid_start + np.arange(n_cells)
+    outside = ((cell_days < first_day) | (cell_days > last_day)).reshape(n_weeks, 7).T
+    counts[outside] = np.nan
+
+    layers = {}
+    if categories is not None:
+        category_values = pd.Series(categories).to_numpy()[valid]
+        codes, names = pd.factorize(category_values)
+        known = codes >= 0
+        if known.any():
+            # Offset each category into its own block so a single bincount fills every layer
+            flat = np.bincount(codes[known] * n_cells + offsets[known], minlength=len(names) * n_cells)
+            stacked = flat.reshape(len(names), n_weeks, 7).transpose(0, 2, 1).astype(float)
+            stacked[:, outside] = np.nan
+            layers = {name: stacked[i] for i, name in enumerate(names)}
+
+    week_starts = (np.datetime64(grid_start, 'D') + np.arange(n_weeks) * 7).astype('datetime64[D]')
+    cell_dates = np.datetime_as_string(cell_days.astype('datetime64[D]'), unit='D').reshape(n_weeks, 7).T
+
+    return {
+        'counts': counts,
+        'layers': layers,
+        'week_starts': pd.to_datetime(week_starts),
+        'cell_dates': cell_dates,
+        'first_date': pd.Timestamp(np.datetime64(first_day, 'D')),
+        'last_date': pd.Timestamp(np.datetime64(last_day, 'D')),
+        'active_days': int(np.count_nonzero(np.nan_to_num(counts))),
+    }
+
+def calendar_heatmap_figure(calendar, layer=None, height=260):
+    z = calendar['counts'] if layer is None else calendar['layers'][layer]
+
+    fig = go.Figure(go.Heatmap(
+        z=z,
+        x=calendar['week_starts'],
+        y=WEEKDAY_LABELS,
+        customdata=calendar['cell_dates'],
+        hovertemplate="%{customdata}<br>%{z:.0f} exercises<extra></extra>",
+        colorscale=[[0, '#1f2730'], [0.5, '#36d1dc'], [1, '#5b86e5']],
+        xgap=3,
+        ygap=3,
+        showscale=False,
+        hoverongaps=False
+    ))
+
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        xaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            color='rgba(255,255,255,0.5)'
+        ),
+        yaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            autorange='reversed',
+            color='rgba(255,255,255,0.5)'
+        ),
+        font=dict(color='rgba(255,255,255,0.7)'),
+        height=height
+    )
+    return fig
+
+@timed_span("chart.calendar_heatmap")
+def show_calendar_heatmap(exercise_log, key, height=260):
+    """Render the exercise frequency calendar with an optional per-category layer selector"""
+    if exercise_log is None or exercise_log.empty or 'date' not in exercise_log.columns:
+        st.info("Not enough data to generate workout frequency chart.")
+        return None
+
+    categories = exercise_log['category'] if 'category' in exercise_log.columns else None
+    calendar = exercise_calendar(exercise_log['date'], categories)
+    if calendar is None:
+        st.info("Not enough data to generate workout frequency chart.")
+        return None
+
+    layer = None
+    if calendar['layers']:
+        selected = st.selectbox(
+            "Show",
+            options=[ALL_CATEGORIES] + sorted(calendar['layers'].keys()),
+            key=f"{key}_layer"
+        )
+        if selected != ALL_CATEGORIES:
+            layer = selected
+
+    st.plotly_chart(calendar_heatmap_figure(calendar, layer, height), use_container_width=True)
+    return calendar
@@ -0,0 +1,20 @@
+import streamlit as st
+
+def lazy_tabs(labels, key):
+    """Tab-style section selector that returns the selected label, so only that section's body runs
+
+    st.tabs executes every tab on each rerun; callers branch on the returned label instead. The
+    selection is mirrored into a plain session value, which (unlike widget state) survives visits
+    to other pages. A horizontal radio rather than st.segmented_control, because AppTest (and so the
+    render benchmark) cannot drive a single-select segmented control.
+    """
+    remembered = f"{key}_selected"
+    if st.session_state.get(remembered) not in labels:
+        st.session_state[remembered] = labels[0]
+    if st.session_state.get(key) not in labels:
+        st.session_state[key] = st.session_state[remembered]
+
+    def remember():
+        st.session_state[remembered] = st.session_state[key]
+
+    return st.radio("Section", labels, key=key, on_change=remember, horizontal=True, label_visibility="collapsed")
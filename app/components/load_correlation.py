@@ -0,0 +1,182 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+from heatmap import to_day_numbers
+from training_load import entry_loads, log_version, VOLUME, RPE
+from perf import timed_span
+from metrics import CACHE_LOOKUPS
+from session_memory import get_derived
+from cards import CardTemplate, emit
+
+# Lags (days) between training load and the pain/swelling reading it is compared with
+MAX_LAG = 3
+
+# A category is flagged when its load correlates with later symptoms at least this strongly
+FLAG_THRESHOLD = 0.3
+MIN_PAIRS = 10
+
+ROM_KEY_COLUMNS = ('date', 'extension_angle', 'flexion_angle', 'pain_level', 'swelling')
+OUTCOMES = {'pain_level': "Pain", 'swelling': "Swelling"}
+TOTAL_VOLUME = "Total volume load"
+TOTAL_RPE = "Total session RPE load"
+
+# Categories are free text from the log (typed or imported), so they go through the escaping template
+FLAG_CARD = CardTemplate("""
+<div class="exercise-card" style="border-left: 3px solid #ff6b6b;">
+    <h4 style="color: #ff6b6b;">$category</h4>
+    <div style="color: rgba(255,255,255,0.8);">
+        Higher load is followed by more $outcome $day_text
+        (r = $r over $pairs days). Consider reviewing this category with your physio.
+    </div>
+</div>
+""")
+
+def load_series(exercise_log):
+    """Daily load matrix (one row per series: total volume, total sRPE, sRPE per category) on a shared day grid"""
+    days, loads, valid = entry_loads(exercise_log)
+    if len(days) == 0:
+        return None
+
+    start_day = int(days.min())
+    n_days = int(days.max()) - start_day + 1
+    offsets = days - start_day
+
+    names = [TOTAL_VOLUME, TOTAL_RPE]
+    rows = [
+        np.bincount(offsets, weights=loads[VOLUME], minlength=n_days),
+        np.bincount(offsets, weights=loads[RPE], minlength=n_days),
+    ]
+
+    if 'category' in exercise_log.columns:
+        codes, categories = pd.factorize(exercise_log['category'].to_numpy()[valid])
+        known = codes >= 0
+        if known.any():
+            # Offset each category into its own block so a single bincount fills the whole matrix
+            flat = np.bincount(codes[known] * n_days + offsets[known], weights=loads[RPE][known],
+                               minlength=len(categories) * n_days)
+            rows.extend(flat.reshape(len(categories), n_days))
+            names.extend(str(c) for c in categories)
+
+    return {'start_day': start_day, 'names': names, 'loads': np.vstack(rows)}
+
+def daily_outcome(rom_pain_log, column, start_day, n_days):
+    """Mean daily value of a symptom column on the load grid, NaN on days without a reading"""
+    if column not in rom_pain_log.columns:
+        return np.full(n_days, np.nan)
+
+    days, valid = to_day_numbers(rom_pain_log['date'])
+    values = pd.to_numeric(rom_pain_log[column], errors='coerce').to_numpy(dtype=float)
+    offsets = days - start_day
+    keep = valid & ~np.isnan(values) & (offsets >= 0) & (offsets < n_days)
+
+    totals = np.bincount(offsets[keep], weights=values[keep], minlength=n_days)
+    counts = np.bincount(offsets[keep], minlength=n_days)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+def lagged_correlations(loads, outcome, max_lag=MAX_LAG):
+    """Pearson r between every load series and the outcome `lag` days later, for lags 0..max_lag"""
+    n_series, n_days = loads.shape
+    r = np.full((n_series, max_lag + 1), np.nan)
+    pairs = np.zeros(max_lag + 1, dtype=int)
+
+    for lag in range(min(max_lag, n_days - 1) + 1):
+        y = outcome[lag:]
+        mask = ~np.isnan(y)
+        pairs[lag] = int(mask.sum())
+        if pairs[lag] < 3:
+            continue
+
+        # Centre all series at once; rest days contribute zero load
+        x = loads[:, :n_days - lag][:, mask]
+        x_centred = x - x.mean(axis=1, keepdims=True)
+        y_centred = y[mask] - y[mask].mean()
+        denominator = np.sqrt((x_centred ** 2).sum(axis=1) * (y_centred ** 2).sum())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r[:, lag] = np.where(denominator > 0, x_centred @ y_centred / denominator, np.nan)
+
+    return r, pairs
+
+def analyse_load_symptoms(exercise_log, rom_pain_log, max_lag=MAX_LAG):
+    """Lagged load/symptom correlations in long format plus the flagged exercise categories"""
+    columns = ['series', 'outcome', 'lag', 'r', 'pairs']
+    empty = {'correlations': pd.DataFrame(columns=columns),
+             'flags': pd.DataFrame(columns=['category', 'outcome', 'lag', 'r', 'pairs'])}
+    if exercise_log is None or exercise_log.empty or rom_pain_log is None or rom_pain_log.empty:
+        return empty
+
+    series = load_series(exercise_log)
+    if series is None:
+        return empty
+
+    # Extend the grid so readings up to max_lag days after the last session are used
+    loads = np.hstack([series['loads'], np.zeros((len(series['names']), max_lag))])
+    n_days = loads.shape[1]
+
+    frames = []
+    for column, label in OUTCOMES.items():
+        outcome = daily_outcome(rom_pain_log, column, series['start_day'], n_days)
+        r, pairs = lagged_correlations(loads, outcome, max_lag)
+        frames.append(pd.DataFrame({
+            'series': np.repeat(series['names'], max_lag + 1),
+            'outcome': label,
+            'lag': np.tile(np.arange(max_lag + 1), len(series['names'])),
+            'r': r.ravel(),
+            'pairs': np.tile(pairs, len(series['names'])),
+        }))
+    correlations = pd.concat(frames, ignore_index=True)
+
+    # Flag categories whose load is followed by more pain/swelling on the next days
+    categories = correlations[~correlations['series'].isin([TOTAL_VOLUME, TOTAL_RPE])]
+    candidates = categories[(categories['lag'] >= 1) & (categories['pairs'] >= MIN_PAIRS)
+                            & (categories['r'] >= FLAG_THRESHOLD)]
+    flags = (candidates.sort_values('r', ascending=False)
+             .drop_duplicates(['series', 'outcome'])
+             .rename(columns={'series': 'category'})
+             .reset_index(drop=True))
+
+    return {'correlations': correlations, 'flags': flags}
+
+def get_load_symptom_analysis(exercise_log, rom_pain_log):
+    """Load/symptom analysis for the logged-in user, cached in session state per data version"""
+    version = (
+        st.session_state.get('current_username'),
+        log_version(exercise_log),
+        log_version(rom_pain_log, ROM_KEY_COLUMNS),
+    )
+    cache = get_derived('load_correlation_cache')
+    if cache is None or cache['version'] != version:
+        CACHE_LOOKUPS.inc(cache='load_correlation', result="miss")
+        cache = {'version': version, 'result': analyse_load_symptoms(exercise_log, rom_pain_log)}
+        st.session_state.load_correlation_cache = cache
+    else:
+        CACHE_LOOKUPS.inc(cache='load_correlation', result="hit")
+    return cache['result']
+
+@timed_span("dashboard.load_correlation")
+def show_load_symptom_analysis(exercise_log, rom_pain_log):
+    """Render the load vs pain/swelling correlations and flagged categories for the dashboard"""
+    result = get_load_symptom_analysis(exercise_log, rom_pain_log)
+    correlations = result['correlations']
+    if correlations.empty or correlations['r'].isna().all():
+        st.info("Log exercises and ROM & pain measurements on overlapping days to see how training affects your knee.")
+        return
+
+    if result['flags'].empty:
+        st.success("No exercise category is currently linked with higher pain or swelling on the following days.")
+    else:
+        emit(FLAG_CARD.render_all({
+            'category': flag['category'],
+            'outcome': flag['outcome'].lower(),
+            'day_text': "the next day" if flag['lag'] == 1 else f"{flag['lag']} days later",
+            'r': f"{flag['r']:.2f}",
+            'pairs': flag['pairs'],
+        } for _, flag in result['flags'].iterrows()))
+
+    outcome = st.selectbox("Compare load with", options=list(OUTCOMES.values()), key="load_correlation_outcome")
+    table = (correlations[correlations['outcome'] == outcome]
+             .pivot(index='series', columns='lag', values='r')
+             .rename(columns=lambda lag: "Same day" if lag == 0 else f"+{lag} day" + ("s" if lag > 1 else "")))
+    st.dataframe(table.round(2), use_container_width=True)
+    st.caption(f"Pearson correlation between daily load and {outcome.lower()} on the same or following days. "
+               f"Categories are flagged at r ≥ {FLAG_THRESHOLD} with at least {MIN_PAIRS} measured days.")
@@ -0,0 +1,262 @@
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import streamlit as st
+from perf import get_perf_setting
+from db_metrics import command_metrics, LATENCY_BUCKETS_MS
+
+# Prometheus text exposition format (version 0.0.4) served by a local HTTP exporter, no client library needed
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Default latency buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        # Optional callback returning {label values tuple: value}, evaluated at scrape time
+        self._function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self._function is not None:
+            items = sorted(self._function().items())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = np.asarray(sorted(buckets), dtype=float)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = int(np.searchsorted(self.buckets, value, side='left'))
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        return _histogram_samples(self.name, self.labelnames, self.buckets, items)
+
+def _histogram_samples(name, labelnames, bounds, items):
+    lines = []
+    for key, (counts, total) in items:
+        cumulative = np.cumsum(counts)
+        for bound, count in zip(list(bounds) + [float('inf')], cumulative):
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, [('le', _format_value(bound))])} {int(count)}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {int(cumulative[-1])}")
+    return lines
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """collector() returns exposition lines (HELP/TYPE included) for metrics kept elsewhere"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+RERUNS = REGISTRY.register(Counter(
+    "acl_reruns_total", "Completed script reruns by page", ["page"]))
+RERUNS_INTERRUPTED = REGISTRY.register(Counter(
+    "acl_reruns_interrupted_total", "Script runs cut short by st.rerun() or an exception"))
+RERUN_SECONDS = REGISTRY.register(Histogram(
+    "acl_rerun_duration_seconds", "Wall time of a complete script rerun", ["page"]))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "acl_cache_lookups_total", "Session analytics cache lookups (hit, incremental update or full rebuild)",
+    ["cache", "result"]))
+AUTH_SECONDS = REGISTRY.register(Histogram(
+    "acl_auth_duration_seconds", "Login attempts including the user lookup and password check", ["result"]))
+PASSWORD_HASH_SECONDS = REGISTRY.register(Histogram(
+    "acl_password_hash_duration_seconds", "PBKDF2 password hashing and verification", ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)))
+
+def _db_collector():
+    """MongoDB command metrics from the pymongo listener in db_metrics.py"""
+    snapshot = command_metrics.snapshot()
+    bounds = [bound / 1000 for bound in LATENCY_BUCKETS_MS]
+    labelnames = ('command', 'collection')
+    items = [((op['command'], op['collection']), (op['buckets'], op['total_ms'] / 1000)) for op in snapshot['operations']]
+
+    lines = ["# HELP acl_db_command_duration_seconds MongoDB command latency",
+             "# TYPE acl_db_command_duration_seconds histogram"]
+    lines.extend(_histogram_samples("acl_db_command_duration_seconds", labelnames, bounds, items))
+    lines.extend(["# HELP acl_db_command_documents_total Documents returned or affected by MongoDB commands",
+                  "# TYPE acl_db_command_documents_total counter"])
+    lines.extend(f"acl_db_command_documents_total{_format_labels(labelnames, (op['command'], op['collection']))} {op['documents']}"
+                 for op in snapshot['operations'])
+    lines.extend(["# HELP acl_db_command_bytes_total BSON bytes sent to and received from MongoDB",
+                  "# TYPE acl_db_command_bytes_total counter"])
+    for op in snapshot['operations']:
+        key = (op['command'], op['collection'])
+        lines.append(f"acl_db_command_bytes_total{_format_labels(labelnames, key, [('direction', 'sent')])} {op['bytes_sent']}")
+        lines.append(f"acl_db_command_bytes_total{_format_labels(labelnames, key, [('direction', 'received')])} {op['bytes_received']}")
+    return lines
+
+REGISTRY.add_collector(_db_collector)
+
+def rerun_started():
+    """Mark the start of a script run; a previous run that never finished is counted as interrupted"""
+    if st.session_state.get('metrics_rerun_started') is not None:
+        RERUNS_INTERRUPTED.inc()
+    st.session_state.metrics_rerun_started = time.perf_counter()
+
+def rerun_finished(page):
+    """Record the rerun latency for `page`"""
+    started = st.session_state.get('metrics_rerun_started')
+    st.session_state.metrics_rerun_started = None
+    if started is None:
+        return
+    RERUNS.inc(page=page)
+    RERUN_SECONDS.observe(time.perf_counter() - started, page=page)
+
+def record_cache_lookup(cache, state_before, rows_before, state_after, rows_after):
+    """Classify an incremental session cache lookup by what the update function did"""
+    if state_after is not state_before:
+        result = "miss"
+    elif rows_after == rows_before:
+        result = "hit"
+    else:
+        result = "incremental"
+    CACHE_LOOKUPS.inc(cache=cache, result=result)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+def start_exporter(port=None, host=None):
+    """Serve /metrics from a daemon thread once per process; off unless metrics_port is configured"""
+    global _exporter
+    if _exporter is not None:
+        return _exporter
+    port = port if port is not None else get_perf_setting("metrics_port")
+    if not port:
+        return None
+    host = host or get_perf_setting("metrics_host", "127.0.0.1")
+
+    with _exporter_lock:
+        if _exporter is None:
+            try:
+                server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            except OSError as e:
+                # Another replica on this host already owns the port; keep serving the app without metrics
+                print(f"Metrics exporter not started on {host}:{port}: {e}", file=sys.stderr)
+                _exporter = False
+                return None
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+            _exporter = server
+    return _exporter or None
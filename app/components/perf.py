@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+from datetime import datetime
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+
+# Number of completed reruns kept per session for the sidebar panel
+HISTORY_LENGTH = 20
+
+_local = threading.local()
+_export_lock = threading.Lock()
+
+# Settings come from .streamlit/secrets.toml first, then environment variables (PERF_ENABLED, ...)
+def get_perf_setting(name, default=None):
+    try:
+        value = st.secrets.get(name, None)
+        if value is not None:
+            return value
+    except Exception:
+        pass
+    return os.environ.get(name.upper(), default)
+
+def _truthy(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+_enabled = _truthy(get_perf_setting("perf_enabled", "false"))
+
+def is_enabled():
+    return _enabled
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+def is_operator(username):
+    """Operators are listed in perf_operators (a TOML list or a comma-separated environment variable)"""
+    operators = get_perf_setting("perf_operators", [])
+    if isinstance(operators, str):
+        operators = [name.strip() for name in operators.split(',')]
+    return bool(username) and username in operators
+
+class _Span:
+    __slots__ = ('name', 'record', 'start')
+
+    def __init__(self, name, record):
+        self.name = name
+        self.record = record
+
+    def __enter__(self):
+        self.record['depth'] += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        record = self.record
+        record['depth'] -= 1
+        record['spans'].append({
+            'name': self.name,
+            'start_ms': round((self.start - record['_origin']) * 1000, 3),
+            'duration_ms': round((end - self.start) * 1000, 3),
+            'depth': record['depth'],
+        })
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name):
+    """Context manager timing a block of the current rerun; a shared no-op when profiling is off"""
+    if not _enabled:
+        return _NULL_SPAN
+    record = getattr(_local, 'record', None)
+    if record is None:
+        return _NULL_SPAN
+    return _Span(name, record)
+
+def timed_span(name=None):
+    """Decorator timing every call of a function as a span named `name` (defaults to the function name)"""
+    def decorate(function):
+        label = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            record = getattr(_local, 'record', None)
+            if record is None:
+                return function(*args, **kwargs)
+            with _Span(label, record):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def begin_rerun():
+    """Start collecting spans for this script run; a run cut short by st.rerun() is stored as interrupted"""
+    if not _enabled:
+        return
+    stale = st.session_state.get('perf_open_rerun')
+    if stale is not None:
+        # The run stopped at its last closed span, not now
+        stale['interrupted'] = True
+        stale['total_ms'] = max((s['start_ms'] + s['duration_ms'] for s in stale['spans']), default=0.0)
+        _finish(stale)
+
+    record = {
+        'started_at': datetime.now().isoformat(timespec='milliseconds'),
+        'username': st.session_state.get('current_username'),
+        'page': None,
+        'interrupted': False,
+        'spans': [],
+        'depth': 0,
+        '_origin': time.perf_counter(),
+    }
+    _local.record = record
+    st.session_state.perf_open_rerun = record
+
+def set_rerun_page(page):
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record['page'] = page
+
+def end_rerun():
+    """Close the current script run and add it to the session history (and the JSONL log when configured)"""
+    record = getattr(_local, 'record', None)
+    if record is None:
+        return
+    _local.record = None
+    st.session_state.perf_open_rerun = None
+    record['total_ms'] = round((time.perf_counter() - record['_origin']) * 1000, 3)
+    _finish(record)
+
+def _finish(record):
+    record.pop('_origin', None)
+    record.pop('depth', None)
+    # Spans are appended as they close, so order them by start for the breakdown
+    record['spans'].sort(key=lambda s: s['start_ms'])
+
+    if 'perf_reruns' not in st.session_state:
+        st.session_state.perf_reruns = deque(maxlen=HISTORY_LENGTH)
+    st.session_state.perf_reruns.append(record)
+
+    log_path = get_perf_setting("perf_log")
+    if log_path:
+        export_jsonl([record], log_path)
+
+def to_jsonl(reruns):
+    return ''.join(json.dumps(record, default=str) + '\n' for record in reruns)
+
+def export_jsonl(reruns, path):
+    """Append reruns to a JSON lines file, one rerun with its spans per line"""
+    with _export_lock:
+        with open(path, 'a') as f:
+            f.write(to_jsonl(reruns))
+
+def rerun_breakdown(reruns):
+    """One row per rerun with the total time of each top-level span"""
+    rows = []
+    for i, record in enumerate(reruns):
+        row = {'rerun': i + 1, 'page': record.get('page') or "–", 'total_ms': record.get('total_ms', 0.0)}
+        for s in record['spans']:
+            if s['depth'] == 0:
+                row[s['name']] = row.get(s['name'], 0.0) + s['duration_ms']
+        rows.append(row)
+    return pd.DataFrame(rows).fillna(0.0)
+
+def breakdown_figure(breakdown):
+    span_columns = [c for c in breakdown.columns if c not in ('rerun', 'page', 'total_ms')]
+    fig = go.Figure()
+    for column in span_columns:
+        fig.add_trace(go.Bar(x=breakdown['rerun'], y=breakdown[column], name=column))
+    fig.update_layout(
+        barmode='stack',
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(font=dict(color='rgba(255,255,255,0.7)', size=10)),
+        xaxis=dict(title="Rerun", showgrid=False, color='rgba(255,255,255,0.5)'),
+        yaxis=dict(title="ms", showgrid=True, gridcolor='rgba(255,255,255,0.1)', color='rgba(255,255,255,0.5)'),
+        font=dict(color='rgba(255,255,255,0.7)'),
+        height=260
+    )
+    return fig
+
+def show_perf_panel(username):
+    """Sidebar breakdown of the last reruns, only for operators while profiling is enabled"""
+    if not _enabled or not is_operator(username):
+        return
+
+    reruns = list(st.session_state.get('perf_reruns', []))
+    with st.sidebar.expander("⏱️ Performance"):
+        if not reruns:
+            st.info("No completed reruns recorded yet.")
+            return
+
+        if len(reruns) > 1:
+            count = st.slider("Last reruns", min_value=1, max_value=len(reruns), value=min(10, len(reruns)), key="perf_rerun_count")
+            reruns = reruns[-count:]
+        breakdown = rerun_breakdown(reruns)
+        st.plotly_chart(breakdown_figure(breakdown), use_container_width=True)
+        st.dataframe(breakdown.round(1), use_container_width=True, hide_index=True)
+
+        latest = reruns[-1]
+        st.caption(f"Latest rerun: {latest.get('page') or '–'}, {latest['total_ms']:.1f} ms"
+                   + (" (interrupted by st.rerun)" if latest.get('interrupted') else ""))
+        spans = pd.DataFrame(latest['spans'])
+        if not spans.empty:
+            spans['name'] = spans['depth'].map(lambda depth: "· " * depth) + spans['name']
+            st.dataframe(spans[['name', 'start_ms', 'duration_ms']], use_container_width=True, hide_index=True)
+
+        st.download_button("Download spans (JSONL)", data=to_jsonl(reruns), file_name="perf_spans.jsonl",
+                           mime="application/json", key="perf_download")
@@ -0,0 +1,60 @@
+import pandas as pd
+import numpy as np
+
+# Entries logged before the difficulty slider was stored count at the slider's default
+DEFAULT_DIFFICULTY = 5
+
+# All formulas accept scalars or arrays so the forms and the audit share one implementation
+
+def _values(value):
+    # Missing fields (None, NaN) count as 0, as in the audit's _numeric(); NaN cast to int64 is garbage
+    return np.nan_to_num(np.asarray(value, dtype=float), nan=0.0)
+
+def exercise_power(sets, reps, weight, difficulty):
+    """Power gained for logging an exercise, based on volume and difficulty"""
+    return np.trunc(_values(sets) * _values(reps) * (1 + _values(weight) / 10) * _values(difficulty) * 1.5).astype(np.int64)
+
+def extension_power(extension_angle):
+    # Better extension = more power
+    return np.trunc(np.maximum(0, 30 - _values(extension_angle)) * 50).astype(np.int64)
+
+def flexion_power(flexion_angle):
+    # Better flexion = more power
+    return np.trunc(_values(flexion_angle) * 30).astype(np.int64)
+
+def pain_power(pain_level):
+    # Less pain = more power
+    return np.trunc((10 - _values(pain_level)) * 80).astype(np.int64)
+
+def swelling_power(swelling):
+    # Less swelling = more power
+    return np.trunc((3 - _values(swelling)) * 100).astype(np.int64)
+
+def rom_pain_power(extension_angle, flexion_angle, pain_level, swelling):
+    """Power gained for logging a ROM & pain measurement"""
+    return (extension_power(extension_angle) + flexion_power(flexion_angle)
+            + pain_power(pain_level) + swelling_power(swelling))
+
+def _numeric(df, column, default=0):
+    if df is None or column not in df.columns:
+        return np.full(0 if df is None else len(df), float(default))
+    return pd.to_numeric(df[column], errors='coerce').fillna(default).to_numpy(dtype=float)
+
+def power_level_from_logs(exercise_log, rom_pain_log):
+    """Recompute the total power level from the stored logs in one vectorized pass"""
+    total = 0
+    if exercise_log is not None and not exercise_log.empty:
+        total += int(exercise_power(
+            _numeric(exercise_log, 'sets'),
+            _numeric(exercise_log, 'reps'),
+            _numeric(exercise_log, 'weight'),
+            _numeric(exercise_log, 'difficulty', DEFAULT_DIFFICULTY)
+        ).sum())
+    if rom_pain_log is not None and not rom_pain_log.empty:
+        total += int(rom_pain_power(
+            _numeric(rom_pain_log, 'extension_angle'),
+            _numeric(rom_pain_log, 'flexion_angle'),
+            _numeric(rom_pain_log, 'pain_level'),
+            _numeric(rom_pain_log, 'swelling')
+        ).sum())
+    return total
@@ -0,0 +1,98 @@
+import os
+import json
+import bisect
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PROTOCOL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'rehab_protocol.json')
+
+class RehabProtocol:
+    """Rehab phases with day ranges, prescribed exercises and ROM/strength targets, indexed by day since surgery"""
+
+    def __init__(self, document):
+        self.introduction = document['introduction']
+        self.principles = _section_frame(document['principles'])
+        self.phases = sorted(document['phases'], key=lambda phase: phase['start_day'])
+        for phase in self.phases:
+            phase['label'] = f"{phase['name']} - {phase['focus']}"
+            for section in phase['sections']:
+                _section_frame(section)
+            phase['prescription'] = pd.DataFrame([{
+                'Exercise': exercise['name'],
+                'Sets': exercise.get('sets'),
+                'Reps': exercise.get('reps'),
+                'Per week': exercise.get('per_week'),
+                'Notes': exercise.get('dose', ""),
+            } for exercise in phase['exercises']]).astype({'Sets': 'Int64', 'Reps': 'Int64', 'Per week': 'Int64'})
+        for guide in document['guides']:
+            for section in guide['sections']:
+                _section_frame(section)
+
+        # Phase start days, sorted, for bisect lookups
+        self._starts = [phase['start_day'] for phase in self.phases]
+
+        # One row per prescribed exercise per phase, for vectorized joins against the exercise log
+        self.prescriptions = pd.DataFrame([{
+            'phase': i,
+            'exercise': exercise['name'],
+            'sets': exercise.get('sets'),
+            'reps': exercise.get('reps'),
+            'per_week': exercise.get('per_week') or 7,
+        } for i, phase in enumerate(self.phases) for exercise in phase['exercises']])
+        self.prescribed_names = sorted(set(self.prescriptions['exercise']))
+        codes = {name: code for code, name in enumerate(self.prescribed_names)}
+        # (phase index, prescribed exercise code) -> prescriptions row, -1 where the phase does not prescribe it
+        self.item_lookup = np.full((len(self.phases), len(self.prescribed_names)), -1)
+        self.item_lookup[self.prescriptions['phase'].to_numpy(), self.prescriptions['exercise'].map(codes).to_numpy()] = \
+            np.arange(len(self.prescriptions))
+        self._pages = {page['id']: page for page in self.phases + document['guides']}
+        self.tabs = [self._pages[page_id] for page_id in document['tabs']]
+
+    @classmethod
+    def from_file(cls, path=PROTOCOL_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def phase_index(self, day):
+        """Index of the phase containing `day` (days before the first phase count as the first)"""
+        return max(bisect.bisect_right(self._starts, day) - 1, 0)
+
+    def phase_indexes(self, days):
+        """Vectorized phase_index over an array of days since surgery"""
+        return np.maximum(np.searchsorted(self._starts, days, side='right') - 1, 0)
+
+    def phase_for_day(self, day):
+        return self.phases[self.phase_index(day)]
+
+    def post_op_phases(self):
+        return [phase for phase in self.phases if phase['start_day'] >= 0]
+
+    def page(self, page_id):
+        return self._pages[page_id]
+
+def _section_frame(section):
+    """Attach the DataFrame for a table section once, at load time"""
+    if section.get('type') == 'table' and 'frame' not in section:
+        section['frame'] = pd.DataFrame(section['rows'], columns=section['columns'])
+    return section.get('frame')
+
+@st.cache_resource
+def get_protocol():
+    """Protocol loaded once per process from app/data/rehab_protocol.json"""
+    return RehabProtocol.from_file()
+
+def render_sections(sections):
+    """Render protocol content blocks: markdown, callouts and tables"""
+    for section in sections:
+        kind = section['type']
+        if kind == 'table':
+            st.table(section['frame'])
+        elif kind == 'markdown':
+            st.markdown(section['text'])
+        elif kind == 'info':
+            st.info(section['text'])
+        elif kind == 'warning':
+            st.warning(section['text'])
+        elif kind == 'success':
+            st.success(section['text'])
@@ -0,0 +1,293 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from heatmap import to_day_numbers
+from training_load import row_key
+from perf import timed_span
+from metrics import record_cache_lookup
+from session_memory import get_derived
+
+# Saturating exponential y(t) = a + c * exp(-k * t), t in days since surgery.
+# For a fixed rate k the model is linear in (a, c), so every candidate rate on the grid is
+# solved in closed form at once. Fits need only running sums per rate, which makes adding a
+# measurement an O(grid) update instead of a refit over the whole history.
+RATE_GRID = np.geomspace(1 / 365, 1 / 2, 240)
+MIN_POINTS = 4
+CONFIDENCE_Z = 1.96
+HORIZON_DAYS = 730
+
+MEASURES = {'flexion_angle': "Flexion", 'extension_angle': "Extension"}
+
+# Milestone: (measure, target angle, label, direction) - direction +1 means reached when y >= target
+MILESTONES = [
+    ('flexion_angle', 120, "Flexion 120°", 1),
+    ('flexion_angle', 135, "Flexion 135°", 1),
+    ('extension_angle', 0, "Full extension 0°", -1),
+]
+
+ROM_KEY_COLUMNS = ('date', 'extension_angle', 'flexion_angle', 'pain_level', 'swelling')
+
+# Rows of the per-rate sufficient statistics
+N, S_E, S_EE, S_TE, S_TEE, S_TTEE, S_Y, S_EY, S_YY = range(9)
+
+def accumulate(stats, t, y):
+    """Add measurements (t days since surgery, angle y) to the per-rate running sums"""
+    if len(t) == 0:
+        return stats
+    e = np.exp(-np.outer(RATE_GRID, t))
+    ee = e * e
+    stats[N] += len(t)
+    stats[S_E] += e.sum(axis=1)
+    stats[S_EE] += ee.sum(axis=1)
+    stats[S_TE] += e @ t
+    stats[S_TEE] += ee @ t
+    stats[S_TTEE] += ee @ (t * t)
+    stats[S_Y] += y.sum()
+    stats[S_EY] += e @ y
+    stats[S_YY] += (y * y).sum()
+    return stats
+
+def solve(stats):
+    """Least-squares fit of (a, c, k) plus parameter covariance from the running sums"""
+    n = stats[N, 0]
+    if n < MIN_POINTS:
+        return None
+
+    det = n * stats[S_EE] - stats[S_E] ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = (stats[S_EE] * stats[S_Y] - stats[S_E] * stats[S_EY]) / det
+        c = (n * stats[S_EY] - stats[S_E] * stats[S_Y]) / det
+        sse = stats[S_YY] - a * stats[S_Y] - c * stats[S_EY]
+    sse = np.where(np.abs(det) > 1e-9, sse, np.inf)
+    best = int(np.argmin(sse))
+    if not np.isfinite(sse[best]):
+        return None
+
+    a, c, k = a[best], c[best], RATE_GRID[best]
+    sigma2 = max(sse[best], 0) / max(n - 3, 1)
+
+    # Gauss-Newton normal matrix J'J with J = [1, e, -c t e] at the chosen rate
+    s = stats[:, best]
+    jtj = np.array([
+        [n, s[S_E], -c * s[S_TE]],
+        [s[S_E], s[S_EE], -c * s[S_TEE]],
+        [-c * s[S_TE], -c * s[S_TEE], c * c * s[S_TTEE]],
+    ])
+    covariance = sigma2 * np.linalg.pinv(jtj)
+
+    return {'a': a, 'c': c, 'k': k, 'sigma': np.sqrt(sigma2), 'covariance': covariance, 'n': int(n)}
+
+def predict(fit, t):
+    """Fitted curve with a confidence band for the mean at days t"""
+    t = np.asarray(t, dtype=float)
+    e = np.exp(-fit['k'] * t)
+    y = fit['a'] + fit['c'] * e
+    gradient = np.vstack([np.ones_like(t), e, -fit['c'] * t * e])
+    variance = np.einsum('ij,ik,kj->j', gradient, fit['covariance'], gradient)
+    half_width = CONFIDENCE_Z * np.sqrt(np.maximum(variance, 0))
+    return y, y - half_width, y + half_width
+
+def milestone_days(fit, target, direction, start=0, horizon=HORIZON_DAYS):
+    """Estimated day since surgery a target is reached, with the earliest/latest day from the confidence band
+
+    The search covers days start to start + horizon, so a curve already past the target on day start
+    returns start.
+    """
+    days = np.arange(start, start + horizon + 1)
+    y, lower, upper = predict(fit, days)
+
+    def first_day(values):
+        reached = direction * (values - target) >= 0
+        return int(days[np.argmax(reached)]) if reached.any() else None
+
+    # The optimistic edge of the band reaches the target first, the conservative edge last
+    optimistic, conservative = (upper, lower) if direction > 0 else (lower, upper)
+    return first_day(y), first_day(optimistic), first_day(conservative)
+
+def _measurements(rom_pain_log, surgery_day):
+    days, valid = to_day_numbers(rom_pain_log['date'])
+    t = (days - surgery_day).astype(float)
+    result = {}
+    for measure in MEASURES:
+        if measure not in rom_pain_log.columns:
+            result[measure] = (np.empty(0), np.empty(0))
+            continue
+        y = pd.to_numeric(rom_pain_log[measure], errors='coerce').to_numpy(dtype=float)
+        keep = valid & ~np.isnan(y) & (t >= 0)
+        result[measure] = (t[keep], y[keep])
+    return result
+
+def build_recovery_model(rom_pain_log, surgery_day):
+    """Fit every measure's recovery curve from scratch"""
+    state = {
+        'surgery_day': surgery_day,
+        'n_rows': len(rom_pain_log),
+        'last_key': row_key(rom_pain_log, len(rom_pain_log) - 1, ROM_KEY_COLUMNS) if len(rom_pain_log) else None,
+        'stats': {measure: np.zeros((9, len(RATE_GRID))) for measure in MEASURES},
+    }
+    for measure, (t, y) in _measurements(rom_pain_log, surgery_day).items():
+        accumulate(state['stats'][measure], t, y)
+    state['fits'] = {measure: solve(stats) for measure, stats in state['stats'].items()}
+    return state
+
+def update_recovery_model(state, rom_pain_log, surgery_day):
+    """Fold newly appended measurements into the running sums and re-solve, rebuilding if history changed"""
+    n_cached = state['n_rows'] if state else 0
+    appended_only = (
+        state is not None
+        and state['surgery_day'] == surgery_day
+        and len(rom_pain_log) >= n_cached > 0
+        and row_key(rom_pain_log, n_cached - 1, ROM_KEY_COLUMNS) == state['last_key']
+    )
+    if not appended_only:
+        return build_recovery_model(rom_pain_log, surgery_day)
+    if len(rom_pain_log) == n_cached:
+        return state
+
+    for measure, (t, y) in _measurements(rom_pain_log.iloc[n_cached:], surgery_day).items():
+        accumulate(state['stats'][measure], t, y)
+    state['fits'] = {measure: solve(stats) for measure, stats in state['stats'].items()}
+    state['n_rows'] = len(rom_pain_log)
+    state['last_key'] = row_key(rom_pain_log, len(rom_pain_log) - 1, ROM_KEY_COLUMNS)
+    return state
+
+def get_recovery_model(rom_pain_log, surgery_date):
+    """Recovery curve fits for the logged-in user, cached in session state between reruns"""
+    surgery_day = int(np.datetime64(pd.Timestamp(surgery_date).date(), 'D').astype(np.int64))
+    cache = get_derived('rom_model_cache')
+    if cache is None or cache.get('username') != st.session_state.get('current_username'):
+        cache = {'username': st.session_state.get('current_username'), 'state': None}
+
+    state_before = cache['state']
+    rows_before = state_before['n_rows'] if state_before else 0
+    cache['state'] = update_recovery_model(state_before, rom_pain_log, surgery_day)
+    record_cache_lookup('rom_model', state_before, rows_before, cache['state'], cache['state']['n_rows'])
+    st.session_state.rom_model_cache = cache
+    return cache['state']
+
+def milestone_forecast(state, rom_pain_log, surgery_date, today=None):
+    """Predicted dates for each ROM milestone, marking those already reached by the latest measurement
+
+    Projections start from today or the latest measurement, whichever is later. A milestone the fitted
+    curve passed before then, but the latest measurement has not reached, is behind rather than on track.
+    """
+    surgery_date = pd.Timestamp(surgery_date).normalize()
+    latest = rom_pain_log.assign(date=pd.to_datetime(rom_pain_log['date'], errors='coerce')).sort_values('date').iloc[-1]
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    start = max((today - surgery_date).days, (latest['date'].normalize() - surgery_date).days, 0)
+
+    rows = []
+    for measure, target, label, direction in MILESTONES:
+        fit = state['fits'].get(measure)
+        row = {'Milestone': label, 'Status': "Not enough data", 'Expected': "–", 'Range (95%)': "–"}
+        if direction * (latest[measure] - target) >= 0:
+            row['Status'] = "Achieved"
+        elif fit is not None:
+            estimate, early, late = milestone_days(fit, target, direction, start)
+            to_date = lambda day: (surgery_date + pd.Timedelta(days=day)).strftime('%b %d, %Y')
+            if estimate is None:
+                row['Status'] = "Not projected within 2 years"
+            elif estimate == start and start > 0 and direction * (predict(fit, [start - 1])[0][0] - target) >= 0:
+                # The curve crossed earlier; the measurements have not caught up with it, so no range either
+                row['Status'] = "Behind"
+                row['Expected'] = "Overdue"
+                early = None
+            else:
+                row['Status'] = "On track"
+                row['Expected'] = to_date(estimate)
+            if early is not None:
+                row['Range (95%)'] = f"{to_date(early)} – {to_date(late) if late is not None else 'beyond 2 years'}"
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def recovery_curve_figure(state, rom_pain_log, surgery_date, measure):
+    surgery_date = pd.Timestamp(surgery_date).normalize()
+    fit = state['fits'][measure]
+    t, y = _measurements(rom_pain_log, state['surgery_day'])[measure]
+
+    horizon = int(max(t.max() if len(t) else 0, 60) * 1.5)
+    days = np.arange(horizon + 1)
+    curve, lower, upper = predict(fit, days)
+    dates = surgery_date + pd.to_timedelta(days, unit='D')
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=np.concatenate([dates, dates[::-1]]),
+        y=np.concatenate([upper, lower[::-1]]),
+        fill='toself',
+        fillcolor='rgba(91, 134, 229, 0.15)',
+        line=dict(width=0),
+        hoverinfo='skip',
+        name='95% band'
+    ))
+    fig.add_trace(go.Scatter(
+        x=dates,
+        y=curve,
+        name='Fitted curve',
+        line=dict(color='#5b86e5', width=3),
+        mode='lines',
+    ))
+    fig.add_trace(go.Scatter(
+        x=surgery_date + pd.to_timedelta(t, unit='D'),
+        y=y,
+        name='Measured',
+        marker=dict(color='#36d1dc', size=7),
+        mode='markers',
+    ))
+    for milestone_measure, target, label, _ in MILESTONES:
+        if milestone_measure == measure:
+            fig.add_hline(y=target, line=dict(color='rgba(255,171,0,0.6)', dash='dot'), annotation_text=label,
+                          annotation_font_color='rgba(255,255,255,0.7)')
+
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color='rgba(255,255,255,0.7)')
+        ),
+        xaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            color='rgba(255,255,255,0.5)'
+        ),
+        yaxis=dict(
+            title=f"{MEASURES[measure]} (°)",
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.1)',
+            zeroline=False,
+            color='rgba(255,255,255,0.5)'
+        ),
+        font=dict(color='rgba(255,255,255,0.7)'),
+        height=300
+    )
+    return fig
+
+@timed_span("dashboard.recovery_forecast")
+def show_recovery_forecast(rom_pain_log, surgery_date):
+    """Render the fitted recovery curves and milestone predictions for the dashboard"""
+    state = get_recovery_model(rom_pain_log, surgery_date)
+    if all(fit is None for fit in state['fits'].values()):
+        st.info(f"Log at least {MIN_POINTS} post-surgery ROM measurements to unlock your recovery forecast.")
+        return
+
+    columns = st.columns(len(MEASURES))
+    for col, measure in zip(columns, MEASURES):
+        with col:
+            st.markdown(f"""
+            <div style="margin-bottom: 10px;">
+                <h4 style="color: #36d1dc; margin-bottom: 10px;">{MEASURES[measure]} Recovery Curve</h4>
+            </div>
+            """, unsafe_allow_html=True)
+            if state['fits'][measure] is None:
+                st.info(f"Not enough {MEASURES[measure].lower()} measurements yet.")
+            else:
+                st.plotly_chart(recovery_curve_figure(state, rom_pain_log, surgery_date, measure), use_container_width=True)
+
+    st.table(milestone_forecast(state, rom_pain_log, surgery_date))
@@ -3,7 +3,42 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-from db_utils import remove_rom_pain_entry
+from db_utils import remove_rom_pain_entry, increment_power_level, get_power_level
+import power_level
+from cards import CardTemplate, Raw, emit
+from bulk_import import show_bulk_import
+
+ROM_CARD = CardTemplate("""
+<div class="fitness-card" style="margin-bottom: 15px; position: relative;">
+    <div style="margin-bottom: 15px;">
+        <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">DATE</span>
+        <div style="font-weight: 600; color: #36d1dc; font-size: 1.2rem;">$date</div>
+    </div>
+    <div style="display: flex; flex-wrap: wrap; gap: 20px; margin-bottom: 15px;">
+        <div style="flex: 1; min-width: 120px;">
+            <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">EXTENSION</span>
+            <div style="font-weight: 600; color: $ext_color; font-size: 1.5rem;">$extension°</div>
+        </div>
+        <div style="flex: 1; min-width: 120px;">
+            <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">FLEXION</span>
+            <div style="font-weight: 600; color: $flex_color; font-size: 1.5rem;">$flexion°</div>
+        </div>
+        <div style="flex: 1; min-width: 120px;">
+            <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">PAIN</span>
+            <div style="font-weight: 600; color: $pain_color; font-size: 1.5rem;">$pain/10</div>
+        </div>
+        <div style="flex: 1; min-width: 120px;">
+            <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">SWELLING</span>
+            <div style="font-weight: 600; color: $swell_color; font-size: 1.2rem;">$swelling</div>
+        </div>
+    </div>
+    $notes
+</div>
+""")
+
+ROM_NOTES = CardTemplate("""
+<div style="font-style: italic; color: rgba(255,255,255,0.7); border-top: 1px solid rgba(255,255,255,0.1); padding-top: 10px;">$notes</div>
+""")
 
 def show_rom_pain():
     st.title("Range of Motion & Pain Tracker")
@@ -41,7 +76,7 @@ def show_rom_pain():
                 )
                 
                 # Calculate extension power level (better extension = more power)
-                extension_power = int(max(0, (30 - extension_angle)) * 50)
+                extension_power = int(power_level.extension_power(extension_angle))
                 
             with col2:
                 flexion_angle = st.number_input(
@@ -55,7 +90,7 @@ def show_rom_pain():
                 )
                 
                 # Calculate flexion power level (better flexion = more power)
-                flexion_power = int(flexion_angle * 30)
+                flexion_power = int(power_level.flexion_power(flexion_angle))
             
             # Visual representation of ROM using modern gauges
             col1, col2 = st.columns(2)
@@ -126,7 +161,7 @@ def show_rom_pain():
                 )
                 
                 # Less pain = more power
-                pain_power = int((10 - pain_level) * 80)
+                pain_power = int(power_level.pain_power(pain_level))
                 
             with col2:
                 swelling_options = {
@@ -142,7 +177,7 @@ def show_rom_pain():
                 swelling_value = swelling_options[swelling]
                 
                 # Less swelling = more power
-                swelling_power = int((3 - swelling_value) * 100)
+                swelling_power = int(power_level.swelling_power(swelling_value))
             
             # Visual representation of pain/swelling with better design
             col1, col2 = st.columns(2)
@@ -239,8 +274,11 @@ def show_rom_pain():
                 # Now concatenate with matching dtypes
                 st.session_state.rom_pain_log = pd.concat([st.session_state.rom_pain_log, new_entry], ignore_index=True)
             
-            # Update power level
-            st.session_state.power_level += total_power_gain
+            # Update power level (persisted as a running counter, session value if the DB is unavailable)
+            new_power_level = increment_power_level(st.session_state.current_username, total_power_gain)
+            if new_power_level is None:
+                new_power_level = st.session_state.power_level + total_power_gain
+            st.session_state.power_level = new_power_level
             st.session_state.show_power_up = True
             
             # Modern achievement box with animation
@@ -270,6 +308,8 @@ def show_rom_pain():
             
             # Success message
             st.success(f"Measurements logged successfully! Power level is now {st.session_state.power_level:,}!")
+
+        show_bulk_import('rom_pain')
     
     with tab2:
         # Filter out empty dataframes
@@ -285,7 +325,8 @@ def show_rom_pain():
             """, unsafe_allow_html=True)
             
             # Sort dataframe by date (most recent first)
-            history_df = st.session_state.rom_pain_log.copy()
+            # Sorting takes the only copy; the date column is replaced, never written in place
+            history_df = st.session_state.rom_pain_log.copy(deep=False)
             # Ensure date column is datetime
             history_df['date'] = pd.to_datetime(history_df['date'])
             history_df = history_df.sort_values(by='date', ascending=False)
@@ -437,46 +478,16 @@ def show_rom_pain():
                 pain_color = "#36d1dc" if row['pain_level'] <= 3 else "#5b86e5" if row['pain_level'] <= 6 else "#ff6b6b"
                 swell_color = "#36d1dc" if row['swelling'] <= 1 else "#5b86e5" if row['swelling'] <= 2 else "#ff6b6b"
                 
-                # Card UI
-                st.markdown(f"""
-                <div class="fitness-card" style="margin-bottom: 15px; position: relative;">
-                    <div style="position: absolute; right: 15px; top: 15px;">
-                        <button onclick="alert('To delete this entry, use the delete button below.')" 
-                                style="background: none; border: none; cursor: pointer; color: #ff6b6b; font-size: 18px;">
-                            🗑️
-                        </button>
-                    </div>
-                    
-                    <div style="margin-bottom: 15px;">
-                        <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">DATE</span>
-                        <div style="font-weight: 600; color: #36d1dc; font-size: 1.2rem;">{formatted_date}</div>
-                    </div>
-                    
-                    <div style="display: flex; flex-wrap: wrap; gap: 20px; margin-bottom: 15px;">
-                        <div style="flex: 1; min-width: 120px;">
-                            <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">EXTENSION</span>
-                            <div style="font-weight: 600; color: {ext_color}; font-size: 1.5rem;">{row['extension_angle']}°</div>
-                        </div>
-                        
-                        <div style="flex: 1; min-width: 120px;">
-                            <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">FLEXION</span>
-                            <div style="font-weight: 600; color: {flex_color}; font-size: 1.5rem;">{row['flexion_angle']}°</div>
-                        </div>
-                        
-                        <div style="flex: 1; min-width: 120px;">
-                            <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">PAIN</span>
-                            <div style="font-weight: 600; color: {pain_color}; font-size: 1.5rem;">{row['pain_level']}/10</div>
-                        </div>
-                        
-                        <div style="flex: 1; min-width: 120px;">
-                            <span style="font-size: 0.9rem; color: rgba(255,255,255,0.6);">SWELLING</span>
-                            <div style="font-weight: 600; color: {swell_color}; font-size: 1.2rem;">{swelling_text}</div>
-                        </div>
-                    </div>
-                    
-                    {f'<div style="font-style: italic; color: rgba(255,255,255,0.7); border-top: 1px solid rgba(255,255,255,0.1); padding-top: 10px;">{row["notes"]}</div>' if row["notes"] else ''}
-                </div>
-                """, unsafe_allow_html=True)
+                # Card UI (notes are user text, escaped by the template)
+                notes = row['notes'] if isinstance(row.get('notes'), str) else ""
+                emit(ROM_CARD.render(
+                    date=formatted_date,
+                    ext_color=ext_color, extension=row['extension_angle'],
+                    flex_color=flex_color, flexion=row['flexion_angle'],
+                    pain_color=pain_color, pain=row['pain_level'],
+                    swell_color=swell_color, swelling=swelling_text,
+                    notes=ROM_NOTES.render(notes=notes) if notes else Raw(""),
+                ))
                 
                 # Add a real delete button below each card for functionality
                 if st.button("Delete This Entry", key=f"delete_rom_{row['date']}"):
@@ -484,10 +495,11 @@ def show_rom_pain():
                         # Call MongoDB function to remove the entry
                         success = remove_rom_pain_entry(st.session_state.current_username, row['date'])
                         if success:
-                            # Also update the session state dataframe
+                            # Also update the session state dataframe and the adjusted power level
                             st.session_state.rom_pain_log = st.session_state.rom_pain_log[
                                 st.session_state.rom_pain_log['date'] != row['date']
                             ]
+                            st.session_state.power_level = get_power_level(st.session_state.current_username)
                             st.success(f"Entry from {formatted_date} deleted successfully!")
                             st.rerun()
                         else:
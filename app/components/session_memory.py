@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import pickle
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from perf import get_perf_setting, is_operator
+from metrics import REGISTRY, Counter, Gauge
+
+# Derived data that the analytics modules can rebuild from the logs; the logs and profile always stay in session state
+EVICTABLE_KEYS = ('training_load_cache', 'rom_model_cache', 'load_correlation_cache', 'adherence_cache')
+
+DEFAULT_SESSION_BUDGET_MB = 20
+DEFAULT_SHARED_CACHE_MB = 256
+
+# A session counts as active when it reran within this many seconds; idle sessions' evicted data is dropped
+SESSION_IDLE_SECONDS = 300
+
+# Evicted values beyond the shared in-memory cache budget are pickled here, one directory per process
+SPILL_DIR = os.path.join('data', 'session_spill', str(os.getpid()))
+
+def estimate_size(value, _depth=0):
+    """Approximate memory (bytes) held by a session state value"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if _depth < 4 and isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v, _depth + 1) for v in value.values())
+    if _depth < 4 and isinstance(value, (list, tuple, set)) and len(value) < 10000:
+        return sys.getsizeof(value) + sum(estimate_size(v, _depth + 1) for v in value)
+    return sys.getsizeof(value)
+
+def _megabytes_setting(name, default):
+    try:
+        return float(get_perf_setting(name, default)) * 1024 * 1024
+    except (TypeError, ValueError):
+        return default * 1024 * 1024
+
+def _session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
+
+# Per-session accounting: session id -> {'username', 'total', 'by_key', 'evicted', 'seen'}
+_sessions = {}
+# Evicted values: (session id, key) -> (value, size), least recently stored first
+_shared = OrderedDict()
+_spilled = {}
+_shared_bytes = [0]
+_lock = threading.Lock()
+
+def _spill_path(session_id, key):
+    return os.path.join(SPILL_DIR, f"{session_id}-{key}.pkl")
+
+def _drop_evicted(session_id, key):
+    entry = _shared.pop((session_id, key), None)
+    if entry is not None:
+        _shared_bytes[0] -= entry[1]
+    path = _spilled.pop((session_id, key), None)
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def _store_evicted(session_id, key, value, size):
+    """Keep an evicted value in the shared cache, spilling the oldest entries to disk past its budget"""
+    shared_budget = _megabytes_setting("shared_cache_mb", DEFAULT_SHARED_CACHE_MB)
+    with _lock:
+        _drop_evicted(session_id, key)
+        _shared[(session_id, key)] = (value, size)
+        _shared_bytes[0] += size
+        while _shared_bytes[0] > shared_budget and _shared:
+            (old_session, old_key), (old_value, old_size) = _shared.popitem(last=False)
+            _shared_bytes[0] -= old_size
+            try:
+                os.makedirs(SPILL_DIR, exist_ok=True)
+                path = _spill_path(old_session, old_key)
+                with open(path, 'wb') as f:
+                    pickle.dump(old_value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                _spilled[(old_session, old_key)] = path
+                EVICTIONS.inc(key=old_key, target="disk")
+            except Exception:
+                # Disk unavailable: the value is dropped and rebuilt from the logs on next access
+                pass
+
+def _load_evicted(session_id, key):
+    """Take an evicted value back out of the shared cache or the spill directory (None when it is gone)"""
+    with _lock:
+        entry = _shared.pop((session_id, key), None)
+        if entry is not None:
+            _shared_bytes[0] -= entry[1]
+            return entry[0], "memory"
+        path = _spilled.pop((session_id, key), None)
+    if path is None:
+        return None, "lost"
+    try:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+        os.remove(path)
+        return value, "disk"
+    except Exception:
+        return None, "lost"
+
+def get_derived(key):
+    """Session state value for an evictable key, rehydrated from the shared cache or disk if it was evicted"""
+    accessed = st.session_state.get('derived_accessed')
+    if accessed is None:
+        accessed = st.session_state.derived_accessed = set()
+    accessed.add(key)
+
+    value = st.session_state.get(key)
+    if value is not None:
+        return value
+
+    evicted = st.session_state.get('evicted_keys') or {}
+    if key in evicted:
+        del evicted[key]
+        value, source = _load_evicted(_session_id(), key)
+        REHYDRATIONS.inc(key=key, source=source)
+        if value is not None:
+            st.session_state[key] = value
+    return value
+
+def account_session_memory():
+    """Measure this session's state and evict cold derived data when it is over the per-session budget"""
+    sizes = {key: estimate_size(st.session_state[key]) for key in list(st.session_state.keys())}
+    total = sum(sizes.values())
+    budget = _megabytes_setting("session_memory_budget_mb", DEFAULT_SESSION_BUDGET_MB)
+    session_id = _session_id()
+
+    accessed = st.session_state.get('derived_accessed') or set()
+    evicted = st.session_state.get('evicted_keys')
+    if evicted is None:
+        evicted = st.session_state.evicted_keys = {}
+
+    if total > budget:
+        # Data not used in this rerun goes first, then the largest values
+        candidates = [key for key in EVICTABLE_KEYS if sizes.get(key, 0) > 0 and st.session_state.get(key) is not None]
+        for key in sorted(candidates, key=lambda k: (k in accessed, -sizes[k])):
+            if total <= budget:
+                break
+            _store_evicted(session_id, key, st.session_state[key], sizes[key])
+            st.session_state[key] = None
+            evicted[key] = time.time()
+            EVICTIONS.inc(key=key, target="memory")
+            total -= sizes[key]
+            sizes[key] = 0
+    st.session_state.derived_accessed = set()
+
+    with _lock:
+        _sessions[session_id] = {
+            'username': st.session_state.get('current_username'),
+            'total': total,
+            'by_key': {key: size for key, size in sizes.items() if size},
+            'evicted': sorted(evicted),
+            'seen': time.time(),
+        }
+    return total
+
+def _active_sessions():
+    """Drop sessions idle past SESSION_IDLE_SECONDS together with their evicted data, return the rest"""
+    cutoff = time.time() - SESSION_IDLE_SECONDS
+    with _lock:
+        for session_id in [s for s, info in _sessions.items() if info['seen'] < cutoff]:
+            del _sessions[session_id]
+            for owner, key in [k for k in list(_shared) + list(_spilled) if k[0] == session_id]:
+                _drop_evicted(owner, key)
+        return {session_id: dict(info) for session_id, info in _sessions.items()}
+
+def memory_report(top=10):
+    """Process-wide top memory consumers: one row per session with its largest session state values"""
+    rows = []
+    for session_id, info in _active_sessions().items():
+        largest = sorted(info['by_key'].items(), key=lambda item: -item[1])[:3]
+        rows.append({
+            'session': session_id[:8],
+            'username': info['username'] or "–",
+            'total_mb': round(info['total'] / 1024 / 1024, 2),
+            'largest': ", ".join(f"{key} {size / 1024 / 1024:.2f} MB" for key, size in largest),
+            'evicted': ", ".join(info['evicted']) or "–",
+            'idle_s': int(time.time() - info['seen']),
+        })
+    report = pd.DataFrame(rows)
+    if not report.empty:
+        report = report.sort_values('total_mb', ascending=False).head(top).reset_index(drop=True)
+    return report
+
+def shared_cache_usage():
+    with _lock:
+        return {'memory_bytes': _shared_bytes[0], 'memory_entries': len(_shared), 'disk_entries': len(_spilled)}
+
+def _session_gauge():
+    return {(): len(_active_sessions())}
+
+def _session_bytes_gauge():
+    sizes = [info['total'] for info in _active_sessions().values()]
+    return {('total',): sum(sizes), ('max',): max(sizes, default=0)}
+
+def _shared_cache_gauge():
+    usage = shared_cache_usage()
+    return {('memory_bytes',): usage['memory_bytes'], ('memory_entries',): usage['memory_entries'],
+            ('disk_entries',): usage['disk_entries']}
+
+ACTIVE_SESSIONS = REGISTRY.register(Gauge(
+    "acl_active_sessions", f"Sessions that reran within the last {SESSION_IDLE_SECONDS} seconds",
+    function=_session_gauge))
+SESSION_STATE_BYTES = REGISTRY.register(Gauge(
+    "acl_session_state_bytes", "Estimated session state size across active sessions", ["stat"],
+    function=_session_bytes_gauge))
+SHARED_CACHE = REGISTRY.register(Gauge(
+    "acl_evicted_cache", "Evicted session data held in the shared cache and on disk", ["stat"],
+    function=_shared_cache_gauge))
+EVICTIONS = REGISTRY.register(Counter(
+    "acl_session_evictions_total", "Derived session values moved to the shared cache or spilled to disk",
+    ["key", "target"]))
+REHYDRATIONS = REGISTRY.register(Counter(
+    "acl_session_rehydrations_total", "Evicted session values requested again, by where they were found",
+    ["key", "source"]))
+
+def show_memory_panel(username):
+    """Sidebar report of the sessions using the most memory in this process, for operators"""
+    if not is_operator(username):
+        return
+
+    with st.sidebar.expander("🧠 Memory"):
+        report = memory_report()
+        if report.empty:
+            st.info("No sessions measured yet.")
+            return
+        usage = shared_cache_usage()
+        budget = _megabytes_setting("session_memory_budget_mb", DEFAULT_SESSION_BUDGET_MB) / 1024 / 1024
+        st.caption(f"Budget {budget:g} MB per session. Evicted data: {usage['memory_bytes'] / 1024 / 1024:.2f} MB "
+                   f"in memory ({usage['memory_entries']} values), {usage['disk_entries']} on disk.")
+        st.dataframe(report, use_container_width=True, hide_index=True)
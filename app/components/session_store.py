@@ -0,0 +1,312 @@
+import hmac
+import json
+import time
+import base64
+import socket
+import hashlib
+import sqlite3
+import secrets
+import threading
+from urllib.parse import urlparse
+from perf import get_perf_setting
+
+# Session tokens travel in the ?session= query parameter so any replica can pick the session up
+TOKEN_PARAM = "session"
+KEY_PREFIX = "acl:session:"
+SECRET_KEY = "acl:token-secret"
+DEFAULT_TTL_HOURS = 12
+DEFAULT_REMEMBER_DAYS = 30
+
+# Refresh a session's expiry at most this often instead of on every rerun
+TOUCH_INTERVAL_SECONDS = 300
+
+class MemorySessionStore:
+    """Per-process store; sessions survive reruns and reconnects but not a restart or another replica"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def add(self, key, value):
+        """Set key only if it is missing; returns the value that ends up stored"""
+        with self._lock:
+            return self._data.setdefault(key, (value, None))[0]
+
+    def replace(self, key, value, ttl=None):
+        """Set key only if it still exists (and has not expired); returns whether it did"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[1] is not None and entry[1] < time.time()):
+                return False
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+class SQLiteSessionStore:
+    """File-backed store shared by every replica on the same host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            # WAL lets replicas read while another one writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM sessions WHERE key = ? AND (expires IS NULL OR expires >= ?)", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None))
+
+    def replace(self, key, value, ttl=None):
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE sessions SET value = ?, expires = ? WHERE key = ? AND (expires IS NULL OR expires >= ?)",
+            (value, now + ttl if ttl else None, key, now))
+        return cursor.rowcount > 0
+
+    def add(self, key, value):
+        connection = self._connection()
+        connection.execute("INSERT OR IGNORE INTO sessions (key, value, expires) VALUES (?, ?, NULL)", (key, value))
+        return connection.execute("SELECT value FROM sessions WHERE key = ?", (key,)).fetchone()[0]
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        self._connection().execute("DELETE FROM sessions WHERE expires < ?", (time.time(),))
+
+class RedisSessionStore:
+    """Minimal RESP client for Redis or a Redis protocol-compatible stand-in (GET/SET EX NX XX/DEL only)"""
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or "127.0.0.1", parsed.port or 6379)
+        self.database = int(parsed.path.strip('/') or 0)
+        self.password = parsed.password
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=5)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.password:
+            self._command("AUTH", self.password)
+        if self.database:
+            self._command("SELECT", str(self.database))
+
+    def _command(self, *parts):
+        if getattr(self._local, 'sock', None) is None:
+            self._connect()
+        payload = [f"*{len(parts)}\r\n".encode()]
+        for part in parts:
+            data = part if isinstance(part, bytes) else str(part).encode()
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        try:
+            self._local.sock.sendall(b"".join(payload))
+            return self._read_reply()
+        except (OSError, ConnectionError):
+            # Drop the broken connection so the next call reconnects
+            self._local.sock = None
+            raise
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Session store closed the connection")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RuntimeError(f"Session store error: {body.decode()}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)[:-2]
+            return data.decode()
+        if kind == b"*":
+            return [self._read_reply() for _ in range(int(body))]
+        raise RuntimeError(f"Unexpected reply from session store: {line!r}")
+
+    def get(self, key):
+        return self._command("GET", key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self._command("SET", key, value, "EX", str(int(ttl)))
+        else:
+            self._command("SET", key, value)
+
+    def replace(self, key, value, ttl=None):
+        if ttl:
+            return self._command("SET", key, value, "EX", str(int(ttl)), "XX") is not None
+        return self._command("SET", key, value, "XX") is not None
+
+    def add(self, key, value):
+        self._command("SET", key, value, "NX")
+        return self._command("GET", key)
+
+    def delete(self, key):
+        self._command("DEL", key)
+
+def create_store(spec):
+    """Store from a spec: "memory", "sqlite:///path/to/sessions.db" or "redis://host:port/db" """
+    spec = (spec or "memory").strip()
+    if spec == "memory":
+        return MemorySessionStore()
+    if spec.startswith("sqlite:///"):
+        return SQLiteSessionStore(spec[len("sqlite:///"):])
+    if spec.startswith("redis://"):
+        return RedisSessionStore(spec)
+    raise ValueError(f"Unknown session store: {spec}")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store():
+    """Process-wide store configured by session_store (secrets) or SESSION_STORE (environment)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store(get_perf_setting("session_store", "memory"))
+    return _store
+
+def _setting_seconds(name, default, unit):
+    try:
+        return float(get_perf_setting(name, default)) * unit
+    except (TypeError, ValueError):
+        return default * unit
+
+def _ttl_seconds(remember=False):
+    if remember:
+        return _setting_seconds("remember_me_days", DEFAULT_REMEMBER_DAYS, 86400)
+    return _setting_seconds("session_ttl_hours", DEFAULT_TTL_HOURS, 3600)
+
+_signing_key = None
+
+def _get_signing_key():
+    """HMAC key from session_secret, otherwise one generated once and shared through the store"""
+    global _signing_key
+    if _signing_key is None:
+        secret = get_perf_setting("session_secret")
+        if not secret:
+            secret = get_session_store().add(SECRET_KEY, secrets.token_urlsafe(32))
+        _signing_key = secret.encode()
+    return _signing_key
+
+def _signature(session_id, expires):
+    digest = hmac.new(_get_signing_key(), f"{session_id}.{expires}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+def sign_token(session_id, expires):
+    """URL-safe token "<session id>.<expiry>.<HMAC-SHA256 signature>" """
+    expires = int(expires)
+    return f"{session_id}.{expires}.{_signature(session_id, expires)}"
+
+def verify_token(token):
+    """Session id of a well-formed, correctly signed and unexpired token, else None (no store round trip)"""
+    try:
+        session_id, expires, signature = token.split('.')
+        expires = int(expires)
+    except (AttributeError, ValueError):
+        return None
+    if expires < time.time():
+        return None
+    if not hmac.compare_digest(signature, _signature(session_id, expires)):
+        return None
+    return session_id
+
+def create_session(username, data=None, remember=False):
+    """Issue a signed token for a logged-in user and store its lightweight session data
+
+    Remembered sessions last remember_me_days, others session_ttl_hours; both are revoked by end_session().
+    """
+    session_id = secrets.token_urlsafe(16)
+    ttl = _ttl_seconds(remember)
+    now = time.time()
+    session = {'username': username, 'created_at': now, 'touched_at': now, 'remember': remember, **(data or {})}
+    get_session_store().set(KEY_PREFIX + session_id, json.dumps(session), ttl)
+    return sign_token(session_id, now + ttl)
+
+def load_session(token):
+    """Session data for a token, or None when it is forged, expired or revoked"""
+    session_id = verify_token(token)
+    if session_id is None:
+        return None
+    try:
+        value = get_session_store().get(KEY_PREFIX + session_id)
+    except Exception:
+        # An unreachable store only costs the user a login
+        return None
+    return json.loads(value) if value else None
+
+def touch_session(token, session, data=None):
+    """Check the session is still live and slide its expiry (and update its data) if not refreshed recently
+
+    Returns the token, re-signed with the new expiry when it was refreshed, and the session data, or
+    (token, None) once the token has expired or the session was revoked (by end_session() on any replica).
+    """
+    session_id = verify_token(token)
+    if session_id is None:
+        return token, None
+    store = get_session_store()
+    now = time.time()
+    try:
+        if data is None and now - session.get('touched_at', session.get('created_at', 0)) < TOUCH_INTERVAL_SECONDS:
+            return token, (session if store.get(KEY_PREFIX + session_id) is not None else None)
+        ttl = _ttl_seconds(session.get('remember', False))
+        session = {**session, **(data or {}), 'touched_at': now}
+        # Only an existing record is refreshed: a revoked session must not be written back
+        if not store.replace(KEY_PREFIX + session_id, json.dumps(session), ttl):
+            return token, None
+    except Exception:
+        # An unreachable store keeps the user logged in until it is back
+        return token, session
+    return sign_token(session_id, now + ttl), session
+
+def end_session(token):
+    """Revoke a token server-side; its signature stays valid but the session record is gone"""
+    session_id = (token or "").split('.')[0]
+    if not session_id:
+        return
+    try:
+        get_session_store().delete(KEY_PREFIX + session_id)
+    except Exception:
+        pass
@@ -0,0 +1,199 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from db_utils import get_changes_since, get_stored_usernames
+from data_export import KINDS, FIELDS, iter_batches, parquet_schema
+from perf import timed_span, get_perf_setting
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_DIRECTORY = os.path.join('data', 'snapshot')
+DEFAULT_BUCKETS = 16
+PART_FILE = "part-0.parquet"
+UNKNOWN_MONTH = "unknown"
+
+# Changes are stamped by the app servers' clocks: each run looks this far behind the previous
+# watermark, so a little clock skew re-reads a few users instead of missing them
+DEFAULT_OVERLAP_SECONDS = 300
+
+def user_bucket(username, buckets):
+    # crc32 rather than hash(): the same bucket in every process and Python version
+    return zlib.crc32(str(username).encode('utf-8')) % buckets
+
+def _dated(kind):
+    return 'date' in FIELDS[kind]
+
+def _partition_path(kind, bucket, month=None):
+    # Hive-style directories: readers get month and user_bucket back as columns
+    parts = [kind] + ([f"month={month}"] if month is not None else []) + [f"user_bucket={bucket:02d}", PART_FILE]
+    return "/".join(parts)
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def _empty_manifest(buckets):
+    return {
+        'version': MANIFEST_VERSION,
+        'buckets': buckets,
+        'watermark': None,
+        'tables': {
+            kind: {
+                'partitioning': (['month'] if _dated(kind) else []) + ['user_bucket'],
+                'schema': dict(FIELDS[kind]),
+                'rows': 0,
+                'files': {},
+            }
+            for kind in KINDS
+        },
+    }
+
+def _remove_file(directory, path):
+    full = os.path.join(directory, path)
+    if os.path.exists(full):
+        os.remove(full)
+    # Drop the partition directories left empty
+    folder = os.path.dirname(full)
+    while os.path.normpath(folder) != os.path.normpath(directory):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            break
+        folder = os.path.dirname(folder)
+
+def _bucket_files(directory, kind, bucket):
+    # Listed from disk rather than the manifest, so files left by a run that died before writing its
+    # manifest are folded back in or removed
+    pattern = _partition_path(kind, bucket, "*" if _dated(kind) else None)
+    return sorted(os.path.relpath(path, directory).replace(os.sep, "/") for path in glob.glob(os.path.join(directory, pattern)))
+
+def _rebuild_bucket(directory, kind, bucket, changed, batch_size):
+    """Rewrite one user bucket of a table: its snapshot rows minus the changed users', plus their current rows
+
+    Only the changed users are read from the database; everyone else in the bucket comes from the
+    existing Parquet files. Returns the bucket's new file entries.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(kind)
+    existing = _bucket_files(directory, kind, bucket)
+    changed_users = pa.array(sorted(changed), pa.string())
+    tables = []
+    for path in existing:
+        table = pq.read_table(os.path.join(directory, path), schema=schema)
+        tables.append(table.filter(pc.invert(pc.is_in(table['username'], value_set=changed_users))))
+    for frame in iter_batches(kind, usernames=sorted(changed), batch_size=batch_size):
+        tables.append(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+    table = pa.concat_tables(tables) if tables else schema.empty_table()
+
+    sort_keys = [('username', 'ascending')] + ([('date', 'ascending')] if _dated(kind) else [])
+    table = table.sort_by(sort_keys)
+    if _dated(kind):
+        months = pc.fill_null(pc.strftime(table['date'], format='%Y-%m'), UNKNOWN_MONTH)
+        parts = {month: table.filter(pc.equal(months, month)) for month in pc.unique(months).to_pylist()}
+    else:
+        parts = {None: table} if table.num_rows else {}
+
+    written = {}
+    for month, part in parts.items():
+        path = _partition_path(kind, bucket, month)
+        full = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        # Written aside and renamed, so a reader never opens a half-written file
+        pq.write_table(part, full + ".tmp")
+        os.replace(full + ".tmp", full)
+        written[path] = {'rows': part.num_rows, 'month': month, 'user_bucket': bucket}
+    for path in existing:
+        if path not in written:
+            _remove_file(directory, path)
+    return written
+
+@timed_span("snapshot.run")
+def run_snapshot(directory=None, buckets=None, full=False, batch_size=None, overlap_seconds=None):
+    """Bring the Parquet snapshot up to date with the users written since the previous run
+
+    The first run, a changed bucket count or full=True rebuilds every table from scratch. Returns a
+    summary of what was refreshed.
+    """
+    directory = directory or get_perf_setting("snapshot_dir", DEFAULT_DIRECTORY)
+    buckets = int(buckets or get_perf_setting("snapshot_buckets", DEFAULT_BUCKETS))
+    if overlap_seconds is None:
+        overlap_seconds = float(get_perf_setting("snapshot_overlap_seconds", DEFAULT_OVERLAP_SECONDS))
+    started = time.perf_counter()
+    # Taken before reading: anything written while this run reads is picked up by the next one
+    watermark = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    manifest = load_manifest(directory)
+    full = full or manifest is None or manifest.get('version') != MANIFEST_VERSION or manifest.get('buckets') != buckets \
+        or manifest.get('watermark') is None
+    if full:
+        changes = {kind: get_stored_usernames(kind) for kind in KINDS}
+        if any(users is None for users in changes.values()):
+            raise ConnectionError("Database connection failed")
+        for kind in KINDS:
+            shutil.rmtree(os.path.join(directory, kind), ignore_errors=True)
+        manifest = _empty_manifest(buckets)
+    else:
+        changes = get_changes_since(datetime.fromisoformat(manifest['watermark']) - timedelta(seconds=overlap_seconds))
+        if changes is None:
+            raise ConnectionError("Database connection failed")
+    os.makedirs(directory, exist_ok=True)
+
+    summary = {'full': full, 'users': {}, 'buckets': {}}
+    for kind in KINDS:
+        table = manifest['tables'][kind]
+        by_bucket = {}
+        for username in changes.get(kind, ()):
+            by_bucket.setdefault(user_bucket(username, buckets), set()).add(username)
+        for bucket, users in sorted(by_bucket.items()):
+            written = _rebuild_bucket(directory, kind, bucket, users, batch_size)
+            table['files'] = {path: entry for path, entry in table['files'].items() if entry['user_bucket'] != bucket}
+            table['files'].update(written)
+        table['rows'] = sum(entry['rows'] for entry in table['files'].values())
+        summary['users'][kind] = len(changes.get(kind, ()))
+        summary['buckets'][kind] = len(by_bucket)
+
+    manifest['watermark'] = watermark.isoformat()
+    manifest['last_run'] = {**summary, 'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                            'seconds': round(time.perf_counter() - started, 3)}
+    # The manifest goes last: it only ever lists files that are completely written
+    _write_manifest(directory, manifest)
+    summary['rows'] = {kind: manifest['tables'][kind]['rows'] for kind in KINDS}
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the partitioned Parquet snapshot of profiles and logs")
+    parser.add_argument('--out', help=f"snapshot directory (default snapshot_dir, {DEFAULT_DIRECTORY})")
+    parser.add_argument('--buckets', type=int, help=f"user hash buckets (default snapshot_buckets, {DEFAULT_BUCKETS})")
+    parser.add_argument('--full', action='store_true', help="rebuild everything instead of only the changed users")
+    parser.add_argument('--batch-size', type=int, help="documents per cursor batch")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run_snapshot(args.out, args.buckets, args.full, args.batch_size)
+    except ConnectionError as e:
+        raise SystemExit(f"Snapshot failed: {e}")
+    print(f"{'full rebuild' if summary['full'] else 'incremental'}")
+    for kind in KINDS:
+        print(f"{kind:<10} {summary['users'][kind]:>7,} users refreshed in {summary['buckets'][kind]:>3} buckets, "
+              f"{summary['rows'][kind]:>10,} rows in snapshot")
+    return summary
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+import threading
+from collections import OrderedDict
+import streamlit as st
+import pandas as pd
+import numpy as np
+from heatmap import to_day_numbers
+from training_load import log_version
+from rom_model import ROM_KEY_COLUMNS, MEASURES
+from exercise_catalog import normalize
+from rehab_protocol import get_protocol
+from perf import timed_span, get_perf_setting
+from metrics import CACHE_LOOKUPS
+
+# The trend is a least-squares line through the measurements of the TREND_WINDOW_DAYS up to the latest one.
+# Recovery curves flatten out, so a recent linear trend is a deliberately local (not lifetime) projection.
+TREND_WINDOW_DAYS = 28
+MIN_TREND_POINTS = 2
+HORIZON_DAYS = 730
+DEFAULT_CACHE_ENTRIES = 2000
+
+GAP_COLUMNS = [
+    'username', 'phase', 'target', 'goal', 'unit', 'direction', 'value', 'latest', 'latest_date',
+    'trend', 'slope_per_week', 'gap', 'days_to_target', 'projected_date', 'status',
+]
+
+def phase_targets(phase):
+    """The targets of a phase as rows: ROM limits, load-based strength targets, and those the logs cannot measure"""
+    rom = phase['rom_targets']
+    targets = [
+        {'key': 'extension_angle', 'target': "Extension", 'goal': f"≤ {rom['extension_max']}°", 'unit': "°",
+         'value': rom['extension_max'], 'direction': -1},
+        {'key': 'flexion_angle', 'target': "Flexion", 'goal': f"≥ {rom['flexion_min']}°", 'unit': "°",
+         'value': rom['flexion_min'], 'direction': 1},
+    ]
+    for target in phase['strength_targets']:
+        if target.get('metric') == 'bw_ratio' and target.get('exercise'):
+            reps = target.get('reps') or 1
+            targets.append({'key': f"bw_ratio:{normalize(target['exercise'])}:{reps}", 'target': target['measure'],
+                            'goal': target['target'], 'unit': "× BW", 'value': target['value'], 'direction': 1,
+                            'exercise': target['exercise'], 'reps': reps})
+        else:
+            # Limb symmetry and test batteries are measured in clinic, not in the patient's logs
+            targets.append({'key': None, 'target': target['measure'], 'goal': target['target'], 'unit': "",
+                            'value': target.get('value'), 'direction': 1})
+    return targets
+
+def _rom_observations(rom_pain_log, surgery_day):
+    if rom_pain_log is None or rom_pain_log.empty:
+        return []
+    days, valid = to_day_numbers(rom_pain_log['date'])
+    return [
+        pd.DataFrame({'key': measure, 't': days - surgery_day,
+                      'value': pd.to_numeric(rom_pain_log[measure], errors='coerce').to_numpy(dtype=float)})[valid]
+        for measure in MEASURES if measure in rom_pain_log.columns
+    ]
+
+def _strength_observations(exercise_log, targets, surgery_day, body_weight):
+    """Load lifted for at least the target reps, as a multiple of body weight"""
+    strength = [target for target in targets if 'exercise' in target]
+    if not strength or exercise_log is None or exercise_log.empty or not body_weight or body_weight <= 0:
+        return []
+    days, valid = to_day_numbers(exercise_log['date'])
+    names = exercise_log['exercise'].astype(str).map(normalize).to_numpy()
+    reps = pd.to_numeric(exercise_log['reps'], errors='coerce').to_numpy(dtype=float)
+    ratio = pd.to_numeric(exercise_log['weight'], errors='coerce').to_numpy(dtype=float) / body_weight
+    frames = []
+    for target in strength:
+        keep = valid & (names == normalize(target['exercise'])) & (reps >= target['reps']) & (ratio > 0)
+        frames.append(pd.DataFrame({'key': target['key'], 't': days[keep] - surgery_day, 'value': ratio[keep]}))
+    return frames
+
+def _patient_frames(patient, today_day, protocol):
+    """Target rows and (day, value) observations for one patient; None when there is no surgery date"""
+    profile = patient['profile']
+    surgery_date = profile.get('surgery_date')
+    if not surgery_date or pd.isna(surgery_date):
+        return None
+    surgery_day = int(np.datetime64(pd.Timestamp(surgery_date).date(), 'D').astype(np.int64))
+    phase = protocol.phase_for_day(today_day - surgery_day)
+    targets = pd.DataFrame(phase_targets(phase)).assign(
+        username=patient['username'],
+        phase=phase['name'],
+        phase_end=phase['end_day'] if phase['end_day'] is not None else np.inf,
+        surgery_day=surgery_day,
+        today_t=today_day - surgery_day,
+        order=lambda frame: np.arange(len(frame)),
+    )
+    weight = pd.to_numeric(pd.Series([profile.get('weight')]), errors='coerce').iloc[0]
+    observations = (_rom_observations(patient.get('rom_pain_log'), surgery_day)
+                    + _strength_observations(patient.get('exercise_log'), phase_targets(phase), surgery_day, weight))
+    observations = [frame.assign(username=patient['username']) for frame in observations if not frame.empty]
+    return targets, observations
+
+def compute_target_gaps(patients, today=None, protocol=None):
+    """Distance to each current-phase target and projected time to reach it, for many patients in one pass
+
+    patients: iterable of {'username', 'profile': {'surgery_date', 'weight'}, 'exercise_log', 'rom_pain_log'}.
+    Per-day values are collected for every patient first, then latest values and trend fits are
+    grouped sums over one frame rather than a loop per patient and target.
+    """
+    protocol = protocol or get_protocol()
+    today_day = int(np.datetime64(pd.Timestamp(today or pd.Timestamp.today()).date(), 'D').astype(np.int64))
+
+    target_frames, observation_frames = [], []
+    for patient in patients:
+        frames = _patient_frames(patient, today_day, protocol)
+        if frames is not None:
+            target_frames.append(frames[0])
+            observation_frames.extend(frames[1])
+    if not target_frames:
+        return pd.DataFrame(columns=GAP_COLUMNS)
+    targets = pd.concat(target_frames, ignore_index=True)
+    today_t = targets.groupby('username')['today_t'].first()
+
+    if observation_frames:
+        observations = pd.concat(observation_frames, ignore_index=True).dropna(subset=['value'])
+        observations = observations[observations['t'] <= observations['username'].map(today_t)]
+    else:
+        observations = pd.DataFrame(columns=['key', 't', 'value', 'username'])
+    keys = ['username', 'key']
+
+    # One value per day: the mean ROM reading, the heaviest qualifying lift
+    is_rom = observations['key'].isin(list(MEASURES))
+    daily = pd.concat([
+        observations[is_rom].groupby(keys + ['t'], as_index=False)['value'].mean(),
+        observations[~is_rom].groupby(keys + ['t'], as_index=False)['value'].max(),
+    ], ignore_index=True).sort_values(keys + ['t'])
+
+    latest = daily.groupby(keys).tail(1).rename(columns={'t': 'latest_t', 'value': 'latest'})
+
+    # Least-squares line over the trailing window, centred on the latest day so the intercept is the trend value
+    window = daily.merge(latest[keys + ['latest_t']], on=keys)
+    window = window[window['t'] >= window['latest_t'] - TREND_WINDOW_DAYS]
+    x = (window['t'] - window['latest_t']).astype(float)
+    sums = window.assign(x=x, xx=x * x, xy=x * window['value']).groupby(keys).agg(
+        n=('x', 'size'), sx=('x', 'sum'), sy=('value', 'sum'), sxx=('xx', 'sum'), sxy=('xy', 'sum'))
+    det = sums['n'] * sums['sxx'] - sums['sx'] ** 2
+    fitted = (sums['n'] >= MIN_TREND_POINTS) & (det > 1e-9)
+    sums['slope'] = np.where(fitted, (sums['n'] * sums['sxy'] - sums['sx'] * sums['sy']) / det.where(fitted, 1), np.nan)
+    sums['trend'] = np.where(fitted, (sums['sy'] - sums['slope'] * sums['sx']) / sums['n'], np.nan)
+
+    result = (targets.merge(latest, on=keys, how='left')
+              .merge(sums[['slope', 'trend']].reset_index(), on=keys, how='left'))
+    direction = result['direction']
+    result['gap'] = np.maximum(direction * (result['value'] - result['latest']), 0)
+
+    # Days from the latest measurement until the trend line crosses the target
+    rate = direction * result['slope']
+    remaining = np.maximum(direction * (result['value'] - result['trend']), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        projected_t = result['latest_t'] + np.where(rate > 0, remaining / rate, np.nan)
+    projected_t = projected_t.where(projected_t - result['today_t'] <= HORIZON_DAYS)
+    projected_t = projected_t.mask(result['gap'] <= 0, result['latest_t'])
+    # The trend crossed the target before today but the latest (stale) measurement has not: no days left to
+    # count, the projection is out of date until the patient measures again
+    overdue = (result['gap'] > 0) & (projected_t < result['today_t'])
+    result['days_to_target'] = np.ceil(np.maximum(projected_t - result['today_t'], 0)).mask(overdue)
+    result['slope_per_week'] = result['slope'] * 7
+
+    to_date = lambda t: pd.to_datetime(result['surgery_day'] + t, unit='D')
+    result['latest_date'] = to_date(result['latest_t'])
+    result['projected_date'] = to_date(np.ceil(projected_t.where(overdue, np.maximum(projected_t, result['today_t']))))
+
+    result['status'] = np.select(
+        [
+            result['key'].isna(),
+            result['latest'].isna(),
+            result['gap'] <= 0,
+            result['slope'].isna(),
+            projected_t.isna(),
+            overdue,
+            projected_t <= result['phase_end'],
+        ],
+        ["Measured in clinic", "No measurements", "Met", "Not enough data", "Not progressing", "Re-measure", "On track"],
+        default="Behind",
+    )
+    return result.sort_values(['username', 'order'])[GAP_COLUMNS].reset_index(drop=True)
+
+class _GapCache:
+    """Per-patient gap rows shared across sessions, keyed by the data they were computed from (LRU)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username, version):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(username)
+            return entry[1]
+
+    def put(self, username, version, rows):
+        with self._lock:
+            self._entries[username] = (version, rows)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_cache = _GapCache(int(get_perf_setting("target_gap_cache_entries", DEFAULT_CACHE_ENTRIES)))
+
+def _version(patient, today):
+    profile = patient['profile']
+    return (
+        str(profile.get('surgery_date')),
+        str(profile.get('weight')),
+        pd.Timestamp(today).date().isoformat(),
+        log_version(patient.get('exercise_log')),
+        log_version(patient.get('rom_pain_log'), ROM_KEY_COLUMNS),
+    )
+
+def target_gaps(patients, today=None, protocol=None):
+    """compute_target_gaps with per-patient caching: only patients whose data changed are recomputed, in one batch"""
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    cached, stale, versions = [], [], {}
+    for patient in patients:
+        versions[patient['username']] = version = _version(patient, today)
+        rows = _cache.get(patient['username'], version)
+        if rows is None:
+            stale.append(patient)
+        else:
+            cached.append(rows)
+    CACHE_LOOKUPS.inc(len(cached), cache="target_gaps", result="hit")
+    CACHE_LOOKUPS.inc(len(stale), cache="target_gaps", result="miss")
+
+    if stale:
+        computed = compute_target_gaps(stale, today, protocol)
+        for patient in stale:
+            rows = computed[computed['username'] == patient['username']].reset_index(drop=True)
+            _cache.put(patient['username'], versions[patient['username']], rows)
+            cached.append(rows)
+    frames = [rows for rows in cached if not rows.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=GAP_COLUMNS)
+
+def get_target_gaps(exercise_log, rom_pain_log, surgery_date, weight):
+    """Target gaps for the logged-in user"""
+    return target_gaps([{
+        'username': st.session_state.get('current_username'),
+        'profile': {'surgery_date': surgery_date, 'weight': weight},
+        'exercise_log': exercise_log,
+        'rom_pain_log': rom_pain_log,
+    }])
+
+def _format(value, unit, digits=1):
+    if value is None or pd.isna(value):
+        return "–"
+    return f"{value:.{digits}f}{unit}" if unit == "°" else f"{value:.{digits + 1}f} {unit}".strip()
+
+STATUS_COLORS = {"Met": "#4caf50", "On track": "#36d1dc", "Behind": "#ffab00", "Re-measure": "#ffab00",
+                 "Not progressing": "#ff6b6b"}
+
+@timed_span("dashboard.target_gaps")
+def show_target_gaps(exercise_log, rom_pain_log, surgery_date, weight):
+    """Render the current phase's targets against the latest and trending measurements for the dashboard"""
+    gaps = get_target_gaps(exercise_log, rom_pain_log, surgery_date, weight)
+    if gaps.empty:
+        st.info("Add your surgery date to compare your measurements with your phase targets.")
+        return
+
+    rows = []
+    for _, gap in gaps.iterrows():
+        expected = "–"
+        if gap['status'] == "Met":
+            expected = "Reached"
+        elif gap['status'] == "Re-measure":
+            expected = f"Due {gap['projected_date']:%b %d}, not yet measured"
+        elif not pd.isna(gap['days_to_target']):
+            expected = f"{gap['projected_date']:%b %d} ({gap['days_to_target']:.0f} days)"
+        rows.append({
+            'Target': gap['target'],
+            'Goal': gap['goal'],
+            'Latest': _format(gap['latest'], gap['unit']),
+            'Trend': _format(gap['trend'], gap['unit']),
+            'Per week': "–" if pd.isna(gap['slope_per_week']) else f"{gap['slope_per_week']:+.{1 if gap['unit'] == '°' else 2}f}",
+            'Gap': _format(gap['gap'], gap['unit']),
+            'Expected': expected,
+            'Status': gap['status'],
+        })
+    table = pd.DataFrame(rows)
+    st.markdown(f"**{gaps['phase'].iloc[0]} targets**")
+    st.dataframe(
+        table.style.map(lambda status: f"color: {STATUS_COLORS.get(status, 'rgba(255,255,255,0.6)')}", subset=['Status']),
+        use_container_width=True, hide_index=True,
+    )
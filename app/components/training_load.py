@@ -0,0 +1,274 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from heatmap import to_day_numbers
+from perf import timed_span
+from metrics import record_cache_lookup
+from session_memory import get_derived
+
+# Rolling windows (days) for the acute:chronic workload ratio and monotony/strain
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+# Entries logged before the difficulty slider was stored get the slider's default
+DEFAULT_DIFFICULTY = 5
+
+# Rows of the per-day load matrix
+VOLUME, RPE, REPS = 0, 1, 2
+
+def entry_loads(exercise_log):
+    """Per-entry day numbers, loads (volume = sets x reps x kg, session RPE, total reps) and the mask of dated rows"""
+    def column(name, default):
+        if name not in exercise_log.columns:
+            return np.full(len(exercise_log), float(default))
+        return pd.to_numeric(exercise_log[name], errors='coerce').fillna(default).to_numpy(dtype=float)
+
+    days, valid = to_day_numbers(exercise_log['date'])
+    sets = column('sets', 0)
+    reps = column('reps', 0)
+    weight = column('weight', 0)
+    difficulty = column('difficulty', DEFAULT_DIFFICULTY)
+
+    total_reps = sets * reps
+    # No session duration is recorded, so total reps stand in for minutes in the sRPE formula
+    loads = np.vstack([total_reps * weight, total_reps * difficulty, total_reps])
+    return days[valid], loads[:, valid], valid
+
+ROW_KEY_COLUMNS = ('date', 'exercise', 'sets', 'reps', 'weight', 'difficulty')
+
+def row_key(log, position, columns=ROW_KEY_COLUMNS):
+    # Cheap identity for a logged row, used to check that earlier rows are unchanged
+    row = log.iloc[position]
+    return tuple(str(row.get(col)) for col in columns)
+
+def log_version(log, columns=ROW_KEY_COLUMNS):
+    """Version tag for a log that only ever grows by appending (deletes reload it with a new length)"""
+    if log is None or log.empty:
+        return (0, None)
+    return (len(log), row_key(log, 0, columns), row_key(log, len(log) - 1, columns))
+
+def _rolling(cumulative, window):
+    # Trailing window sums from a zero-prefixed cumulative sum
+    padded = np.concatenate([np.zeros(window), cumulative[1:]])
+    return cumulative[1:] - padded[:len(cumulative) - 1]
+
+def _refresh_cumulative(state, from_index):
+    # Only the cumulative sums from the first changed day onwards need recomputing
+    daily = state['daily']
+    cums = state['cumsum']
+    cums[:, from_index + 1:] = cums[:, from_index:from_index + 1] + np.cumsum(daily[:, from_index:], axis=1)
+    squares = state['cumsum_sq']
+    squares[from_index + 1:] = squares[from_index] + np.cumsum(daily[RPE, from_index:] ** 2)
+
+def _extend(state, last_day):
+    # Grow the daily grid with rest days up to last_day (cumulative sums just carry forward)
+    extra = last_day - (state['start_day'] + state['daily'].shape[1] - 1)
+    if extra <= 0:
+        return
+    state['daily'] = np.hstack([state['daily'], np.zeros((3, extra))])
+    state['cumsum'] = np.hstack([state['cumsum'], np.repeat(state['cumsum'][:, -1:], extra, axis=1)])
+    state['cumsum_sq'] = np.concatenate([state['cumsum_sq'], np.repeat(state['cumsum_sq'][-1:], extra)])
+
+def build_training_load(exercise_log, today=None):
+    """Aggregate the whole exercise history into per-day loads in one pass"""
+    today_day = int(np.datetime64(pd.Timestamp(today or pd.Timestamp.today()).date(), 'D').astype(np.int64))
+    days, loads, _ = entry_loads(exercise_log)
+    state = {
+        'n_rows': len(exercise_log),
+        'last_key': row_key(exercise_log, len(exercise_log) - 1) if len(exercise_log) else None,
+    }
+    if len(days) == 0:
+        state.update({'start_day': None})
+        return state
+
+    start_day = int(days.min())
+    n_days = max(int(days.max()), today_day) - start_day + 1
+    offsets = days - start_day
+
+    # Scatter every entry onto the daily grid with one bincount per load type
+    daily = np.vstack([np.bincount(offsets, weights=loads[i], minlength=n_days) for i in range(3)])
+
+    state.update({
+        'start_day': start_day,
+        'daily': daily,
+        'cumsum': np.zeros((3, n_days + 1)),
+        'cumsum_sq': np.zeros(n_days + 1),
+    })
+    _refresh_cumulative(state, 0)
+    return state
+
+def update_training_load(state, exercise_log, today=None):
+    """Fold rows appended since the last call into the cached state, rebuilding only when history changed"""
+    n_cached = state['n_rows'] if state else 0
+    appended_only = (
+        state is not None
+        and state.get('start_day') is not None
+        and len(exercise_log) >= n_cached > 0
+        and row_key(exercise_log, n_cached - 1) == state['last_key']
+    )
+    if not appended_only:
+        return build_training_load(exercise_log, today)
+
+    today_day = int(np.datetime64(pd.Timestamp(today or pd.Timestamp.today()).date(), 'D').astype(np.int64))
+    days, loads, _ = entry_loads(exercise_log.iloc[n_cached:])
+
+    # Entries back-dated before the start of the grid need a full rebuild
+    if len(days) and int(days.min()) < state['start_day']:
+        return build_training_load(exercise_log, today)
+
+    _extend(state, max([today_day] + ([int(days.max())] if len(days) else [])))
+
+    if len(days):
+        offsets = days - state['start_day']
+        for i in range(3):
+            np.add.at(state['daily'][i], offsets, loads[i])
+        _refresh_cumulative(state, int(offsets.min()))
+
+    state['n_rows'] = len(exercise_log)
+    state['last_key'] = row_key(exercise_log, len(exercise_log) - 1)
+    return state
+
+def training_load_metrics(state):
+    """Daily volume/RPE load with ACWR, monotony and strain over rolling windows"""
+    if not state or state.get('start_day') is None:
+        return pd.DataFrame(columns=[
+            'date', 'volume_load', 'rpe_load', 'total_reps', 'acute_load', 'chronic_load', 'acwr', 'monotony', 'strain'
+        ])
+
+    cums = state['cumsum']
+    n_days = state['daily'].shape[1]
+    index = np.arange(n_days)
+
+    acute_sum = _rolling(cums[RPE], ACUTE_DAYS)
+    acute = acute_sum / ACUTE_DAYS
+    chronic = _rolling(cums[RPE], CHRONIC_DAYS) / CHRONIC_DAYS
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # ACWR is only meaningful once a full chronic window has been logged
+        acwr = np.where((chronic > 0) & (index >= CHRONIC_DAYS - 1), acute / chronic, np.nan)
+
+        # Monotony = weekly mean / weekly standard deviation of daily load
+        mean_sq = _rolling(state['cumsum_sq'], ACUTE_DAYS) / ACUTE_DAYS
+        std = np.sqrt(np.maximum(mean_sq - acute ** 2, 0))
+        monotony = np.where((std > 1e-9) & (index >= ACUTE_DAYS - 1), acute / std, np.nan)
+    strain = acute_sum * monotony
+
+    dates = pd.to_datetime(np.datetime64(state['start_day'], 'D') + index.astype('timedelta64[D]'))
+    return pd.DataFrame({
+        'date': dates,
+        'volume_load': state['daily'][VOLUME],
+        'rpe_load': state['daily'][RPE],
+        'total_reps': state['daily'][REPS],
+        'acute_load': acute,
+        'chronic_load': chronic,
+        'acwr': acwr,
+        'monotony': monotony,
+        'strain': strain,
+    })
+
+def get_training_load(exercise_log):
+    """Training load metrics for the logged-in user, cached in session state between reruns"""
+    cache = get_derived('training_load_cache')
+    if cache is None or cache.get('username') != st.session_state.get('current_username'):
+        cache = {'username': st.session_state.get('current_username'), 'state': None}
+
+    state_before = cache['state']
+    rows_before = state_before['n_rows'] if state_before else 0
+    cache['state'] = update_training_load(state_before, exercise_log)
+    record_cache_lookup('training_load', state_before, rows_before, cache['state'], cache['state']['n_rows'])
+    st.session_state.training_load_cache = cache
+    return training_load_metrics(cache['state'])
+
+def get_acwr_status(acwr):
+    if pd.isna(acwr):
+        return "Building baseline (needs 4 weeks)"
+    elif acwr < 0.8:
+        return "Under-training - room to progress"
+    elif acwr <= 1.3:
+        return "Sweet spot - well balanced"
+    elif acwr <= 1.5:
+        return "Caution - load rising fast"
+    else:
+        return "Spike - back off to protect the knee"
+
+@timed_span("dashboard.training_load")
+def show_training_load(exercise_log):
+    """Render the training load metrics and charts for the dashboard"""
+    metrics = get_training_load(exercise_log)
+    if metrics.empty:
+        st.info("Not enough data to calculate training load.")
+        return
+
+    latest = metrics.iloc[-1]
+    week_volume = metrics['volume_load'].tail(ACUTE_DAYS).sum()
+
+    col1, col2, col3, col4 = st.columns(4)
+    cards = [
+        (col1, "7-DAY VOLUME", f"{week_volume:,.0f} kg", "Sets × reps × weight"),
+        (col2, "ACUTE:CHRONIC", "–" if pd.isna(latest['acwr']) else f"{latest['acwr']:.2f}", get_acwr_status(latest['acwr'])),
+        (col3, "MONOTONY", "–" if pd.isna(latest['monotony']) else f"{latest['monotony']:.2f}", "Above 2.0 means too little variation"),
+        (col4, "WEEKLY STRAIN", "–" if pd.isna(latest['strain']) else f"{latest['strain']:,.0f}", "Weekly load × monotony"),
+    ]
+    for col, label, value, caption in cards:
+        with col:
+            st.markdown(f"""
+            <div class="metric-container">
+                <div class="metric-label">{label}</div>
+                <div class="metric-value" style="font-size: 1.8rem;">{value}</div>
+                <div style="font-size: 14px; color: rgba(255,255,255,0.7);">{caption}</div>
+            </div>
+            """, unsafe_allow_html=True)
+
+    fig_load = go.Figure()
+    fig_load.add_trace(go.Bar(
+        x=metrics['date'],
+        y=metrics['rpe_load'],
+        name='Session RPE Load',
+        marker_color='rgba(54, 209, 220, 0.5)',
+    ))
+    fig_load.add_trace(go.Scatter(
+        x=metrics['date'],
+        y=metrics['acwr'],
+        name='ACWR',
+        line=dict(color='#ffab00', width=3),
+        mode='lines',
+        yaxis="y2"
+    ))
+
+    fig_load.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color='rgba(255,255,255,0.7)')
+        ),
+        xaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            color='rgba(255,255,255,0.5)'
+        ),
+        yaxis=dict(
+            title="Load",
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.1)',
+            zeroline=False,
+            color='rgba(255,255,255,0.5)'
+        ),
+        yaxis2=dict(
+            title="ACWR",
+            overlaying="y",
+            side="right",
+            showgrid=False,
+            zeroline=False,
+            color='rgba(255,255,255,0.5)'
+        ),
+        font=dict(color='rgba(255,255,255,0.7)'),
+        height=300
+    )
+
+    st.plotly_chart(fig_load, use_container_width=True)
@@ -0,0 +1,149 @@
+import time
+import bisect
+import threading
+from perf import get_perf_setting
+from metrics import CACHE_LOOKUPS
+
+DEFAULT_TTL_SECONDS = 300
+PAGE_SIZE = 20
+
+# Sorts after every other character, so [prefix, prefix + END) covers all keys starting with prefix
+END = "\uffff"
+
+def _name(value):
+    # Profile frames hold NaN (truthy, not a string) for a missing name
+    return value if isinstance(value, str) else ""
+
+def _search_keys(username, name):
+    """Lower-cased keys a user can be found by: the username, the full name and each word of the name"""
+    keys = {username.lower()}
+    name = _name(name).strip().lower()
+    if name:
+        keys.add(name)
+        keys.update(name.split())
+    return keys
+
+class UserDirectory:
+    """Sorted prefix index over profile usernames and names, with paginated typeahead search"""
+
+    def __init__(self, users):
+        self.names = {}
+        for user in users:
+            if user.get('username'):
+                self.names[user['username']] = _name(user.get('name'))
+        self._rebuild()
+        self.built_at = time.monotonic()
+
+    def _rebuild(self):
+        pairs = sorted((key, username) for username, name in self.names.items() for key in _search_keys(username, name))
+        self.keys = [key for key, _ in pairs]
+        self.usernames = [username for _, username in pairs]
+        self.ordered = sorted(self.names, key=str.lower)
+
+    def __len__(self):
+        return len(self.names)
+
+    def update(self, username, name):
+        """Reflect a profile write; a no-op when the name did not change"""
+        name = _name(name)
+        if self.names.get(username) == name:
+            return
+        if username in self.names:
+            # Drop the old keys, then insert the new ones in sorted position
+            for key in _search_keys(username, self.names[username]):
+                index = bisect.bisect_left(self.keys, key)
+                while index < len(self.keys) and self.keys[index] == key:
+                    if self.usernames[index] == username:
+                        del self.keys[index]
+                        del self.usernames[index]
+                        break
+                    index += 1
+        else:
+            bisect.insort(self.ordered, username, key=str.lower)
+        self.names[username] = name
+        for key in _search_keys(username, name):
+            index = self._position(key, username)
+            self.keys.insert(index, key)
+            self.usernames.insert(index, username)
+
+    def _position(self, key, username):
+        index = bisect.bisect_left(self.keys, key)
+        while index < len(self.keys) and self.keys[index] == key and self.usernames[index] < username:
+            index += 1
+        return index
+
+    def search(self, query="", page=0, page_size=PAGE_SIZE):
+        """One page of {'username', 'name'} matches for a prefix of a username or name, and the total count"""
+        query = (query or "").strip().lower()
+        if not query:
+            matches = self.ordered
+        else:
+            start = bisect.bisect_left(self.keys, query)
+            stop = bisect.bisect_left(self.keys, query + END, lo=start)
+            # A user can match on several keys; keep the first occurrence
+            matches = sorted(dict.fromkeys(self.usernames[start:stop]), key=str.lower)
+        first = max(page, 0) * page_size
+        return [{'username': u, 'name': self.names[u]} for u in matches[first:first + page_size]], len(matches)
+
+_directory = None
+# Guards the current index against concurrent searches and profile writes
+_lock = threading.Lock()
+# One rebuild at a time; held while loading, so searches on the old index never wait for it
+_build_lock = threading.Lock()
+# Profile writes seen while a rebuild loads, replayed onto the new index before it is swapped in
+_writes_during_build = None
+
+def _ttl_seconds():
+    try:
+        return float(get_perf_setting("user_directory_ttl_seconds", DEFAULT_TTL_SECONDS))
+    except (TypeError, ValueError):
+        return DEFAULT_TTL_SECONDS
+
+def get_directory(loader):
+    """Process-wide directory, rebuilt from loader() (all profiles) once it is older than the TTL"""
+    global _directory, _writes_during_build
+    directory = _directory
+    if directory is not None and time.monotonic() - directory.built_at < _ttl_seconds():
+        CACHE_LOOKUPS.inc(cache="user_directory", result="hit")
+        return directory
+    with _build_lock:
+        if _directory is not directory:
+            # Another thread rebuilt it while this one waited
+            return _directory
+        with _lock:
+            _writes_during_build = []
+        try:
+            fresh = UserDirectory(loader())
+        except BaseException:
+            with _lock:
+                _writes_during_build = None
+            raise
+        if not len(fresh):
+            # Possibly a failed load: try again on the next lookup instead of caching nothing for the TTL
+            fresh.built_at = float('-inf')
+        with _lock:
+            for username, name in _writes_during_build:
+                fresh.update(username, name)
+            _writes_during_build = None
+            _directory = fresh
+        CACHE_LOOKUPS.inc(cache="user_directory", result="miss")
+        return fresh
+
+def search_users(loader, query="", page=0, page_size=PAGE_SIZE):
+    directory = get_directory(loader)
+    # Held so a concurrent record_profile() never shows a half-updated index
+    with _lock:
+        return directory.search(query, page, page_size)
+
+def record_profile(username, name):
+    """Keep the cached directory current after a profile write in this process (other replicas wait for the TTL)"""
+    with _lock:
+        if _directory is not None:
+            _directory.update(username, name)
+        if _writes_during_build is not None:
+            _writes_during_build.append((username, name))
+
+def invalidate():
+    global _directory
+    with _lock:
+        _directory = None
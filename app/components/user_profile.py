@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from rehab_protocol import get_protocol
+from cards import emit, SECTION_HEADER, PHASE_CARD
 
 def show_profile():
     st.title("User Profile")
@@ -114,21 +116,16 @@ def show_profile():
     
     # Display rehabilitation timeline based on surgery date
     if 'surgery_date' in st.session_state.user_data and not pd.isna(st.session_state.user_data['surgery_date'].values[0]) and st.session_state.user_data['surgery_date'].values[0]:
-        st.markdown("""
-        <div style="margin: 30px 0 20px 0;">
-            <h3 style="color: #36d1dc; border-bottom: 1px solid rgba(255,255,255,0.1); padding-bottom: 10px;">
-                Rehabilitation Journey
-            </h3>
-        </div>
-        """, unsafe_allow_html=True)
+        emit(SECTION_HEADER.render(title="Rehabilitation Journey"))
         
         try:
             surgery_date = datetime.strptime(st.session_state.user_data['surgery_date'].values[0], '%Y-%m-%d')
             current_date = datetime.today()
             days_since_surgery = (current_date - surgery_date).days
             
-            # Calculate percentage complete (assuming 6-month/180-day recovery)
-            recovery_percent = min(100, max(0, int((days_since_surgery / 180) * 100)))
+            # Calculate percentage complete (return-to-sport phase start, day 180)
+            protocol = get_protocol()
+            recovery_percent = min(100, max(0, int((days_since_surgery / protocol.phases[-1]['start_day']) * 100)))
             
             # Fix the logic for pre vs post-op display
             # If surgery_date is in the future, show Until Surgery and positive days
@@ -177,77 +174,31 @@ def show_profile():
             # Create timeline as separate cards instead of a complex HTML structure
             st.markdown("### Rehabilitation Phases")
             
-            # Determine current phase
-            current_phase = ""
-            if days_since_surgery < 0:
-                current_phase = "Pre-op"
-            elif 0 <= days_since_surgery <= 14:
-                current_phase = "Week 0-2"
-            elif 15 <= days_since_surgery <= 42:
-                current_phase = "Week 3-6"
-            elif 43 <= days_since_surgery <= 84:
-                current_phase = "Week 7-12"
-            elif 85 <= days_since_surgery <= 140:
-                current_phase = "Week 13-20"
-            else:
-                current_phase = "Week 21+"
+            # Determine current phase from the shared protocol (bisect by day since surgery)
+            current_phase = protocol.phase_for_day(days_since_surgery)['tab']
             
             # Create timeline data
             timeline_data = [
-                {"week": "Pre-op", "description": "Complete pre-op exercises and prepare for surgery.", "color": "#36d1dc"},
-                {"week": "Week 0-2", "description": "Focus on swelling control, early ROM, and quad activation.", "color": "#4cc4dc"},
-                {"week": "Week 3-6", "description": "Progress ROM and begin early strength training.", "color": "#5cacdc"},
-                {"week": "Week 7-12", "description": "Increase strength training and introduce light functional exercises.", "color": "#5b86e5"},
-                {"week": "Week 13-20", "description": "Add plyometrics and sport-specific training.", "color": "#7b74e0"},
-                {"week": "Week 21+", "description": "Gradual return to sport and maintenance.", "color": "#9370db"}
+                {"week": phase['tab'], "description": phase['summary'], "color": phase['color']}
+                for phase in protocol.phases
             ]
             
-            # Create a card for each phase
-            for phase in timeline_data:
-                is_current = phase["week"] == current_phase
-                bg_color = "rgba(25, 30, 40, 0.3)"
-                text_color = "white"
-                
-                if is_current:
-                    # Current phase gets highlighted
-                    with st.container():
-                        st.markdown(f"""
-                        <div style="padding: 15px; background: linear-gradient(90deg, {phase['color']}22, rgba(25, 30, 40, 0.3)); 
-                                   border-radius: 8px; border-left: 4px solid {phase['color']};">
-                            <div style="font-weight: 600; color: {phase['color']};">
-                                {phase['week']} ← Current Phase
-                            </div>
-                            <div style="color: rgba(255,255,255,0.8);">
-                                {phase['description']}
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    # Non-current phases
-                    st.markdown(f"""
-                    <div style="padding: 15px; background: rgba(25, 30, 40, 0.3); 
-                               border-radius: 8px; border-left: 4px solid {phase['color']};">
-                        <div style="font-weight: 600; color: {phase['color']};">
-                            {phase['week']}
-                        </div>
-                        <div style="color: rgba(255,255,255,0.8);">
-                            {phase['description']}
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+            # All phase cards in one markdown delta; the current phase is highlighted
+            emit(PHASE_CARD.render_all({
+                'margin': "10px",
+                'background': f"linear-gradient(90deg, {phase['color']}22, rgba(25, 30, 40, 0.3))"
+                              if phase["week"] == current_phase else "rgba(25, 30, 40, 0.3)",
+                'color': phase['color'],
+                'title': f"{phase['week']} ← Current Phase" if phase["week"] == current_phase else phase['week'],
+                'description': phase['description'],
+            } for phase in timeline_data))
             
         except Exception as e:
             st.error(f"Error displaying timeline: {e}")
 
     # Add injury information
     if injury_type:
-        st.markdown("""
-        <div style="margin: 30px 0 20px 0;">
-            <h3 style="color: #36d1dc; border-bottom: 1px solid rgba(255,255,255,0.1); padding-bottom: 10px;">
-                Injury Information
-            </h3>
-        </div>
-        """, unsafe_allow_html=True)
+        emit(SECTION_HEADER.render(title="Injury Information"))
         
         injury_info = get_injury_info(injury_type)
         
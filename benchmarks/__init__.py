@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The app imports its components as top-level modules (see app.py), so do the same here
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPONENTS_DIR = os.path.join(REPO_ROOT, 'app', 'components')
+if COMPONENTS_DIR not in sys.path:
+    sys.path.insert(0, COMPONENTS_DIR)
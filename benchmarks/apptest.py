@@ -0,0 +1,106 @@
+import os
+import time
+from collections import Counter
+
+from benchmarks import REPO_ROOT
+
+# Session state key read by the option_menu stand-in; the real component cannot be clicked headlessly
+PAGE_KEY = 'benchmark_page'
+
+# db_utils functions called by save_data() on every rerun
+SAVE_FUNCTIONS = ('save_user_profile', 'save_exercise_log', 'save_rom_pain_log')
+COLLECTION_METHODS = (
+    'find', 'find_one', 'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one',
+    'delete_one', 'delete_many', 'find_one_and_update', 'find_one_and_delete', 'count_documents',
+)
+
+# Counters filled while the app runs; reset before every measured step
+_script_runs = [0]
+_delta_messages = [0]
+_delta_bytes = [0]
+_db_calls = Counter()
+_save_db_calls = Counter()
+_save_depth = [0]
+
+def run_app():
+    """Script body executed by AppTest on every rerun: app.py with the navigation menu driven by session state"""
+    import streamlit as st
+    import streamlit_option_menu
+
+    def option_menu(menu_title, options, default_index=0, **kwargs):
+        return st.session_state.get(PAGE_KEY) or options[default_index]
+
+    streamlit_option_menu.option_menu = option_menu
+    _script_runs[0] += 1
+    with open(os.path.join(REPO_ROOT, 'app.py')) as f:
+        source = f.read()
+    exec(compile(source, 'app.py', 'exec'), {'__name__': '__main__', '__file__': os.path.join(REPO_ROOT, 'app.py')})
+
+def _app_script():
+    from benchmarks.apptest import run_app
+    run_app()
+
+def install_counters():
+    """Count delta messages and their bytes, Mongo collection calls and the calls made from the save path"""
+    import mongomock
+    import db_utils
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+
+    def count_message(msg):
+        if msg.WhichOneof('type') == 'delta':
+            _delta_messages[0] += 1
+            _delta_bytes[0] += msg.ByteSize()
+
+    ForwardMsgQueue.on_before_enqueue_msg(count_message)
+
+    def counted_method(name, method):
+        def wrapper(*args, **kwargs):
+            _db_calls[name] += 1
+            if _save_depth[0]:
+                _save_db_calls[name] += 1
+            return method(*args, **kwargs)
+        return wrapper
+
+    for name in COLLECTION_METHODS:
+        method = getattr(mongomock.collection.Collection, name)
+        setattr(mongomock.collection.Collection, name, counted_method(name, method))
+
+    def save_path(function):
+        def wrapper(*args, **kwargs):
+            _save_depth[0] += 1
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _save_depth[0] -= 1
+        return wrapper
+
+    # app.py re-imports these names from db_utils on every rerun, so patching the module is enough
+    for name in SAVE_FUNCTIONS:
+        setattr(db_utils, name, save_path(getattr(db_utils, name)))
+
+def _reset_counters():
+    _script_runs[0] = 0
+    _delta_messages[0] = 0
+    _delta_bytes[0] = 0
+    _db_calls.clear()
+    _save_db_calls.clear()
+
+def measure(steps, name, action):
+    """Run one AppTest interaction and record wall time, script runs, delta messages and bytes, and DB calls"""
+    _reset_counters()
+    start = time.perf_counter()
+    app = action()
+    elapsed = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(f"{name} raised: {app.exception[0].value}")
+
+    step = steps.setdefault(name, {'samples': [], 'script_runs': [], 'delta_messages': [], 'delta_bytes': [],
+                                   'db_calls': [], 'save_db_calls': [], 'db_calls_by_method': Counter()})
+    step['samples'].append(elapsed)
+    step['script_runs'].append(_script_runs[0])
+    step['delta_messages'].append(_delta_messages[0])
+    step['delta_bytes'].append(_delta_bytes[0])
+    step['db_calls'].append(sum(_db_calls.values()))
+    step['save_db_calls'].append(sum(_save_db_calls.values()))
+    step['db_calls_by_method'].update(_db_calls)
+    return app
@@ -0,0 +1,139 @@
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks import REPO_ROOT
+
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+BENCHMARK_PASSWORD = "benchmark-password"
+
+def install_mongo_standin(mongo_uri=None):
+    """Point db_utils at an in-process Mongo stand-in (mongomock), or at a real server when mongo_uri is given
+
+    The real server gets the app's command listener, so its results include per-command metrics.
+    Use a throwaway server: the benchmark patients are written to its acl_rehab_db database.
+    """
+    import db_utils
+    if mongo_uri:
+        from pymongo import MongoClient
+        from db_metrics import command_metrics
+        client = MongoClient(mongo_uri, event_listeners=[command_metrics])
+        db_utils.ensure_indexes(client.acl_rehab_db)
+        db_utils.init_connection = lambda: client
+        return client
+
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("The benchmarks need mongomock: pip install -r benchmarks/requirements.txt")
+
+    _accept_bulk_sort(mongomock)
+    client = mongomock.MongoClient()
+    db_utils.ensure_indexes(client.acl_rehab_db)
+    db_utils.init_connection = lambda: client
+    return client
+
+def _accept_bulk_sort(mongomock):
+    # pymongo 4.9+ passes sort= for UpdateOne/ReplaceOne in bulk_write; mongomock 4.3's builder rejects it.
+    # The app never sets a sort on a bulk operation, so the stand-in drops the (None) argument
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ('add_update', 'add_replace'):
+        method = getattr(builder, name)
+        if getattr(method, 'accepts_sort', False):
+            continue
+        def accepting(self, *args, _method=method, sort=None, **kwargs):
+            return _method(self, *args, **kwargs)
+        accepting.accepts_sort = True
+        setattr(builder, name, accepting)
+
+def db_metrics_extra():
+    """Command metrics recorded during the run (empty with mongomock, which emits no command events)"""
+    from db_metrics import command_metrics
+    snapshot = command_metrics.snapshot()
+    return {'db_metrics': snapshot} if snapshot['operations'] else {}
+
+def seed_patients(patients, timings=None):
+    """Create users and store their profile and logs through the app's own save paths"""
+    import db_utils
+    seeded = []
+    for patient in patients:
+        username = patient['username']
+        timed(timings, 'seed.create_user', db_utils.create_user, username, BENCHMARK_PASSWORD)
+        timed(timings, 'save.profile', db_utils.save_user_profile, username, _profile_frame(patient))
+        timed(timings, 'save.exercise_log', db_utils.save_exercise_log, username, patient['exercise_log'])
+        timed(timings, 'save.rom_pain_log', db_utils.save_rom_pain_log, username, patient['rom_pain_log'])
+        timed(timings, 'seed.recompute_power_level', db_utils.recompute_power_level, username)
+        seeded.append(username)
+    return seeded
+
+def _profile_frame(patient):
+    import pandas as pd
+    return pd.DataFrame([patient['profile']])
+
+def timed(timings, name, function, *args, **kwargs):
+    """Call function and append its wall time (seconds) to timings[name]"""
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    if timings is not None:
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+    return value
+
+def summarize(samples):
+    values = np.asarray(samples, dtype=float) * 1000
+    return {
+        'n': int(len(values)),
+        'mean_ms': round(float(values.mean()), 4),
+        'median_ms': round(float(np.median(values)), 4),
+        'p95_ms': round(float(np.percentile(values, 95)), 4),
+        'min_ms': round(float(values.min()), 4),
+        'max_ms': round(float(values.max()), 4),
+    }
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def write_results(suite, params, timings, output=None, extra=None):
+    """Write timings as JSON with the run parameters so results from different commits can be compared"""
+    document = {
+        'suite': suite,
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': params,
+        },
+        'results': {name: summarize(samples) for name, samples in sorted(timings.items())},
+    }
+    if extra:
+        document.update(extra)
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{suite}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2, default=str)
+    return output, document
+
+def compare_results(baseline_path, document):
+    """Print median changes against a previous results file of the same suite"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"{'benchmark':<40} {'baseline ms':>12} {'current ms':>12} {'change':>9}")
+    for name, current in document['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            print(f"{name:<40} {'-':>12} {current['median_ms']:>12.3f} {'new':>9}")
+            continue
+        change = (current['median_ms'] / previous['median_ms'] - 1) * 100 if previous['median_ms'] else 0.0
+        print(f"{name:<40} {previous['median_ms']:>12.3f} {current['median_ms']:>12.3f} {change:>+8.1f}%")
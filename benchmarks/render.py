@@ -0,0 +1,163 @@
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+from benchmarks import REPO_ROOT
+from benchmarks.common import (
+    BENCHMARK_PASSWORD, install_mongo_standin, db_metrics_extra, seed_patients, summarize, write_results, compare_results
+)
+from benchmarks.synthetic import generate_patients
+from benchmarks.apptest import PAGE_KEY, install_counters, measure, _app_script
+
+PAGES = ["Profile", "Rehab Plan", "Equipment Exercises", "Exercise Tracker", "ROM & Pain", "Progress Dashboard"]
+
+# Median wall-time budget per step (ms). Checked after the run; --budget-scale adjusts for slower machines
+LATENCY_BUDGETS_MS = {
+    'login.form': 2000,
+    'login.submit': 1000,
+    'page.Profile': 500,
+    'page.Rehab Plan': 500,
+    'page.Equipment Exercises': 500,
+    'page.Exercise Tracker': 1500,
+    'page.ROM & Pain': 1200,
+    'page.Progress Dashboard': 1500,
+    'interact.category_filter': 1500,
+    'interact.section_switch': 1000,
+    'interact.history_filter': 1000,
+    'interact.exercise_submit': 1200,
+    'interact.rom_submit': 1200,
+    'interact.calendar_filter': 1500,
+    'interact.correlation_filter': 1500,
+}
+
+def _button(app, label):
+    return next(b for b in app.button if label in str(b.label))
+
+def _selectbox(app, key):
+    return next(s for s in app.selectbox if s.key == key)
+
+def _section(app, key, label):
+    # Selecting a lazy_tabs section is setting its widget key before the rerun
+    app.session_state[key] = label
+    return app.run()
+
+def _go_to(app, page):
+    app.session_state[PAGE_KEY] = page
+    return app.run()
+
+def drive_session(username, steps, repeat, timeout):
+    """Log in through the real form, visit every page and perform the common interactions"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_function(_app_script, default_timeout=timeout)
+    measure(steps, 'login.form', app.run)
+    app.text_input[0].input(username)
+    app.text_input[1].input(BENCHMARK_PASSWORD)
+    measure(steps, 'login.submit', lambda: _button(app, "Login").click().run())
+    if not app.session_state['authenticated']:
+        raise RuntimeError(f"Login failed for {username}")
+
+    # The first visit renders the page's feature card, later reruns are the steady state
+    for page in PAGES:
+        for _ in range(repeat):
+            measure(steps, f'page.{page}', lambda: _go_to(app, page))
+
+    _go_to(app, "Exercise Tracker")
+    category = _selectbox(app, 'category_selector')
+    measure(steps, 'interact.category_filter', lambda: category.select(category.options[-1]).run())
+    # The tracker renders one section at a time
+    measure(steps, 'interact.section_switch', lambda: _section(app, 'exercise_tracker_section', "Exercise History"))
+    history = _selectbox(app, 'filter_category')
+    measure(steps, 'interact.history_filter', lambda: history.select(history.options[-1]).run())
+    _section(app, 'exercise_tracker_section', "Log Exercise")
+    for _ in range(repeat):
+        measure(steps, 'interact.exercise_submit', lambda: _button(app, "Complete Exercise").click().run())
+
+    # The ROM history keys its delete buttons by date, so log each measurement on its own day
+    _go_to(app, "ROM & Pain")
+    for offset in range(repeat):
+        app.date_input[0].set_value(date.today() - timedelta(days=offset))
+        measure(steps, 'interact.rom_submit', lambda: _button(app, "Log Measurements").click().run())
+
+    _go_to(app, "Progress Dashboard")
+    layer = _selectbox(app, 'dashboard_calendar_layer')
+    measure(steps, 'interact.calendar_filter', lambda: layer.select(layer.options[-1]).run())
+    outcome = _selectbox(app, 'load_correlation_outcome')
+    measure(steps, 'interact.correlation_filter', lambda: outcome.select(outcome.options[-1]).run())
+
+def summarize_steps(steps, budget_scale):
+    """Per-step statistics plus the budget check on the median wall time"""
+    summary, violations = {}, []
+    for name, step in steps.items():
+        stats = summarize(step['samples'])
+        for metric in ('script_runs', 'delta_messages', 'delta_bytes', 'db_calls', 'save_db_calls'):
+            stats[f'{metric}_mean'] = round(sum(step[metric]) / len(step[metric]), 2)
+        stats['db_calls_by_method'] = dict(step['db_calls_by_method'])
+
+        budget = LATENCY_BUDGETS_MS.get(name)
+        if budget is not None:
+            stats['budget_ms'] = budget * budget_scale
+            stats['within_budget'] = stats['median_ms'] <= stats['budget_ms']
+            if not stats['within_budget']:
+                violations.append(name)
+        summary[name] = stats
+    return summary, violations
+
+def print_summary(summary):
+    print(f"{'step':<30} {'median ms':>10} {'budget':>8} {'runs':>5} {'deltas':>7} {'delta KB':>9} {'db':>6} {'save db':>8}")
+    for name, stats in summary.items():
+        budget = f"{stats['budget_ms']:.0f}" if 'budget_ms' in stats else '-'
+        flag = '' if stats.get('within_budget', True) else '  OVER BUDGET'
+        print(f"{name:<30} {stats['median_ms']:>10.1f} {budget:>8} {stats['script_runs_mean']:>5.1f} "
+              f"{stats['delta_messages_mean']:>7.1f} {stats['delta_bytes_mean'] / 1024:>9.1f} {stats['db_calls_mean']:>6.1f} {stats['save_db_calls_mean']:>8.1f}{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render every page of the app headlessly with AppTest and check latency budgets")
+    parser.add_argument('--days', type=int, default=180, help="days of synthetic history for the logged-in patient")
+    parser.add_argument('--entries-per-day', type=float, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end-date', default="2025-01-01", help="last day of synthetic history")
+    parser.add_argument('--repeat', type=int, default=3, help="reruns per page and per form submission")
+    parser.add_argument('--timeout', type=float, default=120, help="AppTest timeout per rerun (seconds)")
+    parser.add_argument('--budget-scale', type=float, default=1.0, help="multiply every latency budget")
+    parser.add_argument('--no-budgets', action='store_true', help="report budget violations without failing")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/render-<timestamp>.json)")
+    parser.add_argument('--compare', help="previous results file to compare medians against")
+    parser.add_argument('--mongo-uri', help="benchmark against a throwaway MongoDB server instead of mongomock")
+    args = parser.parse_args(argv)
+
+    # app.py reads app/styles.css etc. relative to the repository root
+    os.chdir(REPO_ROOT)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    install_mongo_standin(args.mongo_uri)
+    install_counters()
+
+    patient = next(generate_patients(1, args.days, args.entries_per_day, args.end_date, args.seed))
+    seed_patients([patient])
+
+    steps = {}
+    drive_session(patient['username'], steps, args.repeat, args.timeout)
+    summary, violations = summarize_steps(steps, args.budget_scale)
+    print_summary(summary)
+
+    params = vars(args).copy()
+    params.update({
+        'exercise_entries': int(len(patient['exercise_log'])),
+        'rom_pain_entries': int(len(patient['rom_pain_log'])),
+    })
+    timings = {name: step['samples'] for name, step in steps.items()}
+    output, document = write_results('render', params, timings, args.output, extra={'steps': summary, **db_metrics_extra()})
+    print(f"Results written to {output}")
+    if args.compare:
+        compare_results(args.compare, document)
+
+    if violations:
+        print(f"Over budget: {', '.join(violations)}")
+        if not args.no_budgets:
+            raise SystemExit(1)
+    return document
+
+if __name__ == '__main__':
+    main()
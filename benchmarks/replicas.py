@@ -0,0 +1,192 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import tempfile
+import time
+from collections import OrderedDict
+
+from benchmarks import REPO_ROOT
+from benchmarks.common import install_mongo_standin, seed_patients, summarize, write_results, compare_results
+from benchmarks.synthetic import generate_patients
+
+# Requests are handed to whichever replica is free, like a load balancer without sticky sessions
+STOP = None
+
+# Session state saved by app.py's save_data() and the db_utils function saving each
+SAVED_KEYS = {'profile': 'save_user_profile', 'exercise_log': 'save_exercise_log', 'rom_pain_log': 'save_rom_pain_log'}
+
+def _replica(index, store_spec, args, requests, results):
+    """One app replica: its own Mongo stand-in seeded with the same patients and a small local session cache"""
+    os.chdir(REPO_ROOT)
+    install_mongo_standin(args.mongo_uri)
+    import db_utils
+    import session_store
+    from training_load import build_training_load, update_training_load, training_load_metrics
+
+    session_store._store = session_store.create_store(store_spec)
+    if not args.mongo_uri:
+        # Every replica shares one database in production; with mongomock each seeds an identical copy
+        seed_patients(generate_patients(args.users, args.days, args.entries_per_day, args.end_date, args.seed))
+
+    # token -> session state this replica holds in memory (what Streamlit keeps per websocket session)
+    local = OrderedDict()
+    samples = []
+    while True:
+        token = requests.get()
+        if token is STOP:
+            break
+        start = time.perf_counter()
+        state = local.pop(token, None)
+        rehydrated = state is None
+        if rehydrated:
+            # Another replica served this session last: resume it from the store and reload the logs
+            session = session_store.load_session(token)
+            if session is None:
+                results.put(('error', index, token))
+                continue
+            username = session['username']
+            exercise_log = db_utils.get_exercise_log(username)
+            state = {
+                'session': session,
+                'username': username,
+                'profile': db_utils.get_user_profile(username),
+                'exercise_log': exercise_log,
+                'rom_pain_log': db_utils.get_rom_pain_log(username),
+                'training_load': build_training_load(exercise_log, args.end_date),
+            }
+            state['saved'] = {key: db_utils.data_fingerprint(state[key]) for key in SAVED_KEYS}
+        else:
+            _, state['session'] = session_store.touch_session(token, state['session'])
+            if state['session'] is None:
+                results.put(('error', index, token))
+                continue
+
+        # The rerun itself: analytics from the cached state, then save_data() writing what the session changed
+        state['training_load'] = update_training_load(state['training_load'], state['exercise_log'], args.end_date)
+        training_load_metrics(state['training_load'])
+        for key, save in SAVED_KEYS.items():
+            fingerprint = db_utils.data_fingerprint(state[key])
+            if fingerprint is None or state['saved'][key] != fingerprint:
+                getattr(db_utils, save)(state['username'], state[key])
+                state['saved'][key] = fingerprint
+
+        local[token] = state
+        while len(local) > args.local_sessions:
+            local.popitem(last=False)
+        samples.append((time.perf_counter() - start, rehydrated))
+
+    results.put(('done', index, samples))
+
+def run_replicas(replicas, tokens, store_spec, args):
+    """Serve args.requests reruns spread over the session tokens with `replicas` worker processes"""
+    context = multiprocessing.get_context('spawn')
+    requests = context.Queue()
+    results = context.Queue()
+    workers = [context.Process(target=_replica, args=(i, store_spec, args, requests, results), daemon=True)
+               for i in range(replicas)]
+    for worker in workers:
+        worker.start()
+
+    for i in range(args.requests):
+        requests.put(tokens[i % len(tokens)])
+    for _ in workers:
+        requests.put(STOP)
+
+    start = time.perf_counter()
+    samples, errors, per_replica = [], 0, {}
+    finished = 0
+    while finished < replicas:
+        try:
+            kind, index, payload = results.get(timeout=args.timeout)
+        except queue.Empty:
+            raise SystemExit(f"Replicas did not finish within {args.timeout} s")
+        if kind == 'error':
+            errors += 1
+            continue
+        finished += 1
+        per_replica[index] = len(payload)
+        samples.extend(payload)
+    elapsed = time.perf_counter() - start
+    for worker in workers:
+        worker.join()
+
+    latencies = [latency for latency, _ in samples]
+    busy = sum(latencies)
+    return latencies, {
+        'replicas': replicas,
+        'requests': len(samples),
+        'errors': errors,
+        'rehydration_rate': round(sum(rehydrated for _, rehydrated in samples) / max(len(samples), 1), 3),
+        # Requests per second of replica busy time summed over replicas; wall time includes seeding
+        'throughput_rps': round(len(samples) / busy * replicas, 1) if busy else None,
+        'wall_seconds': round(elapsed, 2),
+        'requests_per_replica': per_replica,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load test sessions served by several app replicas sharing one session store")
+    parser.add_argument('--replicas', default="1,2,4", help="comma-separated replica counts to compare")
+    parser.add_argument('--users', type=int, default=8, help="concurrent sessions")
+    parser.add_argument('--requests', type=int, default=200, help="reruns per replica count")
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--entries-per-day', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end-date', default="2025-01-01")
+    parser.add_argument('--local-sessions', type=int, default=64, help="sessions a replica keeps in memory")
+    parser.add_argument('--session-store', help="sqlite:///path or redis://host:port/db "
+                                                "(default: a temporary SQLite file)")
+    parser.add_argument('--mongo-uri', help="shared throwaway MongoDB server instead of a mongomock copy per replica")
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--output', help="results file (default: benchmarks/results/replicas-<timestamp>.json)")
+    parser.add_argument('--compare', help="previous results file to compare medians against")
+    args = parser.parse_args(argv)
+
+    import session_store
+    store_spec = args.session_store
+    temporary = None
+    if not store_spec:
+        temporary = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        temporary.close()
+        store_spec = f"sqlite:///{temporary.name}"
+    if store_spec == "memory":
+        raise SystemExit("The memory store is per process; replicas need sqlite:/// or redis://")
+    if args.mongo_uri:
+        install_mongo_standin(args.mongo_uri)
+        seed_patients(generate_patients(args.users, args.days, args.entries_per_day, args.end_date, args.seed))
+
+    # Logins happened elsewhere: every session starts out known only to the shared store
+    session_store._store = session_store.create_store(store_spec)
+    patients = generate_patients(args.users, args.days, args.entries_per_day, args.end_date, args.seed)
+    tokens = [session_store.create_session(patient['username']) for patient in patients]
+
+    timings, extra = {}, {'replica_runs': []}
+    try:
+        for replicas in [int(count) for count in args.replicas.split(',')]:
+            latencies, summary = run_replicas(replicas, tokens, store_spec, args)
+            timings[f'replicas.{replicas}.rerun'] = latencies
+            extra['replica_runs'].append(summary)
+    finally:
+        if temporary is not None:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(temporary.name + suffix):
+                    os.remove(temporary.name + suffix)
+
+    params = vars(args).copy()
+    params.update({'session_store': store_spec.split('://')[0], 'cpus': os.cpu_count()})
+    path, document = write_results('replicas', params, timings, args.output, extra)
+
+    print(f"{'replicas':>8} {'requests':>9} {'median ms':>10} {'p95 ms':>8} {'req/s':>8} {'rehydrated':>11}")
+    for summary in extra['replica_runs']:
+        stats = summarize(timings[f"replicas.{summary['replicas']}.rerun"])
+        print(f"{summary['replicas']:>8} {summary['requests']:>9} {stats['median_ms']:>10.1f} {stats['p95_ms']:>8.1f} "
+              f"{summary['throughput_rps'] or 0:>8.1f} {summary['rehydration_rate']:>10.0%}")
+    if os.cpu_count() and max(s['replicas'] for s in extra['replica_runs']) > os.cpu_count():
+        print(f"Note: more replicas than CPUs ({os.cpu_count()}); throughput is CPU-bound past that point.")
+    if args.compare:
+        compare_results(args.compare, document)
+    print(f"Results written to {path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import socketserver
+import threading
+import time
+
+# Local Redis protocol (RESP) stand-in covering what the session store uses: PING, GET, SET [EX] [NX|XX], DEL, EXPIRE, FLUSHDB
+
+class _Data:
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        entry = self.values.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires < time.time():
+            del self.values[key]
+            return None
+        return value
+
+def _bulk(value):
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command (e.g. typed into telnet)
+            return line.strip().split()
+        parts = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            parts.append(self.rfile.read(length + 2)[:-2])
+        return parts
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            parts = self._read_command()
+            if parts is None:
+                return
+            if not parts:
+                continue
+            name, args = parts[0].upper(), parts[1:]
+            with data.lock:
+                if name == b"PING":
+                    reply = b"+PONG\r\n"
+                elif name in (b"SELECT", b"AUTH"):
+                    reply = b"+OK\r\n"
+                elif name == b"GET":
+                    reply = _bulk(data.get(args[0]))
+                elif name == b"SET":
+                    options = [arg.upper() for arg in args[2:]]
+                    expires = None
+                    if b"EX" in options:
+                        expires = time.time() + int(options[options.index(b"EX") + 1])
+                    if b"NX" in options and data.get(args[0]) is not None:
+                        reply = _bulk(None)
+                    elif b"XX" in options and data.get(args[0]) is None:
+                        reply = _bulk(None)
+                    else:
+                        data.values[args[0]] = (args[1], expires)
+                        reply = b"+OK\r\n"
+                elif name == b"DEL":
+                    removed = sum(data.values.pop(key, None) is not None for key in args)
+                    reply = b":%d\r\n" % removed
+                elif name == b"EXPIRE":
+                    value = data.get(args[0])
+                    if value is not None:
+                        data.values[args[0]] = (value, time.time() + int(args[1]))
+                    reply = b":%d\r\n" % (value is not None)
+                elif name == b"FLUSHDB":
+                    data.values.clear()
+                    reply = b"+OK\r\n"
+                else:
+                    reply = b"-ERR unknown command '%s'\r\n" % name
+            self.wfile.write(reply)
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _Handler)
+        self.data = _Data()
+
+def start_in_thread(host="127.0.0.1", port=0):
+    """Start a stand-in server on a daemon thread and return it (server.server_address has the real port)"""
+    server = RespServer((host, port))
+    threading.Thread(target=server.serve_forever, name="resp-stand-in", daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Redis protocol-compatible stand-in for the session store")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args(argv)
+    server = RespServer((args.host, args.port))
+    print(f"Listening on redis://{args.host}:{args.port}/0")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks import REPO_ROOT
+from benchmarks.common import (
+    BENCHMARK_PASSWORD, install_mongo_standin, db_metrics_extra, seed_patients, timed, write_results, compare_results
+)
+from benchmarks.synthetic import generate_patients
+
+def bench_login(usernames, timings):
+    import db_utils
+    for username in usernames:
+        def warm_up():
+            success, user = timed(timings, 'login.authenticate', db_utils.authenticate_user, username, BENCHMARK_PASSWORD)
+            assert success, user
+            timed(timings, 'login.load_profile', db_utils.get_user_profile, username)
+            timed(timings, 'login.load_exercise_log', db_utils.get_exercise_log, username)
+            timed(timings, 'login.load_rom_pain_log', db_utils.get_rom_pain_log, username)
+            timed(timings, 'login.power_level', db_utils.get_power_level, username)
+        timed(timings, 'login.warm_up', warm_up)
+
+def bench_session_tokens(usernames, timings):
+    import session_store
+    # A remembered session resumes from its signed token instead of repeating the PBKDF2 verify in login.authenticate
+    for username in usernames:
+        token = timed(timings, 'session.create', session_store.create_session, username, remember=True)
+        timed(timings, 'session.verify_token', session_store.verify_token, token)
+        session = timed(timings, 'session.restore', session_store.load_session, token)
+        assert session and session['username'] == username
+        timed(timings, 'session.reject_forged', session_store.load_session, token[:-2] + "xx")
+        session_store.end_session(token)
+
+def bench_user_directory(timings, profiles, repeat=20):
+    import random
+    from user_directory import UserDirectory
+    # The login page's profile search over a large synthetic directory (no database involved)
+    rng = random.Random(0)
+    first = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+    last = ["Smith", "Garcia", "Chen", "Okafor", "Novak", "Silva", "Haddad", "Kowalski", "Tanaka", "Murphy"]
+    users = [{'username': f"user{i:06d}", 'name': f"{rng.choice(first)} {rng.choice(last)}"} for i in range(profiles)]
+    directory = timed(timings, 'directory.build', UserDirectory, users)
+    for _ in range(repeat):
+        timed(timings, 'directory.first_page', directory.search, "", 0)
+        timed(timings, 'directory.search_prefix', directory.search, "user0123", 0)
+        timed(timings, 'directory.search_name', directory.search, "tan", 3)
+        timed(timings, 'directory.rename', directory.update, f"user{rng.randrange(profiles):06d}", "Renamed Patient")
+
+def bench_exercise_catalog(timings, repeat=200):
+    from exercise_catalog import ExerciseCatalog
+    catalog = timed(timings, 'catalog.load', ExerciseCatalog.from_file)
+    # Search-as-you-type: every prefix of a query with a typo
+    query = "hamstrng curl"
+    for _ in range(repeat):
+        for end in range(1, len(query) + 1):
+            timed(timings, 'catalog.search_keystroke', catalog.search, query[:end])
+
+def bench_save(usernames, timings):
+    import db_utils
+    # What save_data() in app.py costs when a rerun did change the profile and both logs (unchanged ones are skipped)
+    for username in usernames:
+        profile = db_utils.get_user_profile(username)
+        exercise_log = db_utils.get_exercise_log(username)
+        rom_pain_log = db_utils.get_rom_pain_log(username)
+        def save_rerun():
+            timed(timings, 'save.profile', db_utils.save_user_profile, username, profile)
+            timed(timings, 'save.exercise_log', db_utils.save_exercise_log, username, exercise_log)
+            timed(timings, 'save.rom_pain_log', db_utils.save_rom_pain_log, username, rom_pain_log)
+        timed(timings, 'save.rerun', save_rerun)
+        timed(timings, 'save.power_level_increment', db_utils.increment_power_level, username, 100)
+
+def bench_dashboard(patients, end_date, timings):
+    from heatmap import exercise_calendar
+    from training_load import build_training_load, update_training_load, training_load_metrics
+    from load_correlation import analyse_load_symptoms
+    from rom_model import build_recovery_model, update_recovery_model, milestone_forecast
+    from adherence import build_adherence, update_adherence, adherence_metrics
+    from rehab_protocol import RehabProtocol
+    from exercise_catalog import ExerciseCatalog
+
+    protocol = RehabProtocol.from_file()
+    catalog = ExerciseCatalog.from_file()
+
+    for patient in patients:
+        exercise_log = patient['exercise_log']
+        rom_pain_log = patient['rom_pain_log']
+        surgery_date = patient['profile']['surgery_date']
+        surgery_day = int(pd.Timestamp(surgery_date).to_datetime64().astype('datetime64[D]').astype('int64'))
+
+        timed(timings, 'dashboard.calendar', exercise_calendar, exercise_log['date'], exercise_log['category'])
+
+        # Full build over all but the last entry, then the incremental path for the last one
+        state = timed(timings, 'dashboard.training_load_build', build_training_load, exercise_log.iloc[:-1], end_date)
+        state = timed(timings, 'dashboard.training_load_append', update_training_load, state, exercise_log, end_date)
+        timed(timings, 'dashboard.training_load_metrics', training_load_metrics, state)
+
+        timed(timings, 'dashboard.load_correlation', analyse_load_symptoms, exercise_log, rom_pain_log)
+
+        model = timed(timings, 'dashboard.rom_model_build', build_recovery_model, rom_pain_log.iloc[:-1], surgery_day)
+        model = timed(timings, 'dashboard.rom_model_append', update_recovery_model, model, rom_pain_log, surgery_day)
+        timed(timings, 'dashboard.milestones', milestone_forecast, model, rom_pain_log, surgery_date, end_date)
+
+        adherence = timed(timings, 'dashboard.adherence_build', build_adherence,
+                          exercise_log.iloc[:-1], surgery_date, end_date, protocol, catalog)
+        adherence = timed(timings, 'dashboard.adherence_append', update_adherence,
+                          adherence, exercise_log, surgery_date, end_date, protocol, catalog)
+        timed(timings, 'dashboard.adherence_metrics', adherence_metrics, adherence, end_date, protocol)
+
+    # Target gaps for every patient in one batch, then again with nothing changed (all cache hits)
+    from target_gaps import compute_target_gaps, target_gaps
+    timed(timings, 'dashboard.target_gaps_batch', compute_target_gaps, patients, end_date, protocol)
+    timed(timings, 'dashboard.target_gaps_cold', target_gaps, patients, end_date, protocol)
+    timed(timings, 'dashboard.target_gaps_warm', target_gaps, patients, end_date, protocol)
+
+def bench_export(usernames, timings):
+    """Stream every patient's data, then one patient's, to each export format"""
+    from data_export import FORMATS, export_data
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in FORMATS:
+            timed(timings, f'export.all_{fmt}', export_data, directory, fmt)
+            timed(timings, f'export.one_patient_{fmt}', export_data, directory, fmt, usernames=usernames[:1])
+
+def bench_snapshot(usernames, timings):
+    """Full Parquet snapshot, a run with nothing changed, and a run after one patient's log changes"""
+    import db_utils
+    from snapshot import run_snapshot
+    with tempfile.TemporaryDirectory() as directory:
+        timed(timings, 'snapshot.full', run_snapshot, directory, full=True)
+        timed(timings, 'snapshot.incremental_unchanged', run_snapshot, directory, overlap_seconds=0)
+        log = db_utils.get_exercise_log(usernames[0])
+        db_utils.remove_exercise_entry(usernames[0], log.iloc[0]['date'], log.iloc[0]['exercise'])
+        timed(timings, 'snapshot.incremental_one_patient', run_snapshot, directory, overlap_seconds=0)
+
+def bench_cohort(timings, repeat=1000):
+    """Cohort percentile bands from a fresh snapshot, serially and on a process pool, and the dashboard lookup"""
+    from snapshot import run_snapshot
+    from cohort import build_cohort_bands, get_bands, bands_at
+    with tempfile.TemporaryDirectory() as directory:
+        run_snapshot(directory, full=True)
+        timed(timings, 'cohort.build_serial', build_cohort_bands, directory, refresh=False, workers=1)
+        timed(timings, 'cohort.build_pool', build_cohort_bands, directory, refresh=False, workers=max(2, os.cpu_count() or 1))
+    table = get_bands()
+    timed(timings, 'cohort.lookup', lambda: [bands_at(table, 'flexion_angle', [day]) for day in range(repeat)])
+
+def bench_clinician(usernames, end_date, timings, panel, repeat=5):
+    """Patient summaries refreshed from the seeded logs, then the clinician list over a large panel"""
+    import random
+    from datetime import date, timedelta
+    import db_utils
+    from clinician import get_patient_page
+    db = db_utils.get_database()
+    ok, message = timed(timings, 'clinician.refresh_summaries', db_utils.refresh_patient_summaries, usernames)
+    assert ok, message
+
+    # The list reads only the summaries, so the extra patients need no profiles or logs
+    rng = random.Random(0)
+    today = date.fromisoformat(end_date)
+    extra = [f"panel{i:06d}" for i in range(panel)]
+    summaries = []
+    for i, username in enumerate(extra):
+        days = sorted({str(today - timedelta(days=rng.randint(0, 40))) for _ in range(rng.randint(0, 20))}, reverse=True)
+        recent, previous = rng.uniform(0, 8), rng.uniform(0, 8)
+        summaries.append({'username': username, 'name': f"Panel Patient {i}",
+                          'surgery_date': str(today - timedelta(days=rng.randint(7, 365))),
+                          'last_exercise': days[0] if days else None, 'exercise_days': days[:28],
+                          'last_seen': days[0] if days else None, 'extension': rng.randint(-5, 10),
+                          'flexion': rng.randint(60, 140), 'pain_latest': rng.randint(0, 10), 'pain_recent': recent,
+                          'pain_previous': previous, 'pain_trend': recent - previous, 'clinicians': ['bench-clinician']})
+    db.patient_summaries.insert_many(summaries)
+    db.patient_summaries.update_many({'username': {'$in': usernames}}, {'$addToSet': {'clinicians': 'bench-clinician'}})
+
+    last_page = (len(usernames) + panel - 1) // 25
+    for _ in range(repeat):
+        timed(timings, 'clinician.first_page', get_patient_page, 'bench-clinician', today)
+        timed(timings, 'clinician.sort_pain_trend', get_patient_page, 'bench-clinician', today, sort="Pain trend")
+        timed(timings, 'clinician.filter_inactive', get_patient_page, 'bench-clinician', today, status="Inactive 7+ days")
+        timed(timings, 'clinician.search', get_patient_page, 'bench-clinician', today, search="panel00012")
+        timed(timings, 'clinician.last_page', get_patient_page, 'bench-clinician', today, page=last_page)
+
+def bench_perf_overhead(timings, calls=100000):
+    import perf
+    # Span cost with profiling off (the default) against a plain call; reruns make a few dozen span calls
+    def plain():
+        return None
+    traced = perf.timed_span('bench.noop')(plain)
+    enabled = perf.is_enabled()
+    perf.set_enabled(False)
+    try:
+        timed(timings, 'perf.plain_calls', lambda: [plain() for _ in range(calls)])
+        timed(timings, 'perf.disabled_decorator_calls', lambda: [traced() for _ in range(calls)])
+        def spans():
+            for _ in range(calls):
+                with perf.span('bench.noop'):
+                    pass
+        timed(timings, 'perf.disabled_span_blocks', spans)
+    finally:
+        perf.set_enabled(enabled)
+
+def _render_page(module, function):
+    page = __import__(module)
+    getattr(page, function)()
+
+def bench_history(patients, timings, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    pages = {
+        'render.dashboard': ('dashboard', 'show_dashboard'),
+        'render.exercise_history': ('exercise_tracker', 'show_exercise_tracker'),
+        'render.rom_history': ('rom_pain', 'show_rom_pain'),
+    }
+    for patient in patients:
+        for name, (module, function) in pages.items():
+            app = AppTest.from_function(_render_page, args=(module, function), default_timeout=120)
+            app.session_state['current_username'] = patient['username']
+            app.session_state['user_data'] = pd.DataFrame([patient['profile']])
+            app.session_state['exercise_log'] = patient['exercise_log'].copy()
+            app.session_state['rom_pain_log'] = patient['rom_pain_log'].copy()
+            app.session_state['power_level'] = 0
+            for _ in range(repeat):
+                timed(timings, name, app.run)
+            if app.exception:
+                raise RuntimeError(f"{name} raised: {app.exception[0].value}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ACL Rehab Tracker data paths on synthetic patients")
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--entries-per-day', type=float, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end-date', default="2025-01-01", help="last day of synthetic history")
+    parser.add_argument('--render-users', type=int, default=1, help="patients rendered through AppTest")
+    parser.add_argument('--render-repeat', type=int, default=3, help="reruns per page per rendered patient")
+    parser.add_argument('--skip-render', action='store_true')
+    parser.add_argument('--directory-profiles', type=int, default=100000, help="profiles in the user directory benchmark")
+    parser.add_argument('--clinician-patients', type=int, default=2000, help="extra patients on the clinician list benchmark")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/core-<timestamp>.json)")
+    parser.add_argument('--compare', help="previous results file to compare medians against")
+    parser.add_argument('--mongo-uri', help="benchmark against a throwaway MongoDB server instead of mongomock")
+    args = parser.parse_args(argv)
+
+    # Pages read app/styles.css etc. relative to the repository root
+    os.chdir(REPO_ROOT)
+    install_mongo_standin(args.mongo_uri)
+
+    patients = list(generate_patients(args.users, args.days, args.entries_per_day, args.end_date, args.seed))
+    timings = {}
+
+    usernames = seed_patients(patients, timings)
+    bench_login(usernames, timings)
+    bench_session_tokens(usernames, timings)
+    bench_save(usernames, timings)
+    bench_dashboard(patients, args.end_date, timings)
+    bench_export(usernames, timings)
+    bench_snapshot(usernames, timings)
+    bench_cohort(timings)
+    bench_clinician(usernames, args.end_date, timings, args.clinician_patients)
+    bench_perf_overhead(timings)
+    bench_user_directory(timings, args.directory_profiles)
+    bench_exercise_catalog(timings)
+    if not args.skip_render:
+        bench_history(patients[:args.render_users], timings, args.render_repeat)
+
+    params = vars(args).copy()
+    params.update({
+        'exercise_entries': int(sum(len(p['exercise_log']) for p in patients)),
+        'rom_pain_entries': int(sum(len(p['rom_pain_log']) for p in patients)),
+    })
+    output, document = write_results('core', params, timings, args.output, extra=db_metrics_extra())
+    print(f"Results written to {output}")
+    if args.compare:
+        compare_results(args.compare, document)
+    return document
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+# Exercise mix per category: (exercise, typical weight in kg or 0 for bodyweight)
+EXERCISE_MIX = {
+    "🔥 ROM Exercises": [
+        ("Heel Slides", 0), ("Wall Slides", 0), ("Prone Hangs", 0), ("Heel Props", 0),
+        ("Stationary Bike", 0), ("Patella Mobilizations", 0), ("Band-Assisted Knee Flexion", 0)
+    ],
+    "💪 Strength Exercises": [
+        ("Straight Leg Raises", 2), ("Quad Sets", 0), ("Glute Bridges", 10), ("Leg Press", 60),
+        ("Step-Ups", 10), ("Romanian Deadlifts", 40), ("Calf Raises", 20), ("Walking Lunges", 12)
+    ],
+    "🎯 Resistance Band Exercises": [
+        ("Band Terminal Knee Extensions", 0), ("Band Lateral Walks", 0), ("Band Hamstring Curls", 0)
+    ],
+    "🧠 Balance & Neuromuscular": [
+        ("Single-Leg Balance", 0), ("Wobble Board", 0), ("Y-Balance Training", 0), ("Single-Leg Squat", 0)
+    ],
+    "⚡ Plyometrics": [
+        ("Double-Leg Hops", 0), ("Lateral Hops", 0), ("Box Jumps", 0), ("Jump Rope", 0)
+    ],
+    "👊 Martial Arts Training": [
+        ("Shadow Boxing", 0), ("Slow Motion Kicks", 0), ("Defensive Footwork", 0)
+    ],
+    "🧘 Recovery": [
+        ("Foam Rolling", 0), ("Ice", 0), ("Massage Gun", 0), ("Stretching", 0)
+    ],
+}
+CATEGORIES = list(EXERCISE_MIX)
+
+# Category weights by phase boundary (days since surgery): early rehab is ROM-heavy, later phases add load
+PHASE_STARTS = np.array([0, 21, 42, 90])
+PHASE_MIX = np.array([
+    # ROM, Strength, Band, Balance, Plyo, Martial arts, Recovery
+    [0.55, 0.15, 0.10, 0.00, 0.00, 0.00, 0.20],
+    [0.35, 0.30, 0.15, 0.05, 0.00, 0.00, 0.15],
+    [0.20, 0.40, 0.10, 0.15, 0.00, 0.05, 0.10],
+    [0.10, 0.35, 0.05, 0.15, 0.15, 0.12, 0.08],
+])
+
+INJURY_TYPES = ["ACL Tear", "ACL + Meniscus", "ACL + MCL", "ACL + PCL", "Other"]
+
+def patient_username(index):
+    return f"patient{index:05d}"
+
+def generate_patient(index, days, entries_per_day, end_date="2025-01-01", seed=0):
+    """Deterministic synthetic patient: profile, exercise log and ROM/pain log covering `days` days"""
+    rng = np.random.default_rng([seed, index])
+    username = patient_username(index)
+    end = pd.Timestamp(end_date).normalize()
+    surgery = end - pd.Timedelta(days=days - 1)
+
+    profile = {
+        'name': f"Patient {index}",
+        'age': int(rng.integers(18, 55)),
+        'weight': round(float(rng.normal(75, 12)), 1),
+        'height': round(float(rng.normal(174, 9)), 1),
+        'surgery_date': surgery.strftime('%Y-%m-%d'),
+        'injury_type': str(rng.choice(INJURY_TYPES, p=[0.6, 0.2, 0.1, 0.05, 0.05])),
+        'username': username,
+    }
+
+    # Skip some days, vary the number of entries on the others
+    day_index = np.arange(days)
+    per_day = rng.poisson(entries_per_day, days) * (rng.random(days) > 0.15)
+    entry_days = np.repeat(day_index, per_day)
+    n_entries = len(entry_days)
+
+    phase = np.searchsorted(PHASE_STARTS, entry_days, side='right') - 1
+    cumulative_mix = PHASE_MIX.cumsum(axis=1)[phase]
+    category_index = (rng.random(n_entries)[:, None] > cumulative_mix).sum(axis=1).clip(0, len(CATEGORIES) - 1)
+
+    categories = np.array(CATEGORIES, dtype=object)[category_index]
+    exercises = np.empty(n_entries, dtype=object)
+    weights = np.zeros(n_entries)
+    for i, category in enumerate(CATEGORIES):
+        mask = category_index == i
+        if not mask.any():
+            continue
+        options = EXERCISE_MIX[category]
+        choice = rng.integers(0, len(options), mask.sum())
+        exercises[mask] = [options[c][0] for c in choice]
+        # Weights progress from 30% to 100% of the typical load over the first 120 days
+        base = np.array([options[c][1] for c in choice], dtype=float)
+        progression = 0.3 + 0.7 * np.minimum(entry_days[mask] / 120, 1)
+        weights[mask] = np.round(base * progression * 2) / 2
+
+    dates = (surgery + pd.to_timedelta(entry_days, unit='D')).strftime('%Y-%m-%d')
+    exercise_log = pd.DataFrame({
+        'date': dates,
+        'category': categories,
+        'exercise': exercises,
+        'sets': rng.integers(2, 5, n_entries),
+        'reps': rng.integers(8, 16, n_entries),
+        'weight': weights,
+        'difficulty': rng.integers(3, 9, n_entries).astype(float),
+        'notes': np.where(rng.random(n_entries) < 0.2, "Felt good", ""),
+    })
+
+    # ROM recovers along a saturating curve with patient-specific rate and ceiling
+    rom_days = day_index[rng.random(days) < 0.7]
+    t = rom_days.astype(float)
+    flexion_ceiling = rng.normal(140, 5)
+    flexion_tau = rng.uniform(15, 45)
+    extension_tau = rng.uniform(7, 25)
+    extension_start = rng.uniform(5, 15)
+    flexion = flexion_ceiling - (flexion_ceiling - rng.uniform(40, 70)) * np.exp(-t / flexion_tau) + rng.normal(0, 3, len(t))
+    extension = extension_start * np.exp(-t / extension_tau) - rng.uniform(0, 3) + rng.normal(0, 1, len(t))
+    pain = np.clip(np.round(7 * np.exp(-t / 30) + rng.normal(1, 1.2, len(t))), 0, 10)
+    swelling = np.clip(np.round(3 * np.exp(-t / 25) + rng.normal(0, 0.6, len(t))), 0, 3)
+
+    rom_pain_log = pd.DataFrame({
+        'date': surgery + pd.to_timedelta(rom_days, unit='D'),
+        'extension_angle': np.round(np.clip(extension, -15, 30) * 2) / 2,
+        'flexion_angle': np.round(np.clip(flexion, 0, 160)),
+        'pain_level': pain.astype(int),
+        'swelling': swelling.astype(int),
+        'notes': "",
+    })
+
+    return {'username': username, 'profile': profile, 'exercise_log': exercise_log, 'rom_pain_log': rom_pain_log}
+
+def generate_patients(users, days, entries_per_day, end_date="2025-01-01", seed=0):
+    """Yield `users` synthetic patients one at a time so large cohorts stay in bounded memory"""
+    for index in range(users):
+        yield generate_patient(index, days, entries_per_day, end_date, seed)
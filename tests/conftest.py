@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Components import each other as top-level modules, as app.py arranges with sys.path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'app', 'components'))
+sys.path.insert(0, ROOT)
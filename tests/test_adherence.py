@@ -0,0 +1,14 @@
+import pandas as pd
+from adherence import build_adherence, adherence_metrics
+from rehab_protocol import get_protocol
+
+def test_metrics_for_a_day_past_the_grid():
+    protocol = get_protocol()
+    log = pd.DataFrame({'date': ['2026-03-02', '2026-03-03'], 'exercise': protocol.prescribed_names[:2]})
+    state = build_adherence(log, '2026-03-01', today='2026-03-05', protocol=protocol)
+
+    metrics = adherence_metrics(state, today='2026-04-20', protocol=protocol)
+    same_day = adherence_metrics(build_adherence(log, '2026-03-01', today='2026-04-20', protocol=protocol),
+                                 today='2026-04-20', protocol=protocol)
+    assert metrics is not None
+    pd.testing.assert_frame_equal(metrics['weekly'], same_day['weekly'])
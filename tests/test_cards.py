@@ -0,0 +1,42 @@
+import pandas as pd
+from cards import CardTemplate, Raw, exercise_card
+from rom_pain import ROM_NOTES
+
+NOTES = "Knee felt stiff\n\n    <b>after</b> the last set\r\nIced for 20 min"
+
+def test_values_are_escaped():
+    card = CardTemplate("<div>$value</div>").render(value="<script>alert(1)</script> & co")
+    assert card == "<div>&lt;script&gt;alert(1)&lt;/script&gt; &amp; co</div>"
+
+def test_raw_values_are_not_escaped():
+    assert CardTemplate("<div>$inner</div>").render(inner=Raw("<span>x</span>")) == "<div><span>x</span></div>"
+
+def test_multiline_notes_stay_on_one_line():
+    # A blank or indented line would end the HTML block and turn the rest of the card into Markdown
+    row = pd.Series({'exercise': "Squat", 'sets': 3, 'reps': 10, 'notes': NOTES})
+    for card in (exercise_card(row, [("Sets", 'sets', "")]), ROM_NOTES.render(notes=NOTES)):
+        assert "\n" not in card and "\r" not in card
+        assert "Knee felt stiff<br><br>    &lt;b&gt;after&lt;/b&gt; the last set<br>Iced for 20 min" in card
+
+def _flagged_logs(category):
+    # Load on one day predicts pain the next, so the category is flagged
+    days = pd.date_range("2026-01-01", periods=30)
+    sets = [1 + (i * 7) % 5 for i in range(len(days))]
+    exercise_log = pd.DataFrame({'date': days, 'exercise': "Squat", 'category': category,
+                                 'sets': sets, 'reps': 10, 'weight': 0, 'difficulty': 5})
+    rom_pain_log = pd.DataFrame({'date': days, 'extension_angle': 0, 'flexion_angle': 120,
+                                 'pain_level': [0] + sets[:-1], 'swelling': "None"})
+    return exercise_log, rom_pain_log
+
+def test_flagged_categories_are_escaped():
+    from streamlit.testing.v1 import AppTest
+
+    def app(exercise_log, rom_pain_log):
+        from load_correlation import show_load_symptom_analysis
+        show_load_symptom_analysis(exercise_log, rom_pain_log)
+
+    payload = "<img src=x onerror=alert(1)>"
+    at = AppTest.from_function(app, args=_flagged_logs(payload)).run()
+    cards = [element.value for element in at.markdown if "exercise-card" in element.value]
+    assert cards and all(payload not in card for card in cards)
+    assert any("&lt;img src=x onerror=alert(1)&gt;" in card for card in cards)
@@ -0,0 +1,21 @@
+from exercise_catalog import ExerciseCatalog
+
+CATALOG = ExerciseCatalog([
+    {'name': 'Strength', 'exercises': [{'name': 'Nordic Hamstring Curls'}, {'name': 'Hamstring Curls'},
+                                       {'name': 'Single-Leg Squat'}]},
+    {'name': 'ROM', 'exercises': [{'name': 'Heel Slides'}, {'name': 'Quad Sets'}]},
+])
+
+def _names(query):
+    return [result['name'] for result in CATALOG.search(query)]
+
+def test_a_typo_in_one_word_finds_a_long_name():
+    assert _names("nordc") == ['Nordic Hamstring Curls']
+    assert _names("sqat") == ['Single-Leg Squat']
+
+def test_exact_and_prefix_matches_rank_first():
+    assert _names("hamstring curls")[0] == 'Hamstring Curls'
+    assert _names("heel")[0] == 'Heel Slides'
+
+def test_unrelated_queries_find_nothing():
+    assert _names("xyz") == []
@@ -0,0 +1,66 @@
+import re
+import socket
+import urllib.error
+import urllib.request
+import pytest
+import metrics
+import session_memory  # registers the session gauges and counters with metrics.REGISTRY
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _parse(text):
+    """Families by name with their TYPE and samples as (name, labels, value), failing on any malformed line"""
+    types, samples = {}, []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+        elif line.startswith('# HELP ') or not line:
+            continue
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"malformed sample line: {line!r}"
+            samples.append((match.group(1), match.group(2) or "", float(match.group(3))))
+    return types, samples
+
+def _family(name, types):
+    for suffix in ('_bucket', '_count', '_sum'):
+        if name.endswith(suffix) and types.get(name[:-len(suffix)]) == 'histogram':
+            return name[:-len(suffix)]
+    return name
+
+@pytest.fixture(scope='module')
+def exporter():
+    server = metrics.start_exporter(port=_free_port(), host='127.0.0.1')
+    assert server is not None
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def test_scrape_serves_valid_exposition_format(exporter):
+    metrics.RERUNS.inc(page='Dashboard')
+    metrics.RERUN_SECONDS.observe(0.3, page='Dashboard')
+    metrics.PASSWORD_HASH_SECONDS.observe(0.05, operation='verify')
+
+    with urllib.request.urlopen(f"{exporter}/metrics", timeout=5) as response:
+        assert response.headers['Content-Type'] == metrics.CONTENT_TYPE
+        types, samples = _parse(response.read().decode('utf-8'))
+
+    for name, _, _ in samples:
+        assert _family(name, types) in types, f"{name} has no TYPE line"
+    for name in ('acl_reruns_total', 'acl_rerun_duration_seconds', 'acl_password_hash_duration_seconds',
+                 'acl_active_sessions', 'acl_session_state_bytes', 'acl_db_command_duration_seconds'):
+        assert name in types
+
+    values = {(name, labels): value for name, labels, value in samples}
+    assert values[('acl_reruns_total', '{page="Dashboard"}')] >= 1
+    count = values[('acl_rerun_duration_seconds_count', '{page="Dashboard"}')]
+    assert values[('acl_rerun_duration_seconds_bucket', '{page="Dashboard",le="+Inf"}')] == count >= 1
+
+def test_other_paths_are_not_found(exporter):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{exporter}/other", timeout=5)
+    assert error.value.code == 404
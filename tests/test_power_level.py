@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+from power_level import exercise_power, rom_pain_power, power_level_from_logs
+
+def test_missing_rom_fields_count_as_zero():
+    assert int(rom_pain_power(None, float('nan'), None, np.nan)) == int(rom_pain_power(0, 0, 0, 0)) == 30 * 50 + 800 + 300
+
+def test_missing_exercise_fields_count_as_zero():
+    assert int(exercise_power(None, 10, float('nan'), 5)) == 0
+    assert int(exercise_power(3, 10, None, 5)) == 225
+
+def test_entry_power_matches_the_audit():
+    # A removed entry must take back exactly what the recompute counts for it
+    log = pd.DataFrame({'extension_angle': [5, None], 'flexion_angle': [110, 90], 'pain_level': [None, 4], 'swelling': [1, None]})
+    entries = sum(int(rom_pain_power(*row)) for row in log[['extension_angle', 'flexion_angle', 'pain_level', 'swelling']].itertuples(index=False))
+    assert entries == power_level_from_logs(None, log)
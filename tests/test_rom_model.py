@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from rom_model import build_recovery_model, milestone_forecast
+
+SURGERY = pd.Timestamp("2026-01-01")
+
+def _forecast(flexion, today):
+    """Forecast from flexion readings {days since surgery: angle}"""
+    dates = SURGERY + pd.to_timedelta(list(flexion), unit='D')
+    log = pd.DataFrame({'date': dates, 'flexion_angle': list(flexion.values()), 'extension_angle': 3,
+                        'pain_level': 2, 'swelling': "None"})
+    state = build_recovery_model(log, int(np.datetime64(SURGERY.date(), 'D').astype(np.int64)))
+    return milestone_forecast(state, log, SURGERY, today=today).set_index('Milestone')
+
+def _curve(days):
+    return {int(t): float(np.round(140 - 100 * np.exp(-0.03 * t))) for t in days}
+
+def test_a_crossing_the_measurements_missed_is_behind():
+    # The curve passes 120° in March, but the latest reading (June 30) is 117°
+    forecast = _forecast({**_curve(range(10, 160, 10)), 180: 117}, today="2026-10-19")
+    row = forecast.loc["Flexion 120°"]
+    assert row['Status'] == "Behind" and row['Expected'] == "Overdue"
+
+def test_upcoming_milestones_are_projected_from_today():
+    forecast = _forecast(_curve(range(10, 50, 5)), today="2026-02-25")
+    row = forecast.loc["Flexion 135°"]
+    assert row['Status'] == "On track"
+    assert pd.Timestamp(row['Expected']) >= pd.Timestamp("2026-02-25")
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+import db_utils
+from db_utils import data_fingerprint
+
+LOG = pd.DataFrame({'date': ["2026-10-01", "2026-10-02"], 'exercise': ["Squat", "Lunge"], 'sets': [3, 4], 'reps': [10, 8]})
+
+def test_fingerprint_follows_content_and_order():
+    assert data_fingerprint(LOG) == data_fingerprint(LOG.copy())
+    assert data_fingerprint(LOG) != data_fingerprint(LOG.iloc[::-1])
+    # Two edits that cancel out in a sum of row hashes
+    swapped = LOG.assign(sets=[4, 3], reps=[8, 10])
+    assert data_fingerprint(LOG) != data_fingerprint(swapped)
+    assert data_fingerprint(LOG) != data_fingerprint(LOG.rename(columns={'reps': 'repetitions'}))
+
+def test_unhashable_frames_have_no_fingerprint():
+    assert data_fingerprint(pd.DataFrame({'tags': [["a"], ["b"]]})) is None
+
+@pytest.fixture
+def app(monkeypatch):
+    """A logged-in app session on the Mongo stand-in, counting calls to the save functions"""
+    from streamlit.testing.v1 import AppTest
+    from benchmarks.common import BENCHMARK_PASSWORD, install_mongo_standin, seed_patients
+    from benchmarks.synthetic import generate_patients
+    from benchmarks.apptest import PAGE_KEY, _app_script
+
+    monkeypatch.setattr(db_utils, 'init_connection', db_utils.init_connection)
+    install_mongo_standin()
+    username, = seed_patients(generate_patients(1, days=14, entries_per_day=1, end_date="2026-10-01"))
+
+    saves = []
+    for name in ('save_user_profile', 'save_exercise_log', 'save_rom_pain_log'):
+        def counted(*args, _save=getattr(db_utils, name), _name=name):
+            saves.append(_name)
+            return _save(*args)
+        monkeypatch.setattr(db_utils, name, counted)
+
+    at = AppTest.from_function(_app_script, default_timeout=60).run()
+    at.text_input[0].input(username)
+    at.text_input[1].input(BENCHMARK_PASSWORD)
+    next(button for button in at.button if button.label == "Login").click().run()
+    assert at.session_state['authenticated']
+    at.saves = saves
+    at.page_key = PAGE_KEY
+    return at
+
+def test_reruns_save_only_what_changed(app):
+    app.saves.clear()
+    app.session_state[app.page_key] = "Progress Dashboard"
+    app.run()
+    assert app.saves == []
+
+    app.session_state[app.page_key] = "Exercise Tracker"
+    app.run()
+    next(button for button in app.button if "Complete Exercise" in str(button.label)).click().run()
+    assert app.saves == ['save_exercise_log']
@@ -0,0 +1,29 @@
+import pandas as pd
+from target_gaps import compute_target_gaps
+
+def _flexion(readings, today):
+    rom_pain_log = pd.DataFrame({'date': pd.to_datetime(list(readings)), 'extension_angle': 0,
+                                 'flexion_angle': list(readings.values()), 'pain_level': 2, 'swelling': "None"})
+    gaps = compute_target_gaps([{'username': "patient", 'profile': {'surgery_date': "2026-06-01", 'weight': 70},
+                                 'exercise_log': None, 'rom_pain_log': rom_pain_log}], today=today)
+    return gaps[gaps['target'] == "Flexion"].iloc[0]
+
+WEEKLY = {"2026-08-02": 90, "2026-08-09": 95, "2026-08-16": 100, "2026-08-23": 105, "2026-08-30": 110}
+
+def test_a_stale_trend_past_the_target_asks_for_a_new_measurement():
+    # The trend crosses the target in September, but the last reading (110°) is from August 30
+    gap = _flexion(WEEKLY, "2026-10-19")
+    assert gap['gap'] > 0
+    assert gap['status'] == "Re-measure"
+    assert pd.isna(gap['days_to_target'])
+    assert gap['latest_date'] < gap['projected_date'] < pd.Timestamp("2026-10-19")
+
+def test_a_current_trend_projects_forward():
+    gap = _flexion(WEEKLY, "2026-08-30")
+    assert gap['status'] in ("On track", "Behind")
+    assert gap['days_to_target'] > 0
+    assert gap['projected_date'] == pd.Timestamp("2026-08-30") + pd.Timedelta(days=gap['days_to_target'])
+
+def test_met_targets_report_zero_days():
+    gap = _flexion({"2026-10-12": 130, "2026-10-19": 150}, "2026-10-19")
+    assert gap['status'] == "Met" and gap['days_to_target'] == 0
@@ -0,0 +1,40 @@
+import threading
+import user_directory
+
+def _slow_loader(started, release, users):
+    def loader():
+        started.set()
+        assert release.wait(5)
+        return users
+    return loader
+
+def test_rebuild_does_not_block_searches_and_keeps_concurrent_writes():
+    user_directory.invalidate()
+    user_directory.get_directory(lambda: [{'username': 'alice', 'name': 'Alice Smith'}])
+    user_directory._directory.built_at = float('-inf')  # expire it
+
+    started, release = threading.Event(), threading.Event()
+    loader = _slow_loader(started, release, [{'username': 'alice', 'name': 'Alice Smith'}])
+    rebuild = threading.Thread(target=user_directory.get_directory, args=(loader,))
+    rebuild.start()
+    try:
+        assert started.wait(5)
+        # The old index still answers while the loader runs, and this write lands after the load read
+        assert user_directory._lock.acquire(timeout=1)
+        user_directory._lock.release()
+        user_directory.record_profile('bob', 'Bob Jones')
+    finally:
+        release.set()
+        rebuild.join(5)
+
+    rows, total = user_directory.get_directory(lambda: []).search("jo")
+    assert total == 1 and rows[0]['username'] == 'bob'
+    user_directory.invalidate()
+
+def test_missing_names_are_empty():
+    directory = user_directory.UserDirectory([{'username': 'alice', 'name': float('nan')}, {'username': 'bob'}])
+    directory.update('carol', float('nan'))
+    directory.update('bob', None)
+    rows, total = directory.search("")
+    assert total == 3 and all(row['name'] == "" for row in rows)
+    assert directory.search("car")[0] == [{'username': 'carol', 'name': ""}]